@@ -0,0 +1,120 @@
+"""
+Memory used per resting order and per execution.
+
+Compares the slotted `OrderBookOrder` and `Execution` dataclasses against equivalent dataclasses carrying a per-instance
+`__dict__` (the previous representation), both for the objects alone and for a full order book built by `Matcher`,
+where each resting order also costs an index entry and a share of its price level. The dict-backed classes are derived
+from the fields of the slotted ones, so the two always carry the same fields.
+
+Usage:
+    python -m benchmarks.book_memory
+"""
+
+import gc
+import tracemalloc
+from dataclasses import field, fields, make_dataclass
+
+from src.server.orders import matcher as matcher_module
+from src.server.orders.matcher import Execution, Matcher, OrderBook, OrderBookOrder
+from src.server.orders.model import Order, OrderType, Side
+from src.server.securities.model import BookEngine
+
+ORDERS = 200_000
+LEVELS = 1_000
+
+
+def with_dict(cls) -> type:
+    """
+    A dataclass with the same fields as the slotted dataclass `cls`, but carrying a per-instance `__dict__`.
+    """
+
+    return make_dataclass(
+        f"Dict{cls.__name__}",
+        [
+            (f.name, f.type, field(default=f.default, compare=f.compare, repr=f.repr))
+            for f in fields(cls)
+        ],
+    )
+
+
+DictOrderBookOrder = with_dict(OrderBookOrder)
+DictExecution = with_dict(Execution)
+
+
+def measure(build) -> float:
+    """
+    Returns the number of bytes allocated by `build()` and still alive after it returns, per order.
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+
+    return (after - before) / ORDERS
+
+
+def entries(cls):
+    # Small integers are cached by the interpreter, so only the objects themselves are measured
+    return lambda: [cls(maker_id=1, quantity=100, price=1000) for _ in range(ORDERS)]
+
+
+def executions(cls):
+    return lambda: [
+        cls(maker_id=1, taker_id=2, price=1000, quantity=100) for _ in range(ORDERS)
+    ]
+
+
+def book(engine: BookEngine, entry=OrderBookOrder):
+    """
+    Build a full book with the matcher creating its entries as instances of `entry`.
+    """
+
+    # Order IDs are created up front so that only the book's own memory is measured
+    orders = [
+        Order(
+            id=str(i),
+            client_id=i % 100,
+            security_id=1,
+            side=Side.BUY,
+            quantity=100,
+            type=OrderType.limit,
+            price=10_000 + i % LEVELS,
+        )
+        for i in range(ORDERS)
+    ]
+
+    def build():
+        matcher = Matcher(OrderBook.create(security_id=1, engine=engine))
+        matcher_module.OrderBookOrder = entry
+        try:
+            for order in orders:
+                matcher.add(order)
+        finally:
+            matcher_module.OrderBookOrder = OrderBookOrder
+        return matcher
+
+    return build
+
+
+def main():
+    print(f"{'':<34} {'bytes/order':>12}")
+    print(f"{'entry (__dict__)':<34} {measure(entries(DictOrderBookOrder)):>12.1f}")
+    print(f"{'entry (slots)':<34} {measure(entries(OrderBookOrder)):>12.1f}")
+    print(f"{'execution (__dict__)':<34} {measure(executions(DictExecution)):>12.1f}")
+    print(f"{'execution (slots)':<34} {measure(executions(Execution)):>12.1f}")
+    for engine in BookEngine:
+        for name, entry in (
+            ("__dict__", DictOrderBookOrder),
+            ("slots", OrderBookOrder),
+        ):
+            print(
+                f"{f'resting order ({engine.value}, {name})':<34} {measure(book(engine, entry)):>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Throughput and tail latency of the HTTP API, from the request to the response.
+
+Drives `POST /orders` and `GET /orders` on the app of `src.server.main` at a series of fixed request rates, either
+over the network, with the app served by uvicorn in a child process and called with the HTTP client of blacksheep, or
+in-process, calling the app as an ASGI callable, which leaves out the network and the HTTP parser.
+
+Requests are sent open-loop: each is due at a fixed time, whether or not the earlier ones have been answered, and is
+sent by the first of `--clients` concurrent clients to be free. Latency is measured from when a request was due, so the
+time spent waiting for a client counts. A rate is sustained while the requests are answered at that rate and their p99
+latency stays under `--slo`; the first rate which is not is the saturation point, where the ramp stops.
+
+Usage:
+    python -m benchmarks.http_load [--mode uvicorn|asgi] [--rates 250,500,1000] [--duration 5] [--output FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from bisect import bisect_left
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from blacksheep.client import ClientSession
+from blacksheep.contents import Content
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RATES = [250, 500, 1000, 2000, 4000]
+# Upper bounds of the buckets of the latency histograms, in milliseconds
+BUCKETS = [0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, math.inf]
+# Share of the target rate a stage must achieve to be sustained
+ACHIEVED = 0.95
+
+# A request: its method, path, query parameters and JSON body
+Request = Tuple[str, str, Dict[str, str], Optional[bytes]]
+# Sends a request and returns the status of the response
+Send = Callable[[Request], Awaitable[int]]
+
+
+def create_order(rng: random.Random) -> Request:
+    """
+    A limit order for one of the securities, priced around 100 so that some orders trade.
+    """
+
+    side = rng.choice(("buy", "sell"))
+    body = {
+        "client_id": rng.randrange(100),
+        "security_id": rng.randrange(4),
+        "side": side,
+        "quantity": rng.randint(1, 100),
+        "type": "limit",
+        "price": round(
+            100 + rng.randint(-10, 10) / 100 + (-0.02 if side == "buy" else 0.02), 2
+        ),
+    }
+    return "POST", "/orders", {}, json.dumps(body).encode()
+
+
+def list_orders(rng: random.Random) -> Request:
+    """
+    A page of the orders of a client.
+    """
+
+    return "GET", "/orders", {"client_id": str(rng.randrange(100)), "limit": "50"}, None
+
+
+SCENARIOS: Dict[str, Callable[[random.Random], Request]] = {
+    "POST /orders": create_order,
+    "GET /orders": list_orders,
+}
+
+
+@dataclass
+class Stage:
+    """
+    The requests of a scenario sent at one rate.
+    :param histogram: The number of requests whose latency fell in each of the `BUCKETS`.
+    """
+
+    scenario: str
+    rate: int
+    requests: int
+    errors: int
+    achieved_rate: float
+    latency_ms: Dict[str, float]
+    histogram: List[int] = field(repr=False)
+    sustained: bool = False
+
+
+def summarise(
+    scenario: str,
+    rate: int,
+    latencies: List[float],
+    errors: int,
+    elapsed: float,
+    slo: float,
+) -> Stage:
+    latencies.sort()
+    count = len(latencies)
+
+    def percentile(quantile: float) -> float:
+        return round(latencies[max(math.ceil(quantile * count) - 1, 0)] * 1000, 3)
+
+    histogram = [0] * len(BUCKETS)
+    for latency in latencies:
+        histogram[bisect_left(BUCKETS, latency * 1000)] += 1
+
+    stage = Stage(
+        scenario=scenario,
+        rate=rate,
+        requests=count,
+        errors=errors,
+        achieved_rate=round(count / elapsed, 1),
+        latency_ms={
+            "p50": percentile(0.5),
+            "p90": percentile(0.9),
+            "p99": percentile(0.99),
+            "p99.9": percentile(0.999),
+            "max": percentile(1),
+        },
+        histogram=histogram,
+    )
+    stage.sustained = (
+        not errors
+        and stage.achieved_rate >= ACHIEVED * rate
+        and stage.latency_ms["p99"] <= slo
+    )
+    return stage
+
+
+async def drive(
+    send: Send,
+    scenario: str,
+    rate: int,
+    duration: float,
+    clients: int,
+    slo: float,
+    timeout: float,
+    rng: random.Random,
+) -> Stage:
+    """
+    Send requests of a scenario open-loop at a fixed rate for `duration` seconds.
+    :param timeout: Seconds after which a request is abandoned, and counted as an error.
+    """
+
+    make_request = SCENARIOS[scenario]
+    free_clients = asyncio.Semaphore(clients)
+    latencies: List[float] = []
+    errors = 0
+
+    async def request(due: float, request: Request):
+        nonlocal errors
+        async with free_clients:
+            try:
+                status = await asyncio.wait_for(send(request), timeout)
+            except Exception:
+                status = 0
+        if status >= 400 or status == 0:
+            errors += 1
+        latencies.append(time.perf_counter() - due)
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(rate * duration)):
+        due = start + i / rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(request(due, make_request(rng))))
+    await asyncio.gather(*tasks)
+
+    return summarise(
+        scenario, rate, latencies, errors, time.perf_counter() - start, slo
+    )
+
+
+def asgi_sender(app) -> Send:
+    """
+    Call the app as an ASGI callable, in the process and on the event loop of the load generator.
+    """
+
+    async def send(request: Request) -> int:
+        method, path, query, body = request
+        body = body or b""
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": "&".join(
+                f"{name}={value}" for name, value in query.items()
+            ).encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"localhost"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+        }
+        status = 0
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def respond(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await app(scope, receive, respond)
+        return status
+
+    return send
+
+
+def client_sender(client: ClientSession) -> Send:
+    async def send(request: Request) -> int:
+        method, path, query, body = request
+        if method == "POST":
+            response = await client.post(
+                path, Content(b"application/json", body), params=query
+            )
+        else:
+            response = await client.get(path, params=query)
+        await response.read()
+        return response.status
+
+    return send
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    """
+    Serve the app with uvicorn in a child process, and wait until it accepts connections.
+    """
+
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "src.server.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=ROOT,
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("The server exited on startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+
+    server.terminate()
+    raise RuntimeError("The server did not start in time")
+
+
+async def ramp(send: Send, arguments: argparse.Namespace) -> List[Stage]:
+    """
+    Run each scenario at increasing rates, up to its saturation point.
+    """
+
+    rng = random.Random(arguments.seed)
+    stages = []
+    for scenario in SCENARIOS:
+        for rate in arguments.rates:
+            stage = await drive(
+                send,
+                scenario,
+                rate,
+                arguments.duration,
+                arguments.clients,
+                arguments.slo,
+                arguments.timeout,
+                rng,
+            )
+            stages.append(stage)
+            print(
+                f"{scenario:<14} {rate:>7,}/s {stage.achieved_rate:>9,.1f}/s {stage.errors:>7,} "
+                + " ".join(f"{value:>9.2f}" for value in stage.latency_ms.values())
+                + ("" if stage.sustained else "  saturated")
+            )
+            if not stage.sustained:
+                break
+    return stages
+
+
+async def run(arguments: argparse.Namespace) -> List[Stage]:
+    print(
+        f"{'scenario':<14} {'rate':>9} {'achieved':>11} {'errors':>7} "
+        + " ".join(
+            f"{name + ' ms':>9}" for name in ("p50", "p90", "p99", "p99.9", "max")
+        )
+    )
+
+    if arguments.mode == "asgi":
+        from src.server.main import app
+
+        await app.start()
+        try:
+            return await ramp(asgi_sender(app), arguments)
+        finally:
+            await app.stop()
+
+    port = free_port()
+    server = start_server(port)
+    try:
+        async with ClientSession(
+            base_url=f"http://127.0.0.1:{port}", http2=False
+        ) as client:
+            return await ramp(client_sender(client), arguments)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_histogram(stage: Stage):
+    print(f"\n{stage.scenario} at {stage.rate:,}/s")
+    largest = max(stage.histogram) or 1
+    lower = 0
+    for upper, count in zip(BUCKETS, stage.histogram):
+        label = f"{lower:g}-{upper:g} ms" if upper != math.inf else f">{lower:g} ms"
+        print(f"{label:>14} {count:>8,} {'#' * round(40 * count / largest)}")
+        lower = upper
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=("uvicorn", "asgi"), default="uvicorn")
+    parser.add_argument(
+        "--rates",
+        type=lambda value: [int(rate) for rate in value.split(",")],
+        default=RATES,
+        help="The request rates to ramp through, per second, comma-separated.",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=5.0, help="Seconds at each rate."
+    )
+    parser.add_argument("--clients", type=int, default=64, help="Concurrent clients.")
+    parser.add_argument(
+        "--slo",
+        type=float,
+        default=50.0,
+        help="The p99 latency of a sustained rate, in ms.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=5.0,
+        help="Seconds after which a request is abandoned, and counted as an error.",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Where to write the results, as JSON.")
+    arguments = parser.parse_args()
+
+    stages = asyncio.run(run(arguments))
+
+    # The latency distribution at the highest rate each scenario sustained, and where it saturated
+    for scenario in SCENARIOS:
+        sustained = [
+            stage for stage in stages if stage.scenario == scenario and stage.sustained
+        ]
+        saturated = [
+            stage
+            for stage in stages
+            if stage.scenario == scenario and not stage.sustained
+        ]
+        if sustained:
+            print_histogram(sustained[-1])
+        print(
+            f"{scenario}: "
+            + (
+                f"saturated at {saturated[0].rate:,}/s"
+                if saturated
+                else "not saturated by the rates tried"
+            )
+        )
+
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(
+                {
+                    "benchmark": "http_load",
+                    "mode": arguments.mode,
+                    "clients": arguments.clients,
+                    "duration": arguments.duration,
+                    "slo_ms": arguments.slo,
+                    "buckets_ms": [
+                        bucket if bucket != math.inf else None for bucket in BUCKETS
+                    ],
+                    "stages": [asdict(stage) for stage in stages],
+                },
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Journal write and replay speed.
+
+Writes a journal of limit orders and cancels spread over a set of securities, with the executions they produce, then
+times `replay` rebuilding the order books from it, in events (orders and cancels) per second. Also reports the throughput of the in-process `Sequencer` with and without a
+journal, where callers wait for the group commit of their command.
+
+Usage:
+    python -m benchmarks.journal_replay [events]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.server.orders.journal import Journal, encode, replay
+from src.server.orders.matcher import RootMatcher
+from src.server.orders.model import Order, OrderType, Side
+from src.server.orders.sequencer import AddOrder, CancelOrder, Sequencer
+from src.server.securities.model import SecuritiesRepository, Security
+
+SECURITIES = [Security(id, f"S{id}") for id in range(16)]
+EVENTS = 2_000_000
+SEQUENCED = 50_000
+IN_FLIGHT = 2_000
+# Share of events which cancel one of the orders placed before
+CANCELS = 0.3
+
+
+def securities() -> SecuritiesRepository:
+    repository = SecuritiesRepository()
+    repository.securities = {security.id: security for security in SECURITIES}
+    return repository
+
+
+def orders(count: int):
+    random.seed(42)
+    for i in range(count):
+        side = random.choice((Side.BUY, Side.SELL))
+        yield Order(
+            id=str(i),
+            client_id=i % 100,
+            security_id=random.choice(SECURITIES).id,
+            side=side,
+            quantity=random.randint(1, 100),
+            type=OrderType.limit,
+            # Prices straddle the mid, so that roughly half of the orders trade
+            price=1000 + random.randint(-5, 5) + (-2 if side == Side.BUY else 2),
+        )
+
+
+def write(path: str, events: int):
+    """
+    Journal the orders and cancels as the sequencer would, with the executions produced by matching them.
+    """
+
+    root_matcher = RootMatcher(securities())
+    placed = []
+    with open(path, "wb") as file:
+        for sequence, order in enumerate(orders(events), start=1):
+            if placed and random.random() < CANCELS:
+                cancelled = placed.pop(random.randrange(len(placed)))
+                command = CancelOrder(
+                    security_id=cancelled.security_id,
+                    order_id=cancelled.id,
+                    sequence=sequence,
+                )
+            else:
+                placed.append(order)
+                command = AddOrder(order, sequence=sequence)
+
+            result = command.apply(root_matcher.get_matcher(command.security_id))
+            file.write(b"".join(encode(command, result)))
+
+
+async def sequence(journal_path) -> float:
+    """
+    Returns the number of orders sequenced per second.
+    """
+
+    journal = None
+    if journal_path is not None:
+        journal = Journal(journal_path)
+        journal.open()
+    sequencer = Sequencer(RootMatcher(securities()), journal)
+
+    commands = [AddOrder(order) for order in orders(SEQUENCED)]
+    semaphore = asyncio.Semaphore(IN_FLIGHT)
+
+    async def submit(command):
+        async with semaphore:
+            await sequencer.submit(command)
+
+    start = time.perf_counter()
+    await asyncio.gather(*map(submit, commands))
+    elapsed = time.perf_counter() - start
+
+    await sequencer.stop()
+    if journal is not None:
+        await journal.close()
+    return len(commands) / elapsed
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else EVENTS
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "journal")
+        write(path, events)
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        replay(path, RootMatcher(securities()))
+        elapsed = time.perf_counter() - start
+
+        print(f"replayed {events:,} events ({size / 2**20:,.1f} MiB) in {elapsed:.2f}s")
+        print(f"{events / elapsed:>12,.0f} events/s")
+
+        print(f"{'':<20} {'orders/s':>12}")
+        throughput = asyncio.run(sequence(None))
+        print(f"{'no journal':<20} {throughput:>12,.0f}")
+        throughput = asyncio.run(sequence(os.path.join(directory, "sequenced")))
+        print(f"{'group commit':<20} {throughput:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Per-order matching latency as the order book gets deeper.
+
+Builds books with an increasing number of resting price levels on each side and measures the average time taken by
+`Matcher.add` for orders that do not cross (they rest on an existing level) and for small orders that cross the spread
+and fill against the top of the book. Both should stay flat as depth grows, with either book engine.
+
+Then measures the cost of each self-trade prevention mode: for crossing orders of other clients, which only pay for
+the check, and for crossing orders of the client resting at the top of the book, which are prevented from trading.
+
+Usage:
+    python -m benchmarks.matcher_depth
+"""
+
+import time
+from itertools import cycle
+
+from src.server.orders.matcher import Matcher, OrderBook, OrderBookOrder, PriceLevel
+from src.server.orders.model import Order, OrderType, Side
+from src.server.securities.model import BookEngine, SelfTradePrevention
+
+DEPTHS = (100, 1_000, 10_000, 100_000)
+ORDERS = 20_000
+# Depth of the books self-trade prevention is measured on
+SELF_TRADE_DEPTH = 1_000
+
+# Best bid is at MID - 1 and best ask at MID + 1; levels extend `depth` prices away from the spread.
+MID = 1_000_000
+
+
+def build_matcher(
+    depth: int,
+    engine: BookEngine,
+    self_trade_prevention: SelfTradePrevention = SelfTradePrevention.none,
+) -> Matcher:
+    order_book = OrderBook.create(security_id=1, engine=engine)
+
+    for level in range(1, depth + 1):
+        # A deep top of book lets crossing orders trade without depleting it during the run.
+        quantity = ORDERS * 10 if level == 1 else 100
+        order_book.asks[MID + level] = PriceLevel(
+            MID + level,
+            [OrderBookOrder(maker_id=1, quantity=quantity, price=MID + level)],
+        )
+        order_book.bids[MID - level] = PriceLevel(
+            MID - level,
+            [OrderBookOrder(maker_id=2, quantity=quantity, price=MID - level)],
+        )
+
+    return Matcher(order_book, self_trade_prevention)
+
+
+def passive_orders(depth: int):
+    # Non-marketable orders joining existing levels behind the touch.
+    prices = cycle(range(1, min(depth, 10) + 1))
+    sides = cycle((Side.BUY, Side.SELL))
+
+    for i in range(ORDERS):
+        side = next(sides)
+        offset = next(prices)
+        yield Order(
+            id=str(i),
+            client_id=3,
+            security_id=1,
+            side=side,
+            quantity=10,
+            type=OrderType.limit,
+            price=MID - offset if side == Side.BUY else MID + offset,
+        )
+
+
+def aggressive_orders(depth: int):
+    # Marketable orders filling a single lot at the top of the book.
+    sides = cycle((Side.BUY, Side.SELL))
+
+    for i in range(ORDERS):
+        side = next(sides)
+        yield Order(
+            id=str(i),
+            client_id=3,
+            security_id=1,
+            side=side,
+            quantity=1,
+            type=OrderType.limit,
+            price=MID + 1 if side == Side.BUY else MID - 1,
+        )
+
+
+def self_trading_orders(depth: int):
+    # Marketable orders of the clients resting at the top of the book: asks are client 1's, bids client 2's.
+    for order in aggressive_orders(depth):
+        order.client_id = 1 if order.side == Side.BUY else 2
+        yield order
+
+
+def run(
+    depth: int,
+    engine: BookEngine,
+    orders,
+    self_trade_prevention: SelfTradePrevention = SelfTradePrevention.none,
+) -> float:
+    """
+    Returns the average latency of `Matcher.add`, in microseconds.
+    """
+
+    matcher = build_matcher(depth, engine, self_trade_prevention)
+    orders = list(orders(depth))
+
+    start = time.perf_counter_ns()
+    for order in orders:
+        matcher.add(order)
+    elapsed = time.perf_counter_ns() - start
+
+    return elapsed / len(orders) / 1_000
+
+
+def main():
+    print(
+        f"{'engine':>8} {'depth':>10} {'passive (us/order)':>20} {'aggressive (us/order)':>22}"
+    )
+    for engine in BookEngine:
+        for depth in DEPTHS:
+            passive = run(depth, engine, passive_orders)
+            aggressive = run(depth, engine, aggressive_orders)
+            print(f"{engine.value:>8} {depth:>10} {passive:>20.2f} {aggressive:>22.2f}")
+
+    print(
+        f"\n{'engine':>8} {'self-trade prevention':>22} {'other clients (us/order)':>25} {'same client (us/order)':>24}"
+    )
+    for engine in BookEngine:
+        for mode in SelfTradePrevention:
+            others = run(SELF_TRADE_DEPTH, engine, aggressive_orders, mode)
+            same = run(SELF_TRADE_DEPTH, engine, self_trading_orders, mode)
+            print(f"{engine.value:>8} {mode.value:>22} {others:>25.2f} {same:>24.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Matching throughput and latency under realistic order flow, reproducible from a seed.
+
+Generates a stream of limit orders, market orders and cancels arriving as independent Poisson processes, with the mid
+price of each security following a random walk with drift. Limit orders are priced around the mid, out to `--depth`
+ticks away, and a share of them cross it; cancels pick one of the limit orders placed before. The same stream is then
+applied to a single `Matcher`, and spread over several securities through a `RootMatcher`, timing every call.
+
+Reports orders per second and the p50, p99 and p99.9 latency of each type of operation, and writes them to a JSON file
+along with the parameters of the run and the commit it was made at. Each mode is run `--repeats` times, and the
+fastest run is kept, which makes figures from a noisy machine steadier. Passing the file of an earlier run as
+`--compare` prints the change in each figure, and exits with status 1 if any got worse by more than `--threshold`.
+
+Usage:
+    python -m benchmarks.order_flow [--events N] [--seed S] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.server.orders.matcher import Matcher, OrderBookOrder, PriceLevel, RootMatcher
+from src.server.orders.model import Order, OrderType, Side
+from src.server.securities.model import BookEngine, SecuritiesRepository, Security
+
+LIMIT = "limit"
+MARKET = "market"
+CANCEL = "cancel"
+OPERATIONS = (LIMIT, MARKET, CANCEL)
+
+MID = 1_000_000
+# Share of limit orders priced through the mid, which trade on arrival
+CROSSING = 0.1
+# Quantity resting at each level of the book each security starts with, and beyond its depth, so that market orders
+# always find liquidity
+BACKSTOP = 10**9
+
+PERCENTILES = {"p50": 0.5, "p99": 0.99, "p99.9": 0.999}
+
+
+@dataclass
+class Parameters:
+    """
+    :param depth: How far from the mid limit orders are priced, in ticks; also the number of levels on each side of
+        the books at the start.
+    :param drift: The mean change of the mid price per second, in ticks.
+    :param volatility: The standard deviation of the change of the mid price over a second, in ticks.
+    :param limit_rate: The mean number of limit orders per second, as are the market and cancel rates.
+    """
+
+    events: int = 500_000
+    seed: int = 42
+    securities: int = 16
+    depth: int = 50
+    drift: float = 0.0
+    volatility: float = 2.0
+    limit_rate: float = 700.0
+    market_rate: float = 100.0
+    cancel_rate: float = 200.0
+    engine: str = BookEngine.sorted.value
+
+
+# An operation of the order flow: its type, its security, and the order to add or the ID of the order to cancel
+Event = Tuple[str, int, object]
+
+
+def generate(parameters: Parameters) -> List[Event]:
+    """
+    The order flow of a run, which only depends on the parameters.
+    """
+
+    rng = random.Random(parameters.seed)
+    rates = (parameters.limit_rate, parameters.market_rate, parameters.cancel_rate)
+    total_rate = sum(rates)
+    mids = [float(MID)] * parameters.securities
+    # Limit orders which may still be resting, by security, for cancels to pick from
+    placed: List[List[str]] = [[] for _ in range(parameters.securities)]
+
+    events = []
+    for i in range(parameters.events):
+        # The merged arrivals of independent Poisson processes are a Poisson process of the total rate, whose events
+        # are of each type in proportion to its rate
+        elapsed = rng.expovariate(total_rate)
+        operation = rng.choices(OPERATIONS, weights=rates)[0]
+        security_id = rng.randrange(parameters.securities)
+
+        # Each mid moves on a random walk with drift, sampled at the arrivals
+        for index in range(parameters.securities):
+            mids[index] += (
+                parameters.drift * elapsed
+                + parameters.volatility * math.sqrt(elapsed) * rng.gauss(0, 1)
+            )
+
+        if operation == CANCEL and placed[security_id]:
+            orders = placed[security_id]
+            index = rng.randrange(len(orders))
+            orders[index], orders[-1] = orders[-1], orders[index]
+            events.append((CANCEL, security_id, orders.pop()))
+            continue
+
+        side = rng.choice((Side.BUY, Side.SELL))
+        order = Order(
+            id=str(i),
+            client_id=rng.randrange(1000),
+            security_id=security_id,
+            side=side,
+            quantity=rng.randint(1, 100),
+            type=OrderType.limit,
+        )
+        if operation == MARKET:
+            order.type = OrderType.market
+            order.quantity = rng.randint(1, 50)
+        else:
+            # Prices cluster near the mid, thinning out to the depth of the book
+            if rng.random() < CROSSING:
+                offset = -rng.randint(1, 3)
+            else:
+                offset = min(
+                    int(rng.expovariate(4 / parameters.depth)), parameters.depth
+                )
+            mid = round(mids[security_id])
+            order.price = mid - offset if side == Side.BUY else mid + offset
+            placed[security_id].append(order.id)
+        events.append((MARKET if operation == MARKET else LIMIT, security_id, order))
+
+    return events
+
+
+def securities(parameters: Parameters) -> SecuritiesRepository:
+    repository = SecuritiesRepository()
+    repository.securities = {
+        id: Security(id, f"S{id}", book_engine=BookEngine(parameters.engine))
+        for id in range(parameters.securities)
+    }
+    return repository
+
+
+def seed_book(matcher: Matcher, parameters: Parameters):
+    """
+    Rest a deep order at each level of both sides of the book around the mid, and beyond its depth.
+    """
+
+    for distance in (*range(1, parameters.depth + 1), 4 * parameters.depth):
+        for book, price in (
+            (matcher.asks, MID + distance),
+            (matcher.bids, MID - distance),
+        ):
+            book[price] = PriceLevel(
+                price, [OrderBookOrder(maker_id=-1, quantity=BACKSTOP, price=price)]
+            )
+
+
+def run(events: List[Event], parameters: Parameters, routed: bool) -> dict:
+    """
+    Apply the order flow, to a single `Matcher` or through a `RootMatcher`, and time each operation.
+    :param routed: Whether to spread the orders over the securities through a `RootMatcher`, or to apply all of them to
+        one `Matcher`.
+    """
+
+    root_matcher = RootMatcher(securities(parameters))
+    for matcher in root_matcher.matchers.values():
+        seed_book(matcher, parameters)
+    single = root_matcher.get_matcher(0)
+
+    latencies: Dict[str, List[int]] = {operation: [] for operation in OPERATIONS}
+    clock = time.perf_counter_ns
+
+    start = clock()
+    for operation, security_id, value in events:
+        if routed:
+            if operation == CANCEL:
+                before = clock()
+                root_matcher.get_matcher(security_id).cancel(value)
+            else:
+                before = clock()
+                root_matcher.add(value)
+        elif operation == CANCEL:
+            before = clock()
+            single.cancel(value)
+        else:
+            before = clock()
+            single.add(value)
+        latencies[operation].append(clock() - before)
+    elapsed = (clock() - start) / 1e9
+
+    return {
+        "events": len(events),
+        "seconds": round(elapsed, 3),
+        "orders_per_second": round(len(events) / elapsed),
+        "operations": {
+            operation: summarise(values)
+            for operation, values in latencies.items()
+            if values
+        },
+    }
+
+
+def summarise(latencies: List[int]) -> dict:
+    """
+    The count, mean and percentiles of a set of latencies in nanoseconds, in microseconds.
+    """
+
+    latencies.sort()
+    count = len(latencies)
+    summary = {"count": count, "mean_us": round(sum(latencies) / count / 1000, 3)}
+    for name, quantile in PERCENTILES.items():
+        # Nearest-rank percentile
+        summary[f"{name}_us"] = round(
+            latencies[max(math.ceil(quantile * count) - 1, 0)] / 1000, 3
+        )
+    return summary
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """
+    Print the change of each figure from a baseline run.
+    :return: Whether any figure got worse by more than `threshold`, as a fraction of its baseline.
+    """
+
+    if baseline["parameters"] != results["parameters"]:
+        print("warning: the baseline was run with different parameters")
+
+    regressed = False
+    print(
+        f"\n{'vs ' + str(baseline.get('commit')):<32} {'baseline':>12} {'now':>12} {'change':>8}"
+    )
+    for mode, run in results["runs"].items():
+        before = baseline["runs"].get(mode)
+        if before is None:
+            continue
+
+        # Throughput is better higher, latencies lower
+        figures = [
+            (
+                f"{mode} orders/s",
+                before["orders_per_second"],
+                run["orders_per_second"],
+                -1,
+            )
+        ]
+        for operation, summary in run["operations"].items():
+            for name in PERCENTILES:
+                previous = before["operations"].get(operation, {}).get(f"{name}_us")
+                if previous:
+                    figures.append(
+                        (
+                            f"{mode} {operation} {name} us",
+                            previous,
+                            summary[f"{name}_us"],
+                            1,
+                        )
+                    )
+
+        for name, previous, current, direction in figures:
+            change = (current - previous) / previous
+            worse = change * direction > threshold
+            regressed |= worse
+            print(
+                f"{name:<32} {previous:>12,.3f} {current:>12,.3f} {change:>+7.1%}{' !' if worse else ''}"
+            )
+
+    return regressed
+
+
+def main():
+    defaults = Parameters()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    for name, value in asdict(defaults).items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(value), default=value
+        )
+    parser.add_argument(
+        "--output", default="order_flow.json", help="Where to write the results."
+    )
+    parser.add_argument(
+        "--compare", help="The results of an earlier run to compare with."
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Times to apply the order flow in each mode, keeping the fastest run.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The change of a figure for the worse, as a fraction, reported as a regression.",
+    )
+    arguments = parser.parse_args()
+    parameters = Parameters(
+        **{name: getattr(arguments, name) for name in asdict(defaults)}
+    )
+
+    events = generate(parameters)
+    results = {
+        "benchmark": "order_flow",
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "parameters": asdict(parameters),
+        "repeats": arguments.repeats,
+        "runs": {
+            mode: max(
+                (run(events, parameters, routed) for _ in range(arguments.repeats)),
+                key=lambda results: results["orders_per_second"],
+            )
+            for mode, routed in (("matcher", False), ("root_matcher", True))
+        },
+    }
+
+    print(
+        f"{'run':<14} {'operation':<8} {'count':>9} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'p99.9 us':>9}"
+    )
+    for mode, run_results in results["runs"].items():
+        print(f"{mode:<14} {run_results['orders_per_second']:>,} orders/s")
+        for operation, summary in run_results["operations"].items():
+            print(
+                f"{'':<14} {operation:<8} {summary['count']:>9,} {summary['mean_us']:>9.2f} "
+                f"{summary['p50_us']:>9.2f} {summary['p99_us']:>9.2f} {summary['p99.9_us']:>9.2f}"
+            )
+
+    with open(arguments.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"results written to {arguments.output}")
+
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, arguments.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
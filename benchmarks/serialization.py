@@ -0,0 +1,146 @@
+"""
+Time to encode the JSON responses of orders with the generic encoder of blacksheep against the encoders of
+`src.server.encoding`.
+
+The generic path builds a dict per order, as the routes did before, and hands it to `blacksheep.json`.
+
+Usage:
+    python -m benchmarks.serialization
+"""
+
+import random
+import time
+from dataclasses import asdict
+from decimal import Decimal
+
+from blacksheep import json
+
+from src.server.encoding import (
+    encode_create_order_results,
+    encode_orders,
+    json_response,
+)
+from src.server.orders.manager import CreateOrderResult
+from src.server.orders.matcher import Execution
+from src.server.orders.model import Order, OrderType, Side
+from src.server.securities.model import SecuritiesRepository, Security
+
+COUNTS = [1, 1_000, 100_000]
+# Orders encoded for each count, over at least three repeats, taking the best repeat
+ORDERS_PER_TIMING = 200_000
+SECURITIES = [
+    Security(0, "CENT"),
+    Security(1, "EIGHTH", tick_size=Decimal("0.125")),
+]
+
+
+def securities() -> SecuritiesRepository:
+    repository = SecuritiesRepository()
+    repository.securities = {security.id: security for security in SECURITIES}
+    return repository
+
+
+def results(count: int):
+    random.seed(42)
+    for i in range(count):
+        side = random.choice((Side.BUY, Side.SELL))
+        price = 10_000 + random.randint(-500, 500)
+        order = Order(
+            id=f"{i:032x}",
+            client_id=i % 100,
+            security_id=random.choice(SECURITIES).id,
+            side=side,
+            quantity=random.randint(1, 100),
+            type=OrderType.limit,
+            price=price,
+        )
+        executions = [
+            Execution(
+                maker_id=random.randint(0, 99),
+                taker_id=order.client_id,
+                price=price,
+                quantity=1,
+            )
+            for _ in range(random.randint(0, 2))
+        ]
+        yield CreateOrderResult(
+            order=order,
+            sequence=i + 1,
+            executions=executions,
+            resting_quantity=order.quantity - len(executions),
+        )
+
+
+def order_view(order: Order, repository: SecuritiesRepository) -> dict:
+    security = repository.get_security(order.security_id)
+    return {
+        **asdict(order),
+        "price": None if order.price is None else security.from_ticks(order.price),
+    }
+
+
+def create_order_view(
+    result: CreateOrderResult, repository: SecuritiesRepository
+) -> dict:
+    security = repository.get_security(result.order.security_id)
+    return {
+        "order": order_view(result.order, repository),
+        "sequence": result.sequence,
+        "executions": [
+            {
+                "maker_id": execution.maker_id,
+                "taker_id": execution.taker_id,
+                "price": security.from_ticks(execution.price),
+                "quantity": execution.quantity,
+            }
+            for execution in result.executions
+        ],
+        "resting_quantity": result.resting_quantity,
+    }
+
+
+def timed(encode, repeats: int) -> float:
+    """
+    The best time of one encoding, in seconds.
+    """
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        encode()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repository = securities()
+    print(
+        f"{'response':<22} {'count':>8} {'generic':>12} {'encoders':>12} {'speedup':>8}"
+    )
+
+    for count in COUNTS:
+        created = list(results(count))
+        orders = [result.order for result in created]
+        repeats = max(3, ORDERS_PER_TIMING // count)
+
+        cases = {
+            "orders": (
+                lambda: json([order_view(order, repository) for order in orders]),
+                lambda: json_response(encode_orders(orders, repository)),
+            ),
+            "create order results": (
+                lambda: json(
+                    [create_order_view(result, repository) for result in created]
+                ),
+                lambda: json_response(encode_create_order_results(created, repository)),
+            ),
+        }
+        for name, (generic, encoders) in cases.items():
+            before, after = timed(generic, repeats), timed(encoders, repeats)
+            print(
+                f"{name:<22} {count:>8,} {before * 1e6:>10.1f}µs {after * 1e6:>10.1f}µs {before / after:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Matching throughput with securities sharded across 1 to N worker processes.
+
+Submits limit orders spread evenly over a set of securities, keeping a fixed number of orders in flight, and reports
+orders per second for the in-process `Sequencer` and for `ShardedSequencer` with an increasing number of workers.
+Scaling is bounded by the number of cores, and by the front end process, which pickles every command and result.
+
+Usage:
+    python -m benchmarks.sharding [max_workers]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+from src.server.orders.matcher import RootMatcher
+from src.server.orders.model import Order, OrderType, Side
+from src.server.orders.sequencer import AddOrder, Sequencer
+from src.server.orders.sharding import ShardedSequencer
+from src.server.securities.model import SecuritiesRepository, Security
+
+SECURITIES = [Security(id, f"S{id}") for id in range(64)]
+ORDERS = 100_000
+IN_FLIGHT = 2_000
+
+
+def orders():
+    random.seed(42)
+    for i in range(ORDERS):
+        side = random.choice((Side.BUY, Side.SELL))
+        yield Order(
+            id=str(i),
+            client_id=i % 100,
+            security_id=random.choice(SECURITIES).id,
+            side=side,
+            quantity=random.randint(1, 100),
+            type=OrderType.limit,
+            # Prices straddle the mid, so that roughly half of the orders trade
+            price=1000 + random.randint(-5, 5) + (-2 if side == Side.BUY else 2),
+        )
+
+
+async def run(sequencer) -> float:
+    """
+    Returns the number of orders matched per second.
+    """
+
+    commands = [AddOrder(order) for order in orders()]
+    semaphore = asyncio.Semaphore(IN_FLIGHT)
+
+    async def submit(command):
+        async with semaphore:
+            await sequencer.submit(command)
+
+    if isinstance(sequencer, ShardedSequencer):
+        await sequencer.start()
+
+    start = time.perf_counter()
+    await asyncio.gather(*map(submit, commands))
+    elapsed = time.perf_counter() - start
+
+    await sequencer.stop()
+    return len(commands) / elapsed
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+
+    securities = SecuritiesRepository()
+    securities.securities = {security.id: security for security in SECURITIES}
+
+    print(f"{'workers':>10} {'orders/s':>12}")
+    throughput = asyncio.run(run(Sequencer(RootMatcher(securities))))
+    print(f"{'in-process':>10} {throughput:>12,.0f}")
+
+    for workers in range(1, max_workers + 1):
+        throughput = asyncio.run(run(ShardedSequencer(SECURITIES, workers)))
+        print(f"{workers:>10} {throughput:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
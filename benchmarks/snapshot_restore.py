@@ -0,0 +1,128 @@
+"""
+Restart time from a snapshot against a full replay of the journal.
+
+Builds order books through a journaled `Sequencer` by placing a large number of orders and cancelling most of them,
+then times rebuilding them by replaying the whole journal, and by loading a snapshot taken at the end. Also reports how long matching is paused
+while the snapshot is taken, which is the time to fork.
+
+Usage:
+    python -m benchmarks.snapshot_restore [orders]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.server.orders.journal import Journal, replay
+from src.server.orders.matcher import RootMatcher
+from src.server.orders.model import Order, OrderRepository, OrderType, Side
+from src.server.orders.sequencer import AddOrders, CancelOrder, Sequencer
+from src.server.orders.snapshot import load_snapshot, take_snapshot
+from src.server.securities.model import SecuritiesRepository, Security
+
+SECURITIES = [Security(id, f"S{id}") for id in range(16)]
+ORDERS = 500_000
+BATCH = 1_000
+# Share of the orders cancelled after they were placed
+CANCELS = 0.8
+
+
+def securities() -> SecuritiesRepository:
+    repository = SecuritiesRepository()
+    repository.securities = {security.id: security for security in SECURITIES}
+    return repository
+
+
+def orders(count: int):
+    random.seed(42)
+    for i in range(count):
+        side = random.choice((Side.BUY, Side.SELL))
+        yield Order(
+            id=str(i),
+            client_id=i % 100,
+            security_id=random.choice(SECURITIES).id,
+            side=side,
+            quantity=random.randint(1, 100),
+            type=OrderType.limit,
+            # Wide and barely overlapping prices, so that most orders rest
+            price=1000 + random.randint(0, 500) * (-1 if side == Side.BUY else 1),
+        )
+
+
+async def build(directory: str, count: int) -> float:
+    """
+    Returns the time matching was paused to take the snapshot, in seconds.
+    """
+
+    journal = Journal(os.path.join(directory, "journal"))
+    journal.open()
+    order_repository = OrderRepository()
+    sequencer = Sequencer(
+        RootMatcher(securities()), journal, order_repository=order_repository
+    )
+
+    batches = {}
+    for order in orders(count):
+        batches.setdefault(order.security_id, []).append(order)
+    for security_id, batch in batches.items():
+        for start in range(0, len(batch), BATCH):
+            await sequencer.submit(
+                AddOrders(security_id=security_id, orders=batch[start : start + BATCH])
+            )
+
+    # Most orders are cancelled before they trade
+    for order in order_repository.list_orders():
+        if random.random() < CANCELS:
+            await sequencer.submit(
+                CancelOrder(security_id=order.security_id, order_id=order.id)
+            )
+
+    start = time.perf_counter()
+    snapshot = asyncio.ensure_future(
+        take_snapshot(
+            os.path.join(directory, "snapshot"),
+            sequencer.root_matcher,
+            order_repository,
+            sequencer,
+            journal,
+        )
+    )
+    # The snapshot task forks on its first step, and hands back to the event loop while the child writes
+    await asyncio.sleep(0)
+    paused = time.perf_counter() - start
+    await snapshot
+
+    await sequencer.stop()
+    await journal.close()
+    return paused
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ORDERS
+
+    with tempfile.TemporaryDirectory() as directory:
+        paused = asyncio.run(build(directory, count))
+        print(f"snapshot of {count:,} orders paused matching for {paused * 1000:.1f}ms")
+
+        start = time.perf_counter()
+        replay(
+            os.path.join(directory, "journal"),
+            RootMatcher(securities()),
+            OrderRepository(),
+        )
+        print(f"{'full replay':<20} {time.perf_counter() - start:>8.2f}s")
+
+        start = time.perf_counter()
+        load_snapshot(
+            os.path.join(directory, "snapshot"),
+            RootMatcher(securities()),
+            OrderRepository(),
+        )
+        print(f"{'snapshot load':<20} {time.perf_counter() - start:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
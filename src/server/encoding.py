@@ -0,0 +1,153 @@
+"""
+JSON encoders for the responses of the HTTP API.
+
+Each encoder writes the JSON text of one type directly from its fields, rather than converting objects to dicts and
+handing them to a generic encoder: strings are escaped by the C encoder of the standard library, integers and floats
+are formatted as the standard library would, enum values are encoded once up front, and prices are converted from
+ticks with `Security.from_ticks`. The output is the JSON that `blacksheep.json` produces for the equivalent dicts.
+"""
+
+from json.encoder import encode_basestring
+from typing import Iterable, List, Optional
+
+from blacksheep import Content, Response
+
+from .market_data.feed import BookDelta
+from .market_data.trades import Bar, Trade
+from .orders.depth import Level
+from .orders.manager import CreateOrderResult
+from .orders.matcher import Execution
+from .orders.model import Order, OrderPage, OrderStatus, OrderType, Side, TimeInForce
+from .securities.model import SecuritiesRepository, Security
+
+SIDES = {side: encode_basestring(side.value) for side in Side}
+ORDER_TYPES = {
+    order_type: encode_basestring(order_type.value) for order_type in OrderType
+}
+STATUSES = {status: encode_basestring(status.value) for status in OrderStatus}
+TIMES_IN_FORCE = {
+    time_in_force: encode_basestring(time_in_force.value)
+    for time_in_force in TimeInForce
+}
+
+
+def json_response(text: str, status: int = 200) -> Response:
+    """
+    A response with JSON content that is already encoded.
+    """
+
+    return Response(status, None, Content(b"application/json", text.encode()))
+
+
+def encode_price(ticks: Optional[int], security: Security) -> str:
+    return "null" if ticks is None else repr(security.from_ticks(ticks))
+
+
+def encode_average_price(order: Order, security: Security) -> str:
+    if not order.filled_quantity:
+        return "null"
+    return repr(security.from_ticks(order.filled_notional) / order.filled_quantity)
+
+
+def encode_id(order_id: Optional[str]) -> str:
+    return "null" if order_id is None else encode_basestring(order_id)
+
+
+def encode_order(order: Order, security: Security) -> str:
+    return (
+        f'{{"id":{encode_basestring(order.id)},"client_id":{order.client_id},'
+        f'"security_id":{order.security_id},"side":{SIDES[order.side]},"quantity":{order.quantity},'
+        f'"type":{ORDER_TYPES[order.type]},"price":{encode_price(order.price, security)},'
+        f'"status":{STATUSES[order.status]},"filled_quantity":{order.filled_quantity},'
+        f'"time_in_force":{TIMES_IN_FORCE[order.time_in_force]},"stop_price":{encode_price(order.stop_price, security)},'
+        f'"cancelled_quantity":{order.cancelled_quantity},'
+        f'"remaining_quantity":{order.remaining_quantity},"average_price":{encode_average_price(order, security)}}}'
+    )
+
+
+def encode_orders(orders: Iterable[Order], securities: SecuritiesRepository) -> str:
+    get_security = securities.get_security
+    return f"[{','.join(encode_order(order, get_security(order.security_id)) for order in orders)}]"
+
+
+def encode_order_page(page: OrderPage, securities: SecuritiesRepository) -> str:
+    next_cursor = "null" if page.next_cursor is None else page.next_cursor
+    return f'{{"orders":{encode_orders(page.orders, securities)},"next_cursor":{next_cursor}}}'
+
+
+def encode_execution(execution: Execution, security: Security) -> str:
+    return (
+        f'{{"maker_id":{execution.maker_id},"taker_id":{execution.taker_id},'
+        f'"price":{encode_price(execution.price, security)},"quantity":{execution.quantity},'
+        f'"maker_order_id":{encode_id(execution.maker_order_id)},'
+        f'"taker_order_id":{encode_id(execution.taker_order_id)}}}'
+    )
+
+
+def encode_create_order_result(result: CreateOrderResult, security: Security) -> str:
+    executions = ",".join(
+        encode_execution(execution, security) for execution in result.executions
+    )
+    return (
+        f'{{"order":{encode_order(result.order, security)},"sequence":{result.sequence},'
+        f'"executions":[{executions}],"resting_quantity":{result.resting_quantity}}}'
+    )
+
+
+def encode_create_order_results(
+    results: List[CreateOrderResult], securities: SecuritiesRepository
+) -> str:
+    get_security = securities.get_security
+    return f"[{','.join(encode_create_order_result(result, get_security(result.order.security_id)) for result in results)}]"
+
+
+def encode_levels(levels: Iterable[Level], security: Security) -> str:
+    return f"[{','.join(f'[{encode_price(price, security)},{quantity}]' for price, quantity in levels)}]"
+
+
+def encode_book(
+    security: Security, sequence: int, asks: Iterable[Level], bids: Iterable[Level]
+) -> str:
+    """
+    Price levels of an order book, best price first.
+    """
+
+    return (
+        f'{{"security_id":{security.id},"sequence":{sequence},'
+        f'"asks":{encode_levels(asks, security)},"bids":{encode_levels(bids, security)}}}'
+    )
+
+
+def encode_book_delta(delta: BookDelta, security: Security) -> str:
+    updates = ",".join(
+        f'{{"side":{SIDES[update.side]},"price":{encode_price(update.price, security)},"quantity":{update.quantity}}}'
+        for update in delta.updates
+    )
+    return f'{{"security_id":{delta.security_id},"sequence":{delta.sequence},"updates":[{updates}]}}'
+
+
+def encode_trades(security: Security, trades: Iterable[Trade]) -> str:
+    """
+    Trades of a security, with their time in milliseconds since the epoch.
+    """
+
+    encoded = ",".join(
+        f'{{"id":{trade.id},"price":{encode_price(trade.price, security)},"quantity":{trade.quantity},'
+        f'"time":{trade.timestamp // 1_000_000}}}'
+        for trade in trades
+    )
+    return f'{{"security_id":{security.id},"trades":[{encoded}]}}'
+
+
+def encode_bars(security: Security, interval: str, bars: Iterable[Bar]) -> str:
+    """
+    OHLCV bars of a security, with the start of their interval in milliseconds since the epoch.
+    """
+
+    from_ticks = security.from_ticks
+    encoded = ",".join(
+        f'{{"start":{bar.start // 1_000_000},"open":{from_ticks(bar.open)!r},"high":{from_ticks(bar.high)!r},'
+        f'"low":{from_ticks(bar.low)!r},"close":{from_ticks(bar.close)!r},"volume":{bar.volume}}}'
+        for bar in bars
+    )
+    return f'{{"security_id":{security.id},"interval":{encode_basestring(interval)},"candles":[{encoded}]}}'
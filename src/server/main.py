@@ -1,16 +1,133 @@
+import asyncio
+import os
+
 from blacksheep import Application
 from blacksheep.server.openapi.v3 import OpenAPIHandler
 from openapidocs.v3 import Info
 
+from .market_data.feed import MarketDataFeed
+from .market_data.trades import TradeStore
+from .metrics.model import Metrics
 from .securities.model import SecuritiesRepository
 from .orders.manager import OrderManager
+from .orders.journal import Journal
+from .orders.matcher import RootMatcher
 from .orders.model import OrderRepository
+from .orders.risk import RiskChecker, RiskLimits
+from .orders.sequencer import Sequencer
+from .orders.sharding import ShardedSequencer
+from .orders.snapshot import restore, snapshot_periodically
+
+# Register the routes on the default router
+from .market_data import routes as market_data_routes  # noqa: F401
+from .metrics import routes as metrics_routes  # noqa: F401
+from .orders import routes as orders_routes  # noqa: F401
+from .securities import routes as securities_routes  # noqa: F401
 
 app = Application()
 
-app.services.add_scoped(OrderRepository)
-app.services.add_scoped(OrderManager)
-app.services.add_scoped(SecuritiesRepository)
+# Number of worker processes to shard the matching engines across; 0 matches in the web server's process
+MATCHER_WORKERS = int(os.environ.get("MATCHER_WORKERS", "0"))
+
+# Path of the journal the order books are recovered from on startup; unset keeps the order books in memory only.
+# The journal is written by the in-process sequencer, so it is not used with matcher workers
+JOURNAL_PATH = os.environ.get("JOURNAL_PATH")
+
+# Path of the snapshot of the order books restored on startup, before the journal is replayed from where the snapshot
+# was taken, and how often to take a new one, in seconds. Like the journal, snapshots are not used with matcher workers
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH")
+SNAPSHOT_INTERVAL = float(os.environ.get("SNAPSHOT_INTERVAL", "300"))
+
+# Pre-trade risk limits: the largest quantity of an order, the largest notional a client may have open in a security,
+# in units of price, and how far from the last trade price of its security an order may be priced, as a fraction of
+# it. An empty value turns a limit off
+MAX_ORDER_QUANTITY = os.environ.get("MAX_ORDER_QUANTITY", "1000000")
+MAX_OPEN_NOTIONAL = os.environ.get("MAX_OPEN_NOTIONAL", "100000000")
+PRICE_BAND = os.environ.get("PRICE_BAND", "0.2")
+
+# Whether to record the latency histograms and counters served by GET /metrics; METRICS=0 leaves the hot path untimed.
+# Matching is timed by the in-process sequencer, so only the order repository and responses are with matcher workers
+METRICS = os.environ.get("METRICS", "1") != "0"
+
+# The order books and the order store live for as long as the process, so they are shared by all requests
+securities_repository = SecuritiesRepository()
+root_matcher = RootMatcher(securities_repository)
+order_repository = OrderRepository()
+risk = RiskChecker(
+    order_repository,
+    securities_repository,
+    RiskLimits(
+        max_order_quantity=int(MAX_ORDER_QUANTITY) if MAX_ORDER_QUANTITY else None,
+        max_open_notional=float(MAX_OPEN_NOTIONAL) if MAX_OPEN_NOTIONAL else None,
+        price_band=float(PRICE_BAND) if PRICE_BAND else None,
+    ),
+)
+journal = Journal(JOURNAL_PATH) if JOURNAL_PATH and not MATCHER_WORKERS else None
+snapshot_path = None if MATCHER_WORKERS else SNAPSHOT_PATH
+# The market data feed is fed by either sequencer, but the trade store only by the in-process one, as the trades of
+# matcher workers are made in them
+feed = MarketDataFeed()
+trades = TradeStore()
+metrics = Metrics(enabled=METRICS)
+sequencer = (
+    ShardedSequencer(
+        securities_repository.list_securities(),
+        MATCHER_WORKERS,
+        order_repository,
+        metrics,
+        feed,
+    )
+    if MATCHER_WORKERS
+    else Sequencer(root_matcher, journal, feed, trades, metrics, order_repository)
+)
+
+app.services.add_instance(securities_repository)
+app.services.add_instance(root_matcher)
+app.services.add_instance(order_repository)
+app.services.add_instance(risk)
+app.services.add_instance(feed)
+app.services.add_instance(trades)
+app.services.add_instance(metrics)
+app.services.add_instance(sequencer, Sequencer)
+app.services.add_singleton(OrderManager)
+
+
+@app.on_start
+async def start_sequencer(application: Application):
+    if isinstance(sequencer, ShardedSequencer):
+        await sequencer.start()
+        return
+
+    sequencer.last_sequence = restore(
+        snapshot_path,
+        None if journal is None else journal.path,
+        root_matcher,
+        order_repository,
+    )
+    if journal is not None:
+        journal.open()
+    if snapshot_path is not None:
+        application.snapshots = asyncio.create_task(
+            snapshot_periodically(
+                SNAPSHOT_INTERVAL,
+                snapshot_path,
+                root_matcher,
+                order_repository,
+                sequencer,
+                journal,
+            )
+        )
+
+
+@app.on_stop
+async def stop_sequencer(application: Application):
+    snapshots = getattr(application, "snapshots", None)
+    if snapshots is not None:
+        snapshots.cancel()
+    await sequencer.stop()
+    if journal is not None:
+        await journal.close()
+
 
 docs = OpenAPIHandler(info=Info(title="Example API", version="0.0.1"))
 docs.bind_app(app)
@@ -0,0 +1,67 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from ..orders.matcher import LevelUpdate
+
+# Deltas queued for a subscriber before it is considered too slow, and told to resynchronise
+MAX_PENDING = 1000
+
+
+@dataclass
+class BookDelta:
+    """
+    The price levels of an order book changed by a command.
+    :param sequence: The sequence number of the command.
+    :param updates: The new aggregate quantity of each level changed, once per level.
+    """
+
+    security_id: int
+    sequence: int
+    updates: List[LevelUpdate]
+
+
+class MarketDataFeed:
+    """
+    Fans the level updates made by each command out to the subscribers of its security.
+
+    Each subscriber has a bounded queue of `BookDelta`. A subscriber which falls too far behind has its queue cleared
+    and receives None instead, upon which it must resynchronise from a fresh snapshot of the book.
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING):
+        self.max_pending = max_pending
+        self.subscribers: Dict[int, Set[asyncio.Queue[Optional[BookDelta]]]] = {}
+
+    def subscribe(self, security_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        self.subscribers.setdefault(security_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, security_id: int, queue: asyncio.Queue):
+        self.subscribers.get(security_id, set()).discard(queue)
+
+    def publish(self, security_id: int, sequence: int, updates: List[LevelUpdate]):
+        """
+        Publish the level updates made by a command, once it has been applied to the book.
+        """
+
+        subscribers = self.subscribers.get(security_id)
+        if not subscribers or not updates:
+            return
+
+        # A level changed several times by the command is only sent once, with its final quantity
+        delta = BookDelta(
+            security_id=security_id,
+            sequence=sequence,
+            updates=list(
+                {(update.side, update.price): update for update in updates}.values()
+            ),
+        )
+        for queue in subscribers:
+            try:
+                queue.put_nowait(delta)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
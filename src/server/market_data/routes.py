@@ -0,0 +1,196 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+from blacksheep import Response, get, not_found
+from blacksheep.contents import StreamedContent
+from blacksheep.exceptions import BadRequest
+
+from ..encoding import (
+    encode_bars,
+    encode_book,
+    encode_book_delta,
+    encode_trades,
+    json_response,
+)
+from ..orders.sequencer import ReadDepth, Sequencer
+from ..securities.model import SecuritiesRepository, Security
+from .feed import MarketDataFeed
+from .trades import DEFAULT_LIMIT, MAX_LIMIT, TradeStore
+
+# How often a stream sends a full snapshot of the book between deltas, in seconds
+SNAPSHOT_INTERVAL = 5.0
+
+# Number of price levels returned on each side of a book by default, and at most
+DEFAULT_DEPTH = 10
+MAX_DEPTH = 1000
+
+
+def server_sent_event(event: str, data: str) -> bytes:
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+async def book_events(
+    security: Security,
+    sequencer: Sequencer,
+    feed: MarketDataFeed,
+    interval: float = SNAPSHOT_INTERVAL,
+) -> AsyncIterator[bytes]:
+    """
+    The events of a book stream: a `snapshot` on connection, then a `delta` for each command changing the book, and
+    another `snapshot` every `interval` seconds or whenever the subscriber falls behind.
+
+    Snapshots are read through the sequencer, as the book lives in a matcher worker when there are any, and carry
+    the sequence number of the last command applied. The deltas of the commands a snapshot already includes, which
+    may be queued before or after it is read, are skipped.
+    """
+
+    loop = asyncio.get_running_loop()
+    queue = feed.subscribe(security.id)
+    sequence = 0
+
+    async def snapshot() -> bytes:
+        nonlocal sequence
+        book = await sequencer.read(ReadDepth(security.id))
+        sequence = book.sequence
+        return server_sent_event(
+            "snapshot", encode_book(security, book.sequence, book.asks, book.bids)
+        )
+
+    try:
+        yield await snapshot()
+        deadline = loop.time() + interval
+
+        while True:
+            try:
+                delta = await asyncio.wait_for(
+                    queue.get(), timeout=max(0.0, deadline - loop.time())
+                )
+            except asyncio.TimeoutError:
+                delta = None
+
+            if delta is None:
+                yield await snapshot()
+                deadline = loop.time() + interval
+            elif delta.sequence > sequence:
+                yield server_sent_event("delta", encode_book_delta(delta, security))
+    finally:
+        feed.unsubscribe(security.id, queue)
+
+
+@get("/securities/{security_id}/book")
+async def get_book(
+    security_id: int,
+    securities: SecuritiesRepository,
+    sequencer: Sequencer,
+    depth: int = DEFAULT_DEPTH,
+):
+    """
+    Get the best price levels of the order book of a security, with the aggregate quantity at each price.
+    :param depth: The number of price levels on each side, from 1 to 1000; 1 gives the top of the book.
+    """
+
+    if not 1 <= depth <= MAX_DEPTH:
+        raise BadRequest(f"Depth must be between 1 and {MAX_DEPTH}")
+    try:
+        security = securities.get_security(security_id)
+    except KeyError:
+        return not_found()
+
+    # Read from the sequencer, as the book lives in a matcher worker when there are any
+    book = await sequencer.read(ReadDepth(security_id, depth))
+    return json_response(encode_book(security, book.sequence, book.asks, book.bids))
+
+
+@get("/securities/{security_id}/book/stream")
+def stream_book(
+    security_id: int,
+    securities: SecuritiesRepository,
+    sequencer: Sequencer,
+    feed: MarketDataFeed,
+):
+    """
+    Stream the order book of a security as server-sent events: a `snapshot` of every price level, followed by a
+    `delta` with the new aggregate quantity of the levels changed by each order or cancel, and a fresh `snapshot`
+    periodically. Deltas and snapshots carry the sequence number of the last command applied.
+    """
+
+    try:
+        security = securities.get_security(security_id)
+    except KeyError:
+        return not_found()
+
+    # The content needs an async generator function, rather than a function returning an async generator
+    async def events() -> AsyncIterator[bytes]:
+        async for event in book_events(security, sequencer, feed):
+            yield event
+
+    return Response(
+        200,
+        [(b"Cache-Control", b"no-cache")],
+        StreamedContent(b"text/event-stream", events),
+    )
+
+
+@get("/securities/{security_id}/trades")
+def get_trades(
+    security_id: int,
+    securities: SecuritiesRepository,
+    trades: TradeStore,
+    after: Optional[int] = None,
+    limit: int = DEFAULT_LIMIT,
+):
+    """
+    Get the trades of a security, oldest first, with their time in milliseconds since the epoch.
+    :param after: The ID of the trade to list the trades after; the latest trades by default.
+    :param limit: The number of trades, from 1 to 1000.
+    """
+
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f"Limit must be between 1 and {MAX_LIMIT}")
+    try:
+        security = securities.get_security(security_id)
+    except KeyError:
+        return not_found()
+
+    return json_response(
+        encode_trades(security, trades.trades(security_id, after, limit))
+    )
+
+
+@get("/securities/{security_id}/candles")
+def get_candles(
+    security_id: int,
+    securities: SecuritiesRepository,
+    trades: TradeStore,
+    interval: str = "1m",
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    limit: int = DEFAULT_LIMIT,
+):
+    """
+    Get the OHLCV candles of a security at an interval, oldest first. Intervals without trades have no candle.
+    :param interval: One of 1s, 1m, 5m, 15m, 1h and 1d.
+    :param start: The earliest start of a candle, in milliseconds since the epoch.
+    :param end: The latest start of a candle, in milliseconds since the epoch.
+    :param limit: The number of candles, from 1 to 1000; the latest candles are returned if there are more.
+    """
+
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f"Limit must be between 1 and {MAX_LIMIT}")
+    try:
+        security = securities.get_security(security_id)
+    except KeyError:
+        return not_found()
+
+    try:
+        bars = trades.bars(
+            security_id,
+            interval,
+            None if start is None else start * 1_000_000,
+            None if end is None else end * 1_000_000,
+            limit,
+        )
+    except ValueError as error:
+        raise BadRequest(str(error))
+
+    return json_response(encode_bars(security, interval, bars))
@@ -0,0 +1,254 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from ..orders.matcher import Execution
+
+# The intervals bars are kept at, by name, in nanoseconds
+SECOND = 1_000_000_000
+INTERVALS = {
+    "1s": SECOND,
+    "1m": 60 * SECOND,
+    "5m": 5 * 60 * SECOND,
+    "15m": 15 * 60 * SECOND,
+    "1h": 60 * 60 * SECOND,
+    "1d": 24 * 60 * 60 * SECOND,
+}
+
+# Trades or bars returned by a query by default, and at most
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+@dataclass(slots=True)
+class Trade:
+    """
+    :param id: The position of the trade in the trades of its security, from 0.
+    :param price: The price of the trade, in ticks.
+    :param timestamp: When the trade was made, in nanoseconds since the epoch.
+    """
+
+    id: int
+    price: int
+    quantity: int
+    timestamp: int
+
+
+@dataclass(slots=True)
+class Bar:
+    """
+    The trades of an interval: the prices of its first and last trades, its highest and lowest prices, in ticks, and
+    the quantity traded.
+    :param start: The start of the interval, in nanoseconds since the epoch.
+    """
+
+    start: int
+    open: int
+    high: int
+    low: int
+    close: int
+    volume: int
+
+
+class Bars:
+    """
+    OHLCV bars of one interval. The bar of the latest trade is updated in place, and moved to the columns of earlier
+    bars once a trade falls in a later interval; intervals without trades have no bar.
+    """
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self.starts = array("q")
+        self.opens = array("q")
+        self.highs = array("q")
+        self.lows = array("q")
+        self.closes = array("q")
+        self.volumes = array("q")
+        self.current: Optional[Bar] = None
+
+    def add(self, timestamp: int, bar: Bar):
+        """
+        Add trades made at the same time, summarised as a bar.
+        """
+
+        start = timestamp - timestamp % self.interval
+        current = self.current
+        # Trades are recorded in time order, but a trade stamped before the last bar, by a clock set back, is counted
+        # in the last bar rather than reopening an earlier one
+        if current is not None and start <= current.start:
+            if bar.high > current.high:
+                current.high = bar.high
+            if bar.low < current.low:
+                current.low = bar.low
+            current.close = bar.close
+            current.volume += bar.volume
+            return
+
+        if current is not None:
+            self.starts.append(current.start)
+            self.opens.append(current.open)
+            self.highs.append(current.high)
+            self.lows.append(current.low)
+            self.closes.append(current.close)
+            self.volumes.append(current.volume)
+        self.current = Bar(start, bar.open, bar.high, bar.low, bar.close, bar.volume)
+
+    def query(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: int = DEFAULT_LIMIT,
+    ) -> List[Bar]:
+        """
+        The bars starting between `start` and `end`, or the latest `limit` of them if there are more.
+        """
+
+        current = self.current
+        with_current = (
+            current is not None
+            and (start is None or current.start >= start)
+            and (end is None or current.start <= end)
+        )
+
+        first = 0 if start is None else bisect_left(self.starts, start)
+        last = len(self.starts) if end is None else bisect_right(self.starts, end)
+        first = max(first, last - (limit - with_current))
+        bars = [
+            Bar(*row)
+            for row in zip(
+                self.starts[first:last],
+                self.opens[first:last],
+                self.highs[first:last],
+                self.lows[first:last],
+                self.closes[first:last],
+                self.volumes[first:last],
+            )
+        ]
+        if with_current:
+            # A copy, as the current bar goes on changing
+            bars.append(
+                Bar(
+                    current.start,
+                    current.open,
+                    current.high,
+                    current.low,
+                    current.close,
+                    current.volume,
+                )
+            )
+        return bars
+
+
+class SecurityTrades:
+    """
+    The trades of a security, in columns, and their bars at each interval.
+    """
+
+    def __init__(self):
+        self.prices = array("q")
+        self.quantities = array("q")
+        self.timestamps = array("q")
+        self.bars: Dict[str, Bars] = {
+            name: Bars(interval) for name, interval in INTERVALS.items()
+        }
+
+    def add(self, timestamp: int, prices: List[int], quantities: List[int]):
+        """
+        Add trades made at the same time, and aggregate them into the bars once for all of them.
+        """
+
+        self.prices.extend(prices)
+        self.quantities.extend(quantities)
+        self.timestamps.extend([timestamp] * len(prices))
+
+        bar = Bar(
+            timestamp, prices[0], max(prices), min(prices), prices[-1], sum(quantities)
+        )
+        for bars in self.bars.values():
+            bars.add(timestamp, bar)
+
+    def query(
+        self, after: Optional[int] = None, limit: int = DEFAULT_LIMIT
+    ) -> List[Trade]:
+        """
+        The trades following the trade `after`, or the latest `limit` trades.
+        """
+
+        if after is None:
+            first = max(len(self.prices) - limit, 0)
+        else:
+            first = max(after + 1, 0)
+        last = min(first + limit, len(self.prices))
+        return [
+            Trade(*row)
+            for row in zip(
+                range(first, last),
+                self.prices[first:last],
+                self.quantities[first:last],
+                self.timestamps[first:last],
+            )
+        ]
+
+
+class TradeStore:
+    """
+    Append-only store of the trades of each security, fed with the executions of the commands applied by the
+    `Sequencer`.
+
+    Trades are kept in columns of integers, and are aggregated into OHLCV bars at each of the `INTERVALS` as they are
+    recorded, so that bars are read from the aggregates instead of being computed from the trades. Both are kept in
+    memory, and start empty when the process starts.
+    """
+
+    def __init__(self):
+        self.securities: Dict[int, SecurityTrades] = {}
+
+    def record(self, security_id: int, timestamp: int, executions: Iterable[Execution]):
+        """
+        Record the executions of a command.
+        :param timestamp: When the command was applied, in nanoseconds since the epoch.
+        """
+
+        prices = []
+        quantities = []
+        for execution in executions:
+            prices.append(execution.price)
+            quantities.append(execution.quantity)
+        if not prices:
+            return
+
+        trades = self.securities.get(security_id)
+        if trades is None:
+            trades = self.securities[security_id] = SecurityTrades()
+        trades.add(timestamp, prices, quantities)
+
+    def trades(
+        self, security_id: int, after: Optional[int] = None, limit: int = DEFAULT_LIMIT
+    ) -> List[Trade]:
+        """
+        The trades of a security following the trade with the ID `after`, oldest first; the latest trades by default.
+        """
+
+        trades = self.securities.get(security_id)
+        return [] if trades is None else trades.query(after, limit)
+
+    def bars(
+        self,
+        security_id: int,
+        interval: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: int = DEFAULT_LIMIT,
+    ) -> List[Bar]:
+        """
+        The bars of a security at an interval, starting between `start` and `end`, oldest first; the latest bars by
+        default.
+        :param interval: The name of one of the `INTERVALS`.
+        :raises ValueError: If the interval is unknown.
+        """
+
+        if interval not in INTERVALS:
+            raise ValueError(f'Unknown interval "{interval}"')
+        trades = self.securities.get(security_id)
+        return [] if trades is None else trades.bars[interval].query(start, end, limit)
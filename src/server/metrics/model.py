@@ -0,0 +1,275 @@
+from dataclasses import dataclass
+from time import perf_counter_ns
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, TypeVar
+
+from ..orders.matcher import BookSize
+
+T = TypeVar("T")
+
+# Values are counted in buckets of 2 ** SUB_BUCKET_BITS per power of two, so each bucket is within 1 / 8 of its values
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Values below this are counted exactly, one bucket each
+EXACT = SUB_BUCKETS << 1
+# Buckets needed for values of up to 63 bits
+BUCKETS = (64 - SUB_BUCKET_BITS) * SUB_BUCKETS
+
+# Upper bounds of the buckets the latencies are exposed with, in nanoseconds, from 1µs to 100ms
+LATENCY_BOUNDS = [
+    scale * 10**exponent
+    for exponent in range(3, 8)
+    for scale in (1, 2.5, 5)
+    if scale * 10**exponent <= 10**8
+]
+COUNT_BOUNDS = [0, 1, 2, 3, 5, 10, 20, 50, 100]
+
+
+@dataclass(frozen=True, eq=False)
+class HistogramFamily:
+    """
+    A histogram exposed per security. Families are compared by identity, which keeps looking up their histograms cheap.
+    :param bounds: The upper bounds of the buckets it is exposed with, in the unit it is recorded in.
+    :param scale: The factor converting the recorded values to the exposed unit.
+    """
+
+    name: str
+    help: str
+    bounds: List[float]
+    scale: float = 1.0
+
+
+MATCH = HistogramFamily(
+    "orderbook_match_duration_seconds",
+    "Time to match a command adding orders to the order book.",
+    LATENCY_BOUNDS,
+    1e-9,
+)
+REPOSITORY_WRITE = HistogramFamily(
+    "order_repository_write_duration_seconds",
+    "Time to write an order, its fills or its cancellation to the order repository.",
+    LATENCY_BOUNDS,
+    1e-9,
+)
+SERIALIZATION = HistogramFamily(
+    "order_serialization_duration_seconds",
+    "Time to encode the response to placing or cancelling an order.",
+    LATENCY_BOUNDS,
+    1e-9,
+)
+FILLS = HistogramFamily(
+    "orderbook_fills_per_order",
+    "Executions produced by an incoming order.",
+    COUNT_BOUNDS,
+)
+HISTOGRAMS = (MATCH, REPOSITORY_WRITE, SERIALIZATION, FILLS)
+
+
+class Histogram:
+    """
+    Counts of non-negative integers in log-linear buckets, as in an HDR histogram: values are counted exactly up to
+    `EXACT`, then in `SUB_BUCKETS` buckets per power of two, so recording a value is a few integer operations and the
+    relative error of a quantile is bounded whatever the range of the values.
+    """
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.sum = 0
+
+    def record(self, value: int):
+        self.count += 1
+        self.sum += value
+        if value < EXACT:
+            self.counts[value] += 1
+        else:
+            shift = value.bit_length() - SUB_BUCKET_BITS - 1
+            self.counts[(shift << SUB_BUCKET_BITS) + (value >> shift)] += 1
+
+    @staticmethod
+    def upper_bound(index: int) -> int:
+        """
+        The largest value counted in a bucket.
+        """
+
+        if index < EXACT:
+            return index
+        shift = (index >> SUB_BUCKET_BITS) - 1
+        return ((index - (shift << SUB_BUCKET_BITS) + 1) << shift) - 1
+
+    def quantile(self, quantile: float) -> int:
+        """
+        The upper bound of the bucket of the value at a quantile, or 0 if nothing was recorded.
+        """
+
+        rank = max(quantile * self.count, 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.upper_bound(index)
+        return 0
+
+    def cumulative(self, bounds: Iterable[float]) -> List[int]:
+        """
+        The number of values in the buckets whose upper bound is at most each bound, as counted by the buckets of a
+        Prometheus histogram. A bucket straddling a bound is counted in the next one.
+        """
+
+        counts = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            while index < BUCKETS and self.upper_bound(index) <= bound:
+                seen += self.counts[index]
+                index += 1
+            counts.append(seen)
+        return counts
+
+
+class SecurityMetrics:
+    """
+    The histograms of every family, and the counters, of one security.
+    :param levels_touched: The price levels changed by matching orders.
+    """
+
+    __slots__ = ("histograms", "orders_matched", "levels_touched")
+
+    def __init__(self):
+        self.histograms: Dict[HistogramFamily, Histogram] = {
+            family: Histogram() for family in HISTOGRAMS
+        }
+        self.orders_matched = 0
+        self.levels_touched = 0
+
+
+class Metrics:
+    """
+    Latency histograms and counters of the hot path of the exchange, per security, exposed in the Prometheus text
+    format.
+
+    Disabled metrics record nothing: the components recording them check `enabled`, or are given no metrics at all,
+    before reading the clock.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.securities: Dict[int, SecurityMetrics] = {}
+
+    def security(self, security_id: int) -> SecurityMetrics:
+        security = self.securities.get(security_id)
+        if security is None:
+            security = self.securities[security_id] = SecurityMetrics()
+        return security
+
+    def histogram(self, family: HistogramFamily, security_id: int) -> Histogram:
+        return self.security(security_id).histograms[family]
+
+    def timed(
+        self,
+        family: HistogramFamily,
+        security_id: int,
+        function: Callable[..., T],
+        *args,
+    ) -> T:
+        """
+        Call a function, recording how long it took in nanoseconds if the metrics are enabled.
+        """
+
+        if not self.enabled:
+            return function(*args)
+        start = perf_counter_ns()
+        result = function(*args)
+        self.histogram(family, security_id).record(perf_counter_ns() - start)
+        return result
+
+    def record_match(
+        self, security_id: int, duration: int, fills: Iterable[int], levels: int
+    ):
+        """
+        Record a command adding orders to an order book.
+        :param duration: How long matching the command took, in nanoseconds.
+        :param fills: The number of executions of each of its orders.
+        :param levels: The number of price levels it changed.
+        """
+
+        security = self.security(security_id)
+        histograms = security.histograms
+        histograms[MATCH].record(duration)
+        record_fills = histograms[FILLS].record
+        orders = 0
+        for count in fills:
+            record_fills(count)
+            orders += 1
+        security.orders_matched += orders
+        security.levels_touched += levels
+
+    def render(self, books: Optional[Mapping[int, BookSize]] = None) -> str:
+        """
+        The metrics in the Prometheus text format, with the depth of the order books as gauges.
+        :param books: The size of the order book of each security.
+        """
+
+        securities = sorted(self.securities.items())
+        lines = []
+        for family in HISTOGRAMS:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} histogram")
+            for security_id, security in securities:
+                histogram = security.histograms[family]
+                labels = f'security_id="{security_id}"'
+                for bound, count in zip(
+                    family.bounds, histogram.cumulative(family.bounds)
+                ):
+                    lines.append(
+                        f'{family.name}_bucket{{{labels},le="{bound * family.scale:g}"}} {count}'
+                    )
+                lines.append(
+                    f'{family.name}_bucket{{{labels},le="+Inf"}} {histogram.count}'
+                )
+                lines.append(
+                    f"{family.name}_sum{{{labels}}} {histogram.sum * family.scale:g}"
+                )
+                lines.append(f"{family.name}_count{{{labels}}} {histogram.count}")
+
+        for name, help, attribute in (
+            (
+                "orderbook_orders_matched_total",
+                "Orders matched against the order book.",
+                "orders_matched",
+            ),
+            (
+                "orderbook_levels_touched_total",
+                "Price levels changed by matching orders.",
+                "levels_touched",
+            ),
+        ):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} counter")
+            for security_id, security in securities:
+                lines.append(
+                    f'{name}{{security_id="{security_id}"}} {getattr(security, attribute)}'
+                )
+
+        if books is not None:
+            lines.append(
+                "# HELP orderbook_price_levels Price levels with resting orders."
+            )
+            lines.append("# TYPE orderbook_price_levels gauge")
+            for security_id, book in sorted(books.items()):
+                for side, levels in (
+                    ("bid", book.bid_levels),
+                    ("ask", book.ask_levels),
+                ):
+                    lines.append(
+                        f'orderbook_price_levels{{security_id="{security_id}",side="{side}"}} {levels}'
+                    )
+            lines.append("# HELP orderbook_resting_orders Orders resting in the book.")
+            lines.append("# TYPE orderbook_resting_orders gauge")
+            for security_id, book in sorted(books.items()):
+                lines.append(
+                    f'orderbook_resting_orders{{security_id="{security_id}"}} {book.resting_orders}'
+                )
+
+        return "\n".join(lines) + "\n"
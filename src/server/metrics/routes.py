@@ -0,0 +1,32 @@
+import asyncio
+
+from blacksheep import Content, Response, get, not_found
+
+from ..orders.sequencer import ReadBookSize, Sequencer
+from ..securities.model import SecuritiesRepository
+from .model import Metrics
+
+CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+
+
+@get("/metrics")
+async def get_metrics(
+    metrics: Metrics, sequencer: Sequencer, securities: SecuritiesRepository
+):
+    """
+    Latency histograms of matching, order repository writes and response encoding, fills per order, price levels
+    touched and the depth of each order book, in the Prometheus text format. 404 if metrics are disabled.
+    """
+    if not metrics.enabled:
+        return not_found()
+
+    # The books are read from the sequencer, as they live in the matcher workers when there are any
+    security_ids = [security.id for security in securities.list_securities()]
+    sizes = await asyncio.gather(
+        *(sequencer.read(ReadBookSize(security_id)) for security_id in security_ids)
+    )
+    return Response(
+        200,
+        None,
+        Content(CONTENT_TYPE, metrics.render(dict(zip(security_ids, sizes))).encode()),
+    )
@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .model import Side
+
+if TYPE_CHECKING:
+    from .matcher import LevelUpdate, Matcher
+
+# Commands whose level updates are kept for the next read; a cache read less often than this is rebuilt instead
+MAX_PENDING = 1024
+
+# A price level of a depth view: its price, in ticks, and its aggregate quantity
+Level = Tuple[int, int]
+
+
+@dataclass
+class BookDepth:
+    """
+    Price levels of both sides of a book, best price first, as read after the command numbered `sequence`.
+    """
+
+    sequence: int
+    asks: List[Level]
+    bids: List[Level]
+
+
+@dataclass
+class CachedSide:
+    """
+    The best price levels of one side of a book, best price first.
+    :param depth: The number of levels asked for when the side was cached.
+    :param complete: Whether the book side had no more levels than the cache holds, so that a new level at any price
+        is part of the view.
+    :param index: The position of each cached level by price.
+    """
+
+    depth: int
+    levels: List[Level]
+    complete: bool
+    index: Dict[int, int]
+
+
+class DepthCache:
+    """
+    The top price levels of both sides of a book, kept from one read to the next.
+
+    The matcher hands the cache the level updates of each command. They are applied on the next read: a change of
+    quantity at a cached level is patched in place, a change beyond the cached levels is ignored, and a level added or
+    removed within them drops the cached side, which is rebuilt from the book's level aggregates.
+    """
+
+    def __init__(self, matcher: "Matcher"):
+        self.matcher = matcher
+        self.pending: List[List["LevelUpdate"]] = []
+        self.sides: Dict[Side, Optional[CachedSide]] = {Side.SELL: None, Side.BUY: None}
+
+    def add(self, updates: List["LevelUpdate"]):
+        """
+        Hand over the list the matcher records the level updates of a command in.
+        """
+
+        self.pending.append(updates)
+        if len(self.pending) > MAX_PENDING:
+            self.pending.clear()
+            self.sides = {Side.SELL: None, Side.BUY: None}
+
+    def get(self, depth: int) -> Tuple[List[Level], List[Level]]:
+        """
+        The best `depth` levels of the asks and of the bids, best price first.
+        """
+
+        if depth < 1:
+            raise ValueError(f"Invalid depth {depth}")
+        if self.pending:
+            self._apply()
+
+        return self._get(Side.SELL, depth), self._get(Side.BUY, depth)
+
+    def _get(self, side: Side, depth: int) -> List[Level]:
+        cached = self.sides[side]
+        if cached is None or cached.depth < depth:
+            cached = self.sides[side] = self._build(side, depth)
+        return cached.levels[:depth]
+
+    def _build(self, side: Side, depth: int) -> CachedSide:
+        if side == Side.SELL:
+            book = self.matcher.asks
+            prices = islice(book, depth)
+        else:
+            book = self.matcher.bids
+            prices = islice(reversed(book), depth)
+
+        levels = [(price, book[price].quantity) for price in prices]
+        return CachedSide(
+            depth=depth,
+            levels=levels,
+            complete=len(book) <= depth,
+            index={price: position for position, (price, _) in enumerate(levels)},
+        )
+
+    def _apply(self):
+        sides = self.sides
+        for updates in self.pending:
+            for update in updates:
+                cached = sides[update.side]
+                if cached is None:
+                    continue
+
+                position = cached.index.get(update.price)
+                if position is not None:
+                    if update.quantity:
+                        cached.levels[position] = (update.price, update.quantity)
+                        continue
+                elif not cached.complete:
+                    worst = cached.levels[-1][0]
+                    if (
+                        update.price > worst
+                        if update.side == Side.SELL
+                        else update.price < worst
+                    ):
+                        continue
+
+                # A level was added or removed within the cached levels
+                sides[update.side] = None
+
+        self.pending.clear()
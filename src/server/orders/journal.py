@@ -0,0 +1,445 @@
+import asyncio
+import os
+import struct
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .matcher import BatchResult, Execution, MatchResult, RootMatcher
+from .model import Order, OrderRepository, OrderType, Side, TimeInForce
+from .risk import OrderRejected
+from .sequencer import AddOrder, AddOrders, CancelOrder, Command
+
+# Every record starts with its kind, the size of its payload and the CRC-32 of its payload
+HEADER = struct.Struct("<BII")
+
+# Payloads. Order IDs are variable-length, and follow the fixed part of the payload as UTF-8
+ORDER = 1
+# sequence, client, security, side, type, quantity, has price, price, time in force, has stop price, stop price
+ORDER_PAYLOAD = struct.Struct("<QqiBBq?qB?q")
+CANCEL = 2
+# sequence, security
+CANCEL_PAYLOAD = struct.Struct("<Qi")
+EXECUTION = 3
+# sequence, security, maker, taker, price, quantity
+EXECUTION_PAYLOAD = struct.Struct("<Qiqqqq")
+KINDS = (ORDER, CANCEL, EXECUTION)
+
+SIDES = list(Side)
+ORDER_TYPES = list(OrderType)
+TIMES_IN_FORCE = list(TimeInForce)
+
+# Orders replayed into a matcher in one call to `Matcher.add_batch`
+REPLAY_BATCH = 4096
+
+
+def record(kind: int, payload: bytes) -> bytes:
+    return HEADER.pack(kind, len(payload), zlib.crc32(payload)) + payload
+
+
+def encode_order(sequence: int, order: Order) -> bytes:
+    return record(
+        ORDER,
+        ORDER_PAYLOAD.pack(
+            sequence,
+            order.client_id,
+            order.security_id,
+            SIDES.index(order.side),
+            ORDER_TYPES.index(order.type),
+            order.quantity,
+            order.price is not None,
+            order.price or 0,
+            TIMES_IN_FORCE.index(order.time_in_force),
+            order.stop_price is not None,
+            order.stop_price or 0,
+        )
+        + order.id.encode(),
+    )
+
+
+def encode_cancel(sequence: int, security_id: int, order_id: str) -> bytes:
+    return record(
+        CANCEL, CANCEL_PAYLOAD.pack(sequence, security_id) + order_id.encode()
+    )
+
+
+def encode_executions(
+    sequence: int, security_id: int, executions: Iterable[Execution]
+) -> List[bytes]:
+    return [
+        record(
+            EXECUTION,
+            EXECUTION_PAYLOAD.pack(
+                sequence,
+                security_id,
+                execution.maker_id,
+                execution.taker_id,
+                execution.price,
+                execution.quantity,
+            ),
+        )
+        for execution in executions
+    ]
+
+
+def encode_command(command: Command) -> List[bytes]:
+    """
+    The journal records of a command itself: one per order it adds, or its cancel. They do not depend on the result of
+    the command, so they can be encoded before it is applied.
+    """
+
+    if isinstance(command, AddOrder):
+        return [encode_order(command.sequence, command.order)]
+    if isinstance(command, AddOrders):
+        return [
+            encode_order(command.sequence + index, order)
+            for index, order in enumerate(command.orders)
+        ]
+    if isinstance(command, CancelOrder):
+        return [encode_cancel(command.sequence, command.security_id, command.order_id)]
+
+    raise TypeError(f"Cannot journal {type(command).__name__}")
+
+
+def encode(
+    command: Command, result: Any, records: Optional[List[bytes]] = None
+) -> List[bytes]:
+    """
+    The journal records of a command that was applied, followed by the records of the executions it produced,
+    including those of the stop orders it triggered.
+    :param records: The records of the command itself, if already encoded by `encode_command`.
+    """
+
+    if records is None:
+        records = encode_command(command)
+
+    if isinstance(command, AddOrder):
+        result: MatchResult
+        return [
+            *records,
+            *encode_executions(
+                command.sequence, command.security_id, command.executions(result)
+            ),
+        ]
+    if isinstance(command, AddOrders):
+        result: BatchResult
+        batch = []
+        for index, (order, executions, triggered) in enumerate(
+            zip(records, result.executions, result.triggered)
+        ):
+            batch.append(order)
+            batch.extend(
+                encode_executions(
+                    command.sequence + index, command.security_id, executions
+                )
+            )
+            for stop in triggered:
+                batch.extend(
+                    encode_executions(
+                        command.sequence + index, command.security_id, stop.executions
+                    )
+                )
+        return batch
+    return records
+
+
+class JournalReader:
+    """
+    Decodes the records of a journal, as `(kind, sequence, value)` triples where the value is an `Order` for orders,
+    a `(security_id, order_id)` pair for cancels and a `(security_id, Execution)` pair for executions.
+
+    Reading stops at the first incomplete or corrupt record, which is what a crash in the middle of a write leaves at
+    the end of the journal. `end` is then the offset of the end of the last valid record.
+    :param kinds: The kinds of records to decode; the others are checked and skipped. All kinds by default.
+    """
+
+    def __init__(self, data: bytes, kinds: Iterable[int] = KINDS):
+        self.data = data
+        self.kinds = frozenset(kinds)
+        self.end = 0
+
+    def __iter__(self) -> Iterator[Tuple[int, int, Any]]:
+        data = memoryview(self.data)
+        size = len(data)
+        kinds = self.kinds
+        offset = 0
+
+        # Hoisted out of the loop, which runs once per record
+        header_size = HEADER.size
+        unpack_header = HEADER.unpack_from
+        unpack_order = ORDER_PAYLOAD.unpack_from
+        unpack_cancel = CANCEL_PAYLOAD.unpack_from
+        unpack_execution = EXECUTION_PAYLOAD.unpack_from
+        order_size = ORDER_PAYLOAD.size
+        cancel_size = CANCEL_PAYLOAD.size
+        crc32 = zlib.crc32
+
+        while offset + header_size <= size:
+            kind, length, crc = unpack_header(data, offset)
+            start = offset + header_size
+            payload = data[start : start + length]
+            if len(payload) < length or crc32(payload) != crc:
+                break
+            if kind not in kinds:
+                if kind not in KINDS:
+                    break
+                offset = self.end = start + length
+                continue
+
+            if kind == ORDER:
+                (
+                    sequence,
+                    client_id,
+                    security_id,
+                    side,
+                    order_type,
+                    quantity,
+                    has_price,
+                    price,
+                    time_in_force,
+                    has_stop_price,
+                    stop_price,
+                ) = unpack_order(payload)
+                value = Order(
+                    id=str(payload[order_size:], "utf-8"),
+                    client_id=client_id,
+                    security_id=security_id,
+                    side=SIDES[side],
+                    quantity=quantity,
+                    type=ORDER_TYPES[order_type],
+                    price=price if has_price else None,
+                    time_in_force=TIMES_IN_FORCE[time_in_force],
+                    stop_price=stop_price if has_stop_price else None,
+                )
+            elif kind == CANCEL:
+                sequence, security_id = unpack_cancel(payload)
+                value = (security_id, str(payload[cancel_size:], "utf-8"))
+            else:
+                sequence, security_id, maker_id, taker_id, price, quantity = (
+                    unpack_execution(payload)
+                )
+                value = (
+                    security_id,
+                    Execution(
+                        maker_id=maker_id,
+                        taker_id=taker_id,
+                        price=price,
+                        quantity=quantity,
+                    ),
+                )
+
+            offset = self.end = start + length
+            yield kind, sequence, value
+
+
+def replay(
+    path: str,
+    root_matcher: RootMatcher,
+    order_repository: Optional[OrderRepository] = None,
+    offset: int = 0,
+) -> int:
+    """
+    Rebuild the order books, and optionally the order store, by applying the orders and cancels of a journal again.
+    Matching is deterministic, so the executions are produced again rather than read back from the journal.
+
+    An incomplete record left at the end of the journal by a crash is truncated, so that new records follow the last
+    valid one.
+    :param offset: The position in the journal to replay from, such as the position recorded by a snapshot.
+    :return: The sequence number of the last command replayed, or 0 if there is none.
+    """
+
+    if not os.path.exists(path):
+        return 0
+
+    # Executions are produced again by matching, so their records are not decoded
+    with open(path, "rb") as file:
+        file.seek(offset)
+        reader = JournalReader(file.read(), kinds=(ORDER, CANCEL))
+
+    last_sequence = 0
+    pending: Dict[int, List[Order]] = {}
+
+    # Matches and cancels are recorded in the order store as the sequencer records them. Orders are created as they are
+    # read, so that they are numbered in the order they were journaled
+    def flush(security_id: int):
+        orders = pending.pop(security_id, None)
+        if orders:
+            command = AddOrders(security_id=security_id, orders=orders)
+            result = command.apply(root_matcher.get_matcher(security_id))
+            if order_repository is not None:
+                command.record_matches(result, order_repository)
+
+    for kind, sequence, value in reader:
+        if kind == ORDER:
+            if order_repository is not None:
+                order_repository.create_order(value)
+            orders = pending.setdefault(value.security_id, [])
+            orders.append(value)
+            if len(orders) == REPLAY_BATCH:
+                flush(value.security_id)
+        elif kind == CANCEL:
+            security_id, order_id = value
+            flush(security_id)
+            command = CancelOrder(security_id=security_id, order_id=order_id)
+            cancelled = command.apply(root_matcher.get_matcher(security_id))
+            if order_repository is not None:
+                command.record(cancelled, order_repository)
+        # Commands for different securities are journaled in the order they were applied, not sequenced
+        if sequence > last_sequence:
+            last_sequence = sequence
+
+    for security_id in list(pending):
+        flush(security_id)
+
+    if reader.end < len(reader.data):
+        os.truncate(path, offset + reader.end)
+
+    return last_sequence
+
+
+class Journal:
+    """
+    Append-only journal of the commands applied by the `Sequencer`, and of the executions they produced.
+
+    Records are buffered as commands are applied, and written out by a single flusher task which syncs them to disk
+    with one fsync per group: all the records buffered while the previous group was being written are committed
+    together. Callers wait for their group with `sync`, so the cost of an fsync is shared by all the commands
+    applied while it runs, rather than added to each of them.
+
+    If a group cannot be written, the journal is truncated back to the end of the last group on disk, so that no part
+    of a record is left for replay to stop at, and the journal fails: the commands of the failed group and of the
+    groups after it get the error, and no further command is accepted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.flusher: Optional[asyncio.Task] = None
+        self.buffer: List[bytes] = []
+        self.ready = asyncio.Event()
+        # Size of the journal, including the records still buffered
+        self.size = 0
+        # Number of records appended, and of records known to be on disk, and the size of the journal on disk
+        self.written = 0
+        self.synced = 0
+        self.synced_size = 0
+        # Why the journal failed, after which it accepts no more commands
+        self.error: Optional[Exception] = None
+        # The group being written, which covers the records up to `flushing_until`, and the group being buffered
+        self.flushing: Optional[asyncio.Future] = None
+        self.flushing_until = 0
+        self.group: Optional[asyncio.Future] = None
+
+    def open(self):
+        """
+        Open the journal for appending, and start the flusher.
+        """
+
+        self.file = open(self.path, "ab")
+        self.size = self.synced_size = self.file.seek(0, os.SEEK_END)
+        self.flusher = asyncio.create_task(self._flush(), name="journal")
+
+    def prepare(self, command: Command) -> List[bytes]:
+        """
+        Encode the records of a command before it is applied, to be passed to `append` once it is. A command that cannot
+        be journaled is rejected without changing the book, rather than applied and lost on a restart.
+        :raises OrderRejected: If the command does not fit its records, such as an order with a price out of range.
+        :raises RuntimeError: If the journal failed.
+        """
+
+        if self.error is not None:
+            raise RuntimeError(f"Journal {self.path} failed: {self.error}")
+        try:
+            return encode_command(command)
+        except struct.error as error:
+            raise OrderRejected(f"Order cannot be journaled: {error}")
+
+    def append(
+        self, command: Command, result: Any, records: Optional[List[bytes]] = None
+    ):
+        """
+        Buffer the records of a command that was applied. They are written out by the next group commit.
+        :param records: The records of the command itself, as returned by `prepare`.
+        """
+
+        records = encode(command, result, records)
+        self.buffer.extend(records)
+        self.size += sum(map(len, records))
+        self.written += len(records)
+        self.ready.set()
+
+    async def sync(self):
+        """
+        Wait until all the records appended so far are on disk.
+        :raises RuntimeError: If the journal failed, and they may not be.
+        """
+
+        if self.error is not None:
+            raise RuntimeError(f"Journal {self.path} failed: {self.error}")
+        if self.synced >= self.written:
+            return
+        if self.flushing is not None and self.flushing_until >= self.written:
+            await asyncio.shield(self.flushing)
+            return
+        if self.group is None:
+            self.group = asyncio.get_running_loop().create_future()
+        await asyncio.shield(self.group)
+
+    async def close(self):
+        """
+        Write out the records appended so far, then stop the flusher and close the journal.
+        """
+
+        if self.flusher is None:
+            return
+
+        if self.error is None:
+            await self.sync()
+        self.flusher.cancel()
+        await asyncio.gather(self.flusher, return_exceptions=True)
+        self.file.close()
+        self.flusher = self.file = None
+
+    async def _flush(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+
+            records, self.buffer = self.buffer, []
+            self.flushing = self.group or asyncio.get_running_loop().create_future()
+            self.group = None
+            self.flushing_until = self.written
+            size = self.size
+
+            try:
+                await asyncio.to_thread(self._write, b"".join(records))
+            except Exception as error:
+                self.error = error
+                self.size = self.synced_size
+                await asyncio.to_thread(self._truncate)
+                # Records appended while the group was being written are lost with it
+                for group in (self.flushing, self.group):
+                    if group is not None:
+                        group.set_exception(error)
+                self.flushing = self.group = None
+                return
+            self.synced = self.flushing_until
+            self.synced_size = size
+            self.flushing.set_result(None)
+            self.flushing = None
+
+    def _write(self, data: bytes):
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _truncate(self):
+        # The buffered writer may still hold part of the group, so it is closed before the file is truncated. If that
+        # fails too, replay drops an incomplete record at the end of the journal anyway
+        try:
+            self.file.close()
+        except OSError:
+            pass
+        try:
+            os.truncate(self.path, self.synced_size)
+        except OSError:
+            pass
@@ -0,0 +1,219 @@
+from collections.abc import MutableMapping
+from itertools import chain
+from typing import Generic, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+from sortedcontainers import SortedDict
+
+V = TypeVar("V")
+
+# Number of ticks covered by a new ladder, and by the largest one
+LADDER_WIDTH = 1024
+MAX_LADDER_WIDTH = 1 << 16
+
+
+class PriceLadder(MutableMapping, Generic[V]):
+    """
+    One side of an order book, stored as an array of slots indexed by tick offset from a base price.
+
+    For liquid securities, resting prices cluster in a narrow band of ticks around the touch, so indexing an array by
+    price makes inserting, looking up and removing a level O(1). The lowest and highest occupied slots are tracked, so
+    the best bid or ask is always at hand; when it is removed, the next one is found by scanning the (typically few)
+    empty slots behind it.
+
+    When a price falls outside the array, the ladder is re-centred on the occupied prices, doubling its width if they
+    span more than half of it, up to `MAX_LADDER_WIDTH` ticks. Prices that would not fit even then, such as an order far
+    away from the rest of the book, are kept in an overflow `SortedDict` instead. Overflow prices are always outside the
+    array, so they sort before or after all of its prices.
+
+    Implements the `SortedDict` interface used by `Matcher`, so it can back either side of an `OrderBook`.
+    """
+
+    def __init__(
+        self, levels: Optional[Mapping[int, V]] = None, width: int = LADDER_WIDTH
+    ):
+        self.slots: List[Optional[V]] = [None] * width
+        # Price of the first slot
+        self.base = 0
+        # Slots of the lowest and highest occupied prices, only meaningful when the ladder is not empty
+        self.low = 0
+        self.high = 0
+        self.size = 0
+        self.overflow: SortedDict[int, V] = SortedDict()
+
+        if levels is not None:
+            for price, level in levels.items():
+                self[price] = level
+
+    def get(self, price: int, default=None):
+        index = price - self.base
+        if 0 <= index < len(self.slots):
+            level = self.slots[index]
+            if level is not None:
+                return level
+            return default
+        return self.overflow.get(price, default)
+
+    def __getitem__(self, price: int) -> V:
+        level = self.get(price)
+        if level is None:
+            raise KeyError(price)
+        return level
+
+    def __setitem__(self, price: int, level: V):
+        index = price - self.base
+        if not 0 <= index < len(self.slots):
+            if price in self.overflow or not self._recenter(price):
+                self.overflow[price] = level
+                return
+            index = price - self.base
+        self._set(index, level)
+
+    def _set(self, index: int, level: V):
+        if self.slots[index] is None:
+            if self.size == 0:
+                self.low = self.high = index
+            elif index < self.low:
+                self.low = index
+            elif index > self.high:
+                self.high = index
+            self.size += 1
+
+        self.slots[index] = level
+
+    def __delitem__(self, price: int):
+        index = price - self.base
+        if not 0 <= index < len(self.slots):
+            del self.overflow[price]
+            return
+        if self.slots[index] is None:
+            raise KeyError(price)
+
+        self.slots[index] = None
+        self.size -= 1
+        if self.size == 0:
+            return
+
+        # Move the best price pointers to the next occupied slots
+        slots = self.slots
+        if index == self.low:
+            while slots[self.low] is None:
+                self.low += 1
+        elif index == self.high:
+            while slots[self.high] is None:
+                self.high -= 1
+
+    def __len__(self) -> int:
+        return self.size + len(self.overflow)
+
+    def __iter__(self) -> Iterator[int]:
+        return self.irange()
+
+    def __reversed__(self) -> Iterator[int]:
+        return self.irange(reverse=True)
+
+    def irange(
+        self,
+        minimum: Optional[int] = None,
+        maximum: Optional[int] = None,
+        reverse: bool = False,
+    ) -> Iterator[int]:
+        """
+        Iterate over the occupied prices between `minimum` and `maximum` inclusive, in ascending order unless
+        `reverse` is set.
+        """
+
+        if self.size == 0:
+            prices = iter(())
+        else:
+            start = self.low if minimum is None else max(self.low, minimum - self.base)
+            stop = self.high if maximum is None else min(self.high, maximum - self.base)
+            indices = range(stop, start - 1, -1) if reverse else range(start, stop + 1)
+            slots, base = self.slots, self.base
+            prices = (base + index for index in indices if slots[index] is not None)
+
+        if not self.overflow:
+            return prices
+
+        # Overflow prices below the array come before its prices, and those above it after
+        below = self.overflow.irange(
+            minimum,
+            self.base - 1 if maximum is None else min(maximum, self.base - 1),
+            reverse=reverse,
+        )
+        above = self.overflow.irange(
+            self.base + len(self.slots)
+            if minimum is None
+            else max(minimum, self.base + len(self.slots)),
+            maximum,
+            reverse=reverse,
+        )
+        return chain(above, prices, below) if reverse else chain(below, prices, above)
+
+    def peekitem(self, index: int = -1) -> Tuple[int, V]:
+        """
+        Return the lowest (index 0) or highest (index -1) price and its level.
+        """
+
+        if index not in (0, -1):
+            raise IndexError(f"Unsupported index {index}")
+        if self.overflow:
+            # An overflow price is the lowest or highest price if it is beyond the array on that side, or if the array
+            # is empty
+            price, level = self.overflow.peekitem(index)
+            if self.size == 0 or (
+                price < self.base
+                if index == 0
+                else price >= self.base + len(self.slots)
+            ):
+                return price, level
+        elif self.size == 0:
+            raise IndexError("peekitem on empty ladder")
+        if index == 0:
+            return self.base + self.low, self.slots[self.low]
+        return self.base + self.high, self.slots[self.high]
+
+    def _recenter(self, price: int) -> bool:
+        """
+        Move the slots so that both `price` and the occupied prices fit in the array with room to spare on either
+        side, growing the array if needed, and move the overflow prices the array then covers into it.
+        :return: False, leaving the slots as they are, if the prices span more than `MAX_LADDER_WIDTH` ticks.
+        """
+
+        width = len(self.slots)
+
+        if self.size == 0:
+            self.base = price - width // 2
+            self._take_overflow()
+            return True
+
+        low = min(price, self.base + self.low)
+        high = max(price, self.base + self.high)
+        span = high - low + 1
+        if span > MAX_LADDER_WIDTH:
+            return False
+        while width < 2 * span and width < MAX_LADDER_WIDTH:
+            width *= 2
+
+        base = low - (width - span) // 2
+        slots: List[Optional[V]] = [None] * width
+        shift = self.base - base
+        slots[self.low + shift : self.high + shift + 1] = self.slots[
+            self.low : self.high + 1
+        ]
+
+        self.slots = slots
+        self.base = base
+        self.low += shift
+        self.high += shift
+        self._take_overflow()
+        return True
+
+    def _take_overflow(self):
+        overflow = self.overflow
+        if overflow:
+            base = self.base
+            for price in list(overflow.irange(base, base + len(self.slots) - 1)):
+                self._set(price - base, overflow.pop(price))
+
+    def __repr__(self):
+        return f"PriceLadder({dict(self.items())})"
@@ -1,44 +1,189 @@
+import asyncio
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Optional
 from uuid import uuid4
 
-from .model import OrderRepository, Order, OrderType, Side
+from .matcher import Execution, TriggeredOrder
+from .model import (
+    OrderPage,
+    OrderRepository,
+    Order,
+    OrderStatus,
+    OrderType,
+    Side,
+    TimeInForce,
+)
+from .risk import RiskChecker
+from .sequencer import AddOrder, AddOrders, CancelOrder, Sequencer
 
 
 @dataclass
 class CreateOrderInput:
+    """
+    :param price: The limit price, in ticks of the security.
+    :param stop_price: The stop price of a stop order, in ticks of the security.
+    """
+
     client_id: int
     security_id: int
     side: Side
     quantity: int
     type: OrderType
-    price: float
+    price: Optional[int] = None
+    time_in_force: TimeInForce = TimeInForce.gtc
+    stop_price: Optional[int] = None
+
+
+@dataclass
+class CreateOrderResult:
+    """
+    The outcome of placing an order.
+    :param sequence: The global sequence number assigned to the order by the sequencer.
+    :param executions: The trades produced by matching the order on arrival.
+    :param resting_quantity: The quantity of the order left resting in the order book.
+    """
+
+    order: Order
+    sequence: int
+    executions: List[Execution]
+    resting_quantity: int
 
 
 class OrderManager:
-    def __init__(self, order_repository: OrderRepository):
+    """
+    Places and cancels orders through the sequencer, which records them in the order repository as it applies them.
+    """
+
+    def __init__(
+        self,
+        order_repository: OrderRepository,
+        sequencer: Sequencer,
+        risk: RiskChecker,
+    ):
         self.order_repository = order_repository
+        self.sequencer = sequencer
+        self.risk = risk
 
-    def create_order(self, order: CreateOrderInput):
-        # 1. Persist the order in the repository
-        order = self.order_repository.create_order(
-            Order(
-                id=str(uuid4()),
-                client_id=order.client_id,
-                security_id=order.security_id,
-                side=order.side,
-                quantity=order.quantity,
-                type=order.type,
-                price=order.price,
-            )
+    async def create_order(self, order: CreateOrderInput) -> CreateOrderResult:
+        """
+        :raises OrderRejected: If the order fails a pre-trade risk check.
+        """
+
+        # 1. Check the order against the risk limits, and count it towards them
+        self.risk.check(order)
+        order = self._new_order(order)
+        self.order_repository.accept(order)
+
+        # 2. Send the order to the matching engine to produce the new order book, which records the order and its
+        # fills in the repository
+        command = AddOrder(order)
+        try:
+            result = await self.sequencer.submit(command)
+        finally:
+            self.order_repository.release(order.id)
+
+        # 3. Move the price bands to the trades of the order, and of the stop orders they triggered
+        self.risk.record_executions(order.security_id, result.executions)
+        if result.triggered:
+            self._record_triggered(order.security_id, result.triggered)
+
+        return CreateOrderResult(
+            order=order,
+            sequence=command.sequence,
+            executions=result.executions,
+            resting_quantity=0 if result.resting is None else result.resting.quantity,
         )
 
-        # 2. Send the order to the matching engine to produce the new order book
+    async def create_orders(
+        self, orders: List[CreateOrderInput]
+    ) -> List[CreateOrderResult]:
+        """
+        Place a batch of orders, which may be for different securities.
+        The orders of each security are sent to the matching engine together, as a single command.
+        :return: The results, in the same order as the orders.
+        :raises OrderRejected: If any of the orders fails a pre-trade risk check, in which case none is placed.
+        """
+
+        # 1. Check the orders against the risk limits, and count them towards them
+        self.risk.check_batch(orders)
+        orders = [self._new_order(order) for order in orders]
+        for order in orders:
+            self.order_repository.accept(order)
 
+        # 2. Send the orders of each security to the matching engine in one go
+        groups: Dict[int, List[Order]] = {}
+        for order in orders:
+            groups.setdefault(order.security_id, []).append(order)
+
+        commands = [
+            AddOrders(security_id=security_id, orders=group)
+            for security_id, group in groups.items()
+        ]
+        try:
+            batches = await asyncio.gather(*map(self.sequencer.submit, commands))
+        finally:
+            for order in orders:
+                self.order_repository.release(order.id)
+
+        results: Dict[str, CreateOrderResult] = {}
+        for command, batch in zip(commands, batches):
+            security_id = command.security_id
+            for index, order in enumerate(command.orders):
+                self.risk.record_executions(security_id, batch.executions[index])
+                if batch.triggered[index]:
+                    self._record_triggered(security_id, batch.triggered[index])
+                results[order.id] = CreateOrderResult(
+                    order=order,
+                    sequence=command.sequence + index,
+                    executions=batch.executions[index],
+                    resting_quantity=batch.resting_quantities[index],
+                )
+
+        return [results[order.id] for order in orders]
+
+    async def cancel_order(self, order_id: str) -> Optional[Order]:
+        """
+        Cancel the remainder of an order, removing it from the order book.
+        :return: The order, cancelled unless it had been filled or cancelled already, or None if it is unknown.
+        """
+
+        order = self.order_repository.get_order(order_id)
+        if order is None:
+            return None
+
+        if order.status in (OrderStatus.open, OrderStatus.partially_filled):
+            await self.sequencer.submit(
+                CancelOrder(security_id=order.security_id, order_id=order_id)
+            )
         return order
 
-    def get_order(self, order_id: int) -> Order:
+    def get_order(self, order_id: str) -> Order:
         return self.order_repository.get_order(order_id)
 
     def list_orders(self) -> List[Order]:
         return self.order_repository.list_orders()
+
+    def query_orders(self, **filters) -> OrderPage:
+        """
+        A page of orders, as returned by `OrderRepository.query`.
+        """
+
+        return self.order_repository.query(**filters)
+
+    def _record_triggered(self, security_id: int, triggered: List[TriggeredOrder]):
+        for stop in triggered:
+            self.risk.record_executions(security_id, stop.executions)
+
+    @staticmethod
+    def _new_order(order: CreateOrderInput) -> Order:
+        return Order(
+            id=str(uuid4()),
+            client_id=order.client_id,
+            security_id=order.security_id,
+            side=order.side,
+            quantity=order.quantity,
+            type=order.type,
+            price=order.price,
+            time_in_force=order.time_in_force,
+            stop_price=order.stop_price,
+        )
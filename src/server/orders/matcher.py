@@ -1,20 +1,128 @@
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
 
 from sortedcontainers import SortedDict
-from typing import List
-
-from .model import Order, Side, OrderType
-
-
-@dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..securities.model import (
+    BookEngine,
+    SecuritiesRepository,
+    Security,
+    SelfTradePrevention,
+)
+from .depth import DepthCache, Level
+from .ladder import PriceLadder
+from .model import TRIGGERED_TYPES, Order, Side, OrderType, TimeInForce
+from .triggers import TriggerBook
+
+# Times in force under which the unfilled remainder of a limit order rests in the book
+RESTING = frozenset((TimeInForce.gtc, TimeInForce.post_only))
+# Times in force checked against the book before an order may trade
+CHECKED = frozenset((TimeInForce.fok, TimeInForce.post_only))
+
+
+@dataclass(slots=True)
 class OrderBookOrder:
     """
     An entry in the order book.
+
+    Entries resting at the same price are linked to their neighbours, forming the FIFO queue of a `PriceLevel`.
+    Entries are compared by maker, quantity and price only.
+
+    There is one entry per resting order, so entries are slotted rather than carrying a `__dict__`.
     """
 
     maker_id: int
     quantity: int
-    price: float
+    price: int
+    order_id: Optional[str] = field(default=None, compare=False)
+    level: Optional["PriceLevel"] = field(default=None, compare=False, repr=False)
+    prev: Optional["OrderBookOrder"] = field(default=None, compare=False, repr=False)
+    next: Optional["OrderBookOrder"] = field(default=None, compare=False, repr=False)
+
+
+class PriceLevel:
+    """
+    The FIFO queue of orders resting at a single price.
+
+    This is an intrusive doubly-linked list of `OrderBookOrder` entries: appending an entry and removing one, at the
+    head or anywhere else in the queue, are O(1). The aggregate quantity and number of orders at the level are kept
+    up to date on every change, so they never need to be summed.
+    """
+
+    __slots__ = ("price", "head", "tail", "quantity", "count")
+
+    def __init__(self, price: int, orders: Iterable[OrderBookOrder] = ()):
+        self.price = price
+        self.head: Optional[OrderBookOrder] = None
+        self.tail: Optional[OrderBookOrder] = None
+        self.quantity = 0
+        self.count = 0
+
+        for order in orders:
+            self.append(order)
+
+    def append(self, order: OrderBookOrder):
+        """
+        Add an order to the back of the queue.
+        """
+
+        order.level = self
+        order.prev = self.tail
+        order.next = None
+        if self.tail is None:
+            self.head = order
+        else:
+            self.tail.next = order
+        self.tail = order
+
+        self.quantity += order.quantity
+        self.count += 1
+
+    def remove(self, order: OrderBookOrder):
+        """
+        Unlink an order from the queue, wherever it is.
+        """
+
+        if order.prev is None:
+            self.head = order.next
+        else:
+            order.prev.next = order.next
+        if order.next is None:
+            self.tail = order.prev
+        else:
+            order.next.prev = order.prev
+        order.level = order.prev = order.next = None
+
+        self.quantity -= order.quantity
+        self.count -= 1
+
+    def reduce(self, order: OrderBookOrder, quantity: int):
+        """
+        Decrement the quantity of an order in the queue, removing it once it is depleted.
+        """
+
+        order.quantity -= quantity
+        self.quantity -= quantity
+        if order.quantity == 0:
+            self.remove(order)
+
+    def __iter__(self) -> Iterator[OrderBookOrder]:
+        order = self.head
+        while order is not None:
+            yield order
+            order = order.next
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __eq__(self, other):
+        if not isinstance(other, PriceLevel):
+            return NotImplemented
+        return self.price == other.price and list(self) == list(other)
+
+    def __repr__(self):
+        return f"PriceLevel(price={self.price}, quantity={self.quantity}, orders={list(self)})"
 
 
 @dataclass
@@ -30,47 +138,165 @@ class OrderBook:
         BID 100 @ 10.1
         BID 200 @ 10.0
 
-    Internally, this is represented as:
+    Internally, prices are integer numbers of ticks (see `Security.tick_size`). With a tick size of 0.01, this is
+    represented as:
     asks = {
-        11.5: [
+        1150: PriceLevel(quantity=200, orders=[
           (maker=1, quantity=50), <-------- entries are ordered FIFO
           (maker=2, quantity=150),
-        ]
+        ])
         ...,
     }
     bids = {
-        10.2: [
+        1020: PriceLevel(quantity=60, orders=[
           (maker=3, quantity=40),
           (maker=4, quantity=20),
-        ]
+        ])
         ...,
     }
+
+    Only prices with resting orders are present: a level is removed from the book as soon as it is depleted.
+
+    Each side is either a `SortedDict` or a `PriceLadder`, depending on the `BookEngine` of the security.
     """
 
     security_id: int
-    asks: SortedDict[float, List[OrderBookOrder]]
-    bids: SortedDict[float, List[OrderBookOrder]]
+    asks: "BookSide"
+    bids: "BookSide"
+
+    @classmethod
+    def create(
+        cls, security_id: int, engine: BookEngine = BookEngine.sorted
+    ) -> "OrderBook":
+        """
+        Create an empty order book backed by the given engine.
+        """
 
+        if engine == BookEngine.ladder:
+            return cls(security_id=security_id, asks=PriceLadder(), bids=PriceLadder())
+        return cls(security_id=security_id, asks=SortedDict(), bids=SortedDict())
 
-@dataclass
+
+BookSide = Union[SortedDict[int, PriceLevel], PriceLadder[PriceLevel]]
+
+
+@dataclass(slots=True)
 class Execution:
     """
     An execution of a trade between two parties.
     :param maker_id: The ID of the client whose order was sitting in the order book.
     :param taker_id: The ID of the client whose incoming order matched with the maker's order.
-    :param price: The price at which the trade was executed.
+    :param price: The price at which the trade was executed, in ticks.
+    :param maker_order_id: The ID of the maker's order, if it has one.
+    :param taker_order_id: The ID of the taker's order, if it has one.
     """
 
     maker_id: int
     taker_id: int
-    price: float
+    price: int
+    quantity: int
+    maker_order_id: Optional[str] = field(default=None, compare=False)
+    taker_order_id: Optional[str] = field(default=None, compare=False)
+
+
+@dataclass(slots=True)
+class SelfTradeCancel:
+    """
+    Quantity of an order cancelled by self-trade prevention, rather than traded with an order of the same client.
+    :param order_id: The ID of the order, if it has one.
+    """
+
+    order_id: Optional[str]
+    quantity: int
+
+
+@dataclass(slots=True)
+class TriggeredOrder:
+    """
+    A stop order triggered by a trade, and matched in the same command as the order whose trade triggered it.
+    :param resting: The entry left in the order book for its unfilled remainder, if any. The remainder of an order
+        that does not rest is cancelled.
+    :param self_trade_cancels: The quantities cancelled by self-trade prevention while matching it.
+    """
+
+    order_id: str
+    executions: List[Execution]
+    resting: Optional[OrderBookOrder] = None
+    self_trade_cancels: List[SelfTradeCancel] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class LevelUpdate:
+    """
+    A change to a price level of the order book.
+    :param side: The side of the book the level is on: SELL for asks, BUY for bids.
+    :param price: The price of the level, in ticks.
+    :param quantity: The new aggregate quantity resting at the level; zero once the level is removed.
+    """
+
+    side: Side
+    price: int
     quantity: int
 
 
 @dataclass
 class MatchResult:
+    """
+    :param resting: The entry left in the order book for the unfilled remainder of the incoming order, if any. The
+        remainder of an order that does not rest is cancelled.
+    :param updates: The price levels changed by the order, in the order they were changed.
+    :param self_trade_cancels: The quantities of the order, and of resting orders of the same client, cancelled by
+        self-trade prevention.
+    :param pending: Whether the order is a stop order waiting for its trigger, rather than matched.
+    :param triggered: The stop orders triggered by the trades of the order, and by their own trades in turn, in the
+        order they were matched.
+    """
+
     order_book: OrderBook
     executions: List[Execution]
+    resting: Optional[OrderBookOrder] = None
+    updates: List[LevelUpdate] = field(default_factory=list)
+    self_trade_cancels: List[SelfTradeCancel] = field(default_factory=list)
+    pending: bool = False
+    triggered: List[TriggeredOrder] = field(default_factory=list)
+
+
+@dataclass
+class BatchResult:
+    """
+    The outcome of matching a batch of orders, with one item per order in each list.
+    :param executions: The executions produced by each order.
+    :param resting: The entry left in the order book for each order, if any. Entries are live, so later orders of the
+        batch may have filled them.
+    :param resting_quantities: The quantity each order left resting in the book, once it was matched.
+    :param updates: The price levels changed by the batch, in the order they were changed.
+    :param self_trade_cancels: The quantities cancelled by self-trade prevention while matching each order.
+    :param pending: Whether each order is a stop order left waiting for its trigger.
+    :param triggered: The stop orders triggered by the trades of each order, as in `MatchResult`.
+    """
+
+    executions: List[List[Execution]]
+    resting: List[Optional[OrderBookOrder]]
+    resting_quantities: List[int]
+    updates: List[LevelUpdate] = field(default_factory=list)
+    self_trade_cancels: List[List[SelfTradeCancel]] = field(default_factory=list)
+    pending: List[bool] = field(default_factory=list)
+    triggered: List[List[TriggeredOrder]] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class BookSize:
+    """
+    The number of price levels on each side of an order book, and of the orders resting in it.
+    """
+
+    bid_levels: int
+    ask_levels: int
+    resting_orders: int
+
+
+# The executions produced by an incoming order, and the entry left in the book for its remainder
+Match = Tuple[List[Execution], Optional[OrderBookOrder]]
 
 
 class Matcher:
@@ -78,14 +304,62 @@ class Matcher:
     Matching Engine responsible for matching buy and sell orders for a given securities.
     """
 
-    def __init__(self, order_book=None):
+    def __init__(
+        self,
+        order_book=None,
+        self_trade_prevention: SelfTradePrevention = SelfTradePrevention.none,
+    ):
         self.order_book = (
-            OrderBook(security_id=1, asks=SortedDict(), bids=SortedDict())
-            if order_book is None
-            else order_book
+            OrderBook.create(security_id=1) if order_book is None else order_book
+        )
+        self.self_trade_prevention = self_trade_prevention
+        self.asks: BookSide = self.order_book.asks
+        self.bids: BookSide = self.order_book.bids
+
+        # Index of the resting orders by order ID, for constant-time cancels and amendments
+        self.orders: Dict[str, OrderBookOrder] = {
+            entry.order_id: entry
+            for book in (self.asks, self.bids)
+            for level in book.values()
+            for entry in level
+            if entry.order_id is not None
+        }
+
+        # Stop orders waiting for their trigger, and the price of the last trade, which stop orders are checked against
+        # as they arrive
+        self.triggers = TriggerBook()
+        self.last_price: Optional[int] = None
+
+        # The price levels changed by the last order, batch, cancel or amendment
+        self.updates: List[LevelUpdate] = []
+        # The quantities cancelled by self-trade prevention while matching the last order
+        self.self_trade_cancels: List[SelfTradeCancel] = []
+        # Cache of the top levels of the book, created once the depth is first read
+        self._depth: Optional[DepthCache] = None
+
+        # Matching function for each order type and side
+        self._handlers: Dict[Tuple[OrderType, Side], Callable[[Order], Match]] = {
+            (OrderType.limit, Side.BUY): self._match_limit_bid,
+            (OrderType.limit, Side.SELL): self._match_limit_ask,
+            (OrderType.market, Side.BUY): self._match_market_bid,
+            (OrderType.market, Side.SELL): self._match_market_ask,
+            (OrderType.stop, Side.BUY): self._match_stop,
+            (OrderType.stop, Side.SELL): self._match_stop,
+            (OrderType.stop_limit, Side.BUY): self._match_stop,
+            (OrderType.stop_limit, Side.SELL): self._match_stop,
+        }
+
+    @classmethod
+    def for_security(cls, security: Security) -> "Matcher":
+        """
+        Create a matcher with an empty order book, using the book engine and self-trade prevention configured for the
+        security.
+        """
+
+        return cls(
+            OrderBook.create(security.id, security.book_engine),
+            security.self_trade_prevention,
         )
-        self.asks: SortedDict[float, List[OrderBookOrder]] = self.order_book.asks
-        self.bids: SortedDict[float, List[OrderBookOrder]] = self.order_book.bids
 
     def add(self, order: Order) -> MatchResult:
         """
@@ -97,222 +371,545 @@ class Matcher:
             return self.match_market_order(order)
         elif order.type == OrderType.limit:
             return self.match_limit_order(order)
+        elif order.type in TRIGGERED_TYPES:
+            return self.match_stop_order(order)
         else:
             raise ValueError("Unsupported order type")
 
-    def match_limit_order(self, order: Order) -> MatchResult:
-        if order.side == Side.BUY:
-            # Incoming bid
-            bid = OrderBookOrder(
-                maker_id=order.client_id,
-                quantity=order.quantity,
-                price=order.price,
-            )
+    def cancel(self, order_id: str) -> Union[OrderBookOrder, Order, None]:
+        """
+        Remove a resting order from the order book, or a stop order from the orders waiting for their trigger.
+        :param order_id: The ID of the order to cancel.
+        :return: The removed entry, or the stop order, or None if the order is neither resting in the book nor waiting
+            for its trigger (unknown, filled or cancelled).
+        """
 
-            # Look for a matching ask
-            executions = []
+        self._start_updates()
+        entry = self.orders.pop(order_id, None)
+        if entry is None:
+            return self.triggers.remove(order_id)
 
-            for ask_price in self.asks:
-                asks = self.asks[ask_price]
-
-                i = 0
-                while i < len(asks):
-                    ask = asks[i]
-
-                    if bid.price >= ask.price and bid.quantity > 0:
-                        # Match is found, we can execute
-                        execution = Execution(
-                            maker_id=ask.maker_id,
-                            taker_id=bid.maker_id,
-                            price=max(ask_price, bid.price),  # favour the maker
-                            quantity=min(ask.quantity, bid.quantity),
-                        )
-                        executions.append(execution)
-                        bid.quantity -= execution.quantity
-                        ask.quantity -= execution.quantity
-
-                        # Remove depleted orders
-                        if ask.quantity == 0:
-                            del asks[i]
-                            i -= 1
-                    i += 1
-
-            # If the bid is not fully matched, add it to the order book
-            if bid.quantity > 0:
-                if bid.price not in self.bids:
-                    self.bids[bid.price] = []
-                self.bids[bid.price].append(bid)
-
-            return MatchResult(
-                order_book=self.order_book,
-                executions=executions,
-            )
+        level = entry.level
+        side = self._side_of(level)
+        level.remove(entry)
+        if not level:
+            self._prune(level)
+        self.updates.append(LevelUpdate(side, level.price, level.quantity))
 
-        elif order.side == Side.SELL:
-            # Incoming ask
-            ask = OrderBookOrder(
-                maker_id=order.client_id, quantity=order.quantity, price=order.price
-            )
+        return entry
 
-            # Look for a matching bid
-            executions = []
+    def amend(self, order_id: str, quantity: int) -> Optional[OrderBookOrder]:
+        """
+        Change the quantity of a resting order.
+        A reduction keeps the order's time priority, while an increase sends it to the back of its price level.
+        :param order_id: The ID of the order to amend.
+        :param quantity: The new quantity of the order; zero cancels it.
+        :return: The amended entry, or None if the order is not resting in the book.
+        """
 
-            for bid_price in reversed(self.bids):
-                bids = self.bids[bid_price]
-
-                i = 0
-                while i < len(bids):
-                    bid = bids[i]
-
-                    if ask.price <= bid_price and ask.quantity > 0:
-                        # Match is found, we can execute
-                        execution = Execution(
-                            maker_id=bid.maker_id,
-                            taker_id=ask.maker_id,
-                            price=min(ask.price, bid_price),  # favour the maker
-                            quantity=min(ask.quantity, bid.quantity),
-                        )
-                        executions.append(execution)
-
-                        ask.quantity -= execution.quantity
-                        bid.quantity -= execution.quantity
-
-                        # Remove depleted orders
-                        if bid.quantity == 0:
-                            del bids[i]
-                            i -= 1
-
-                    i += 1
-
-            # If the ask is not fully matched, add it to the order book
-            if ask.quantity > 0:
-                if ask.price not in self.asks:
-                    self.asks[ask.price] = []
-                self.asks[ask.price].append(ask)
-
-            return MatchResult(
-                order_book=self.order_book,
-                executions=executions,
-            )
+        if quantity < 0:
+            raise ValueError(f"Invalid quantity {quantity}")
+
+        self._start_updates()
+        entry = self.orders.get(order_id)
+        if entry is None:
+            return None
+
+        if quantity == 0:
+            return self.cancel(order_id)
 
+        level = entry.level
+        if quantity <= entry.quantity:
+            level.reduce(entry, entry.quantity - quantity)
         else:
-            raise ValueError(f'Unsupported order side "{order.side}"')
+            level.remove(entry)
+            entry.quantity = quantity
+            level.append(entry)
+        self.updates.append(
+            LevelUpdate(self._side_of(level), level.price, level.quantity)
+        )
+
+        return entry
+
+    def match_limit_order(self, order: Order) -> MatchResult:
+        if order.side == Side.BUY:
+            return self._match(order, self._match_limit_bid)
+        elif order.side == Side.SELL:
+            return self._match(order, self._match_limit_ask)
+        raise ValueError(f'Unsupported order side "{order.side}"')
 
     def match_market_order(self, order: Order) -> MatchResult:
         if order.side == Side.BUY:
-            # Incoming market bid
-            bid = OrderBookOrder(
-                maker_id=order.client_id,
-                quantity=order.quantity,
-                price=0,
-            )
+            return self._match(order, self._match_market_bid)
+        elif order.side == Side.SELL:
+            return self._match(order, self._match_market_ask)
+        raise ValueError(f'Unsupported order side "{order.side}"')
 
-            # Look for a matching ask
-            executions = []
+    def match_stop_order(self, order: Order) -> MatchResult:
+        """
+        Hold a stop order back until a trade reaches its stop price, or match it right away if the last trade already
+        has.
+        """
+
+        if order.side not in (Side.BUY, Side.SELL):
+            raise ValueError(f'Unsupported order side "{order.side}"')
+        return self._match(order, self._match_stop)
+
+    def add_batch(self, orders: List[Order]) -> BatchResult:
+        """
+        Match a batch of orders in turn, as if each was passed to `add`.
+
+        The matching function for each order is looked up in a table keyed by order type and side, and its executions
+        and resting entry are collected directly, without building a `MatchResult` per order. All orders are checked
+        before any is matched, so a batch containing an unsupported order leaves the book untouched.
+        """
 
-            for ask_price in self.asks:
-                asks = self.asks[ask_price]
-
-                i = 0
-                while i < len(asks):
-                    ask = asks[i]
-
-                    if bid.quantity > 0:
-                        # Match is found against the top of the book (best ask); we can execute
-                        bid.price = ask_price
-                        execution = Execution(
-                            maker_id=ask.maker_id,
-                            taker_id=bid.maker_id,
-                            price=ask_price,  # market price
-                            quantity=min(ask.quantity, bid.quantity),
-                        )
-                        executions.append(execution)
-                        bid.quantity -= execution.quantity
-                        ask.quantity -= execution.quantity
-
-                        # Remove depleted orders
-                        if ask.quantity == 0:
-                            del asks[i]
-                            i -= 1
-                    i += 1
-
-            # If the bid is not fully matched, add it to the order book
-            if bid.quantity > 0:
-                if bid.price not in self.bids:
-                    self.bids[bid.price] = []
-                self.bids[bid.price].append(bid)
-
-            return MatchResult(
-                order_book=self.order_book,
-                executions=executions,
+        handlers = self._handlers
+        matches = [handlers.get((order.type, order.side)) for order in orders]
+        if None in matches:
+            order = orders[matches.index(None)]
+            raise ValueError(
+                f'Unsupported order type "{order.type}" or side "{order.side}"'
             )
 
-        elif order.side == Side.SELL:
-            # Incoming ask
-            ask = OrderBookOrder(
-                maker_id=order.client_id, quantity=order.quantity, price=order.price
+        self._start_updates()
+        result = BatchResult(
+            executions=[], resting=[], resting_quantities=[], updates=self.updates
+        )
+        triggers = self.triggers
+        for order, match in zip(orders, matches):
+            self.self_trade_cancels = []
+            executions, resting = match(order)
+            result.self_trade_cancels.append(self.self_trade_cancels)
+            result.executions.append(executions)
+            result.resting.append(resting)
+            result.resting_quantities.append(0 if resting is None else resting.quantity)
+            result.pending.append(
+                order.type in TRIGGERED_TYPES and order.id in triggers.orders
             )
+            result.triggered.append(self._trigger(executions) if executions else [])
+
+        return result
+
+    def depth(self, depth: int) -> Tuple[List[Level], List[Level]]:
+        """
+        The best price levels of the asks and of the bids, as `(price, quantity)` pairs, best price first.
+        Reads are served from a `DepthCache`, patched with the levels changed since the previous read.
+        :param depth: The maximum number of levels on each side.
+        """
+
+        if self._depth is None:
+            self._depth = DepthCache(self)
+        return self._depth.get(depth)
+
+    def size(self) -> BookSize:
+        return BookSize(len(self.bids), len(self.asks), len(self.orders))
+
+    def _start_updates(self):
+        """
+        Start recording the level updates, and self-trade cancels, of a new command.
+        """
+
+        self.updates = []
+        self.self_trade_cancels = []
+        if self._depth is not None:
+            self._depth.add(self.updates)
+
+    def _match(self, order: Order, match: Callable[[Order], Match]) -> MatchResult:
+        """
+        Match an incoming order with its matching function, then the stop orders its trades trigger.
+        """
+
+        self._start_updates()
+        executions, resting = match(order)
+        result = MatchResult(
+            order_book=self.order_book,
+            executions=executions,
+            resting=resting,
+            updates=self.updates,
+            self_trade_cancels=self.self_trade_cancels,
+        )
+        if order.type in TRIGGERED_TYPES:
+            result.pending = order.id in self.triggers.orders
+        if executions:
+            result.triggered = self._trigger(executions)
+        return result
+
+    def _match_stop(self, order: Order) -> Match:
+        last_price = self.last_price
+        if last_price is None or (
+            last_price < order.stop_price
+            if order.side is Side.BUY
+            else last_price > order.stop_price
+        ):
+            self.triggers.add(order)
+            return [], None
+
+        # Already triggered by the last trade
+        return self._handlers[(TRIGGERED_TYPES[order.type], order.side)](order)
+
+    def _trigger(self, executions: List[Execution]) -> List[TriggeredOrder]:
+        """
+        Take the last trade price from the executions of an order, and match the stop orders its trades triggered,
+        then those triggered by their trades in turn, first triggered first matched.
+
+        The executions of an order walk the book in one direction, so their first and last prices bound the prices
+        traded, and only the stops with stop prices in that range are looked at.
+        """
+
+        self.last_price = executions[-1].price
+        triggers = self.triggers
+        if not triggers.orders:
+            return []
+
+        handlers = self._handlers
+        triggered = []
+        queue = deque()
+        while executions:
+            first = executions[0].price
+            last = self.last_price = executions[-1].price
+            queue.extend(triggers.pop_triggered(min(first, last), max(first, last)))
 
-            # Look for a matching bid
             executions = []
+            while queue and not executions:
+                order = queue.popleft()
+                self.self_trade_cancels = []
+                executions, resting = handlers[
+                    (TRIGGERED_TYPES[order.type], order.side)
+                ](order)
+                triggered.append(
+                    TriggeredOrder(
+                        order.id, executions, resting, self.self_trade_cancels
+                    )
+                )
+
+        return triggered
+
+    def _match_limit_bid(self, order: Order) -> Match:
+        # Incoming bid
+        bid = OrderBookOrder(
+            maker_id=order.client_id,
+            quantity=order.quantity,
+            price=order.price,
+            order_id=order.id,
+        )
+        time_in_force = order.time_in_force
+        if time_in_force in CHECKED and not self._accepts(
+            time_in_force, bid, self.asks, self.asks.irange(maximum=bid.price)
+        ):
+            return [], None
+
+        # Look for matching asks, from the lowest price up to the bid's limit
+        executions = self._take(bid, self.asks, self.asks.irange(maximum=bid.price))
+
+        # If the bid is not fully matched, and may rest, add it to the order book
+        if bid.quantity > 0 and time_in_force in RESTING:
+            self._rest(bid, self.bids)
+            return executions, bid
+        return executions, None
+
+    def _match_limit_ask(self, order: Order) -> Match:
+        # Incoming ask
+        ask = OrderBookOrder(
+            maker_id=order.client_id,
+            quantity=order.quantity,
+            price=order.price,
+            order_id=order.id,
+        )
+        time_in_force = order.time_in_force
+        if time_in_force in CHECKED and not self._accepts(
+            time_in_force,
+            ask,
+            self.bids,
+            self.bids.irange(minimum=ask.price, reverse=True),
+        ):
+            return [], None
+
+        # Look for matching bids, from the highest price down to the ask's limit
+        executions = self._take(
+            ask, self.bids, self.bids.irange(minimum=ask.price, reverse=True)
+        )
+
+        # If the ask is not fully matched, and may rest, add it to the order book
+        if ask.quantity > 0 and time_in_force in RESTING:
+            self._rest(ask, self.asks)
+            return executions, ask
+        return executions, None
+
+    def _match_market_bid(self, order: Order) -> Match:
+        # Incoming market bid
+        bid = OrderBookOrder(
+            maker_id=order.client_id,
+            quantity=order.quantity,
+            price=0,
+            order_id=order.id,
+        )
+        time_in_force = order.time_in_force
+        if time_in_force in CHECKED and not self._accepts(
+            time_in_force, bid, self.asks, iter(self.asks)
+        ):
+            return [], None
+
+        # Sweep the asks from the top of the book (best ask). Whatever is not filled is cancelled rather than rested,
+        # as a market order has no price to rest at
+        return self._take(bid, self.asks, self.asks, market=True), None
+
+    def _match_market_ask(self, order: Order) -> Match:
+        # Incoming market ask
+        ask = OrderBookOrder(
+            maker_id=order.client_id,
+            quantity=order.quantity,
+            price=0,
+            order_id=order.id,
+        )
+        time_in_force = order.time_in_force
+        if time_in_force in CHECKED and not self._accepts(
+            time_in_force, ask, self.bids, reversed(self.bids)
+        ):
+            return [], None
+
+        # Sweep the bids from the top of the book (best bid), cancelling what is not filled
+        return self._take(ask, self.bids, reversed(self.bids), market=True), None
+
+    def _accepts(
+        self,
+        time_in_force: TimeInForce,
+        taker: OrderBookOrder,
+        book: BookSide,
+        prices: Iterator[int],
+    ) -> bool:
+        """
+        Whether an incoming order may be matched: a post-only order only if it would not take liquidity, a
+        fill-or-kill order only if it would be filled in full. An order which may not is cancelled without touching
+        the book.
+        :param prices: The price levels the taker may trade against, best price first, as passed to `_take`.
+        """
+
+        if time_in_force is TimeInForce.post_only:
+            return next(prices, None) is None
+        return self._fillable(taker, book, prices)
+
+    def _fillable(
+        self, taker: OrderBookOrder, book: BookSide, prices: Iterator[int]
+    ) -> bool:
+        """
+        Whether the levels an incoming order may trade against hold enough quantity to fill it.
+
+        Read from the aggregate quantity of each level, stopping at the level which would fill the order, so the check
+        costs the number of levels the order would cross. With self-trade prevention, the orders of the taker's client
+        are not traded with, and the makers of those levels are walked instead to leave them out; a prevention which
+        cancels or decrements the taker on reaching one of them leaves it unfilled.
+        """
+
+        needed = taker.quantity
+        mode = self.self_trade_prevention
+        if mode is SelfTradePrevention.none:
+            for price in prices:
+                needed -= book[price].quantity
+                if needed <= 0:
+                    return True
+            return False
+
+        for price in prices:
+            for maker in book[price]:
+                if maker.maker_id == taker.maker_id:
+                    if mode is SelfTradePrevention.cancel_oldest:
+                        continue
+                    return False
+                needed -= maker.quantity
+                if needed <= 0:
+                    return True
+        return False
+
+    def _take(
+        self,
+        taker: OrderBookOrder,
+        book: BookSide,
+        prices: Iterable[int],
+        market: bool = False,
+    ) -> List[Execution]:
+        """
+        Match an incoming order against the resting orders of the opposite side of the book.
+        :param taker: The incoming order, whose quantity is decremented as it is filled.
+        :param book: The opposite side of the book.
+        :param prices: The price levels the taker may trade against, best price first.
+        :param market: Whether the taker is a market order, trading at the price of each level it reaches.
+
+        Stops as soon as the taker is filled, so the work done is proportional to the number of fills rather than to
+        the depth of the book. Makers of the same client as the taker are dealt with by self-trade prevention as they
+        are reached, in the same walk.
+        """
+
+        executions = []
+        depleted = []
+        updates = self.updates
+        side = Side.SELL if book is self.asks else Side.BUY
+        prevent_self_trades = self.self_trade_prevention is not SelfTradePrevention.none
+
+        for price in prices:
+            if taker.quantity == 0:
+                break
+
+            level = book[price]
+            if market:
+                taker.price = price
+
+            # Makers are filled FIFO; limit orders execute at the taker's price, market orders at the level's
+            maker = level.head
+            while maker is not None and taker.quantity > 0:
+                if prevent_self_trades and maker.maker_id == taker.maker_id:
+                    self._prevent_self_trade(taker, maker, level)
+                    maker = level.head
+                    continue
+
+                execution = Execution(
+                    maker_id=maker.maker_id,
+                    taker_id=taker.maker_id,
+                    price=taker.price,
+                    quantity=min(maker.quantity, taker.quantity),
+                    maker_order_id=maker.order_id,
+                    taker_order_id=taker.order_id,
+                )
+                executions.append(execution)
+                taker.quantity -= execution.quantity
+                level.reduce(maker, execution.quantity)
+                if maker.quantity == 0:
+                    self.orders.pop(maker.order_id, None)
+                maker = level.head
+
+            if maker is None:
+                depleted.append(price)
+            updates.append(LevelUpdate(side, price, level.quantity))
+
+        # Remove depleted levels once the walk over the book is done
+        for price in depleted:
+            del book[price]
+
+        return executions
+
+    def _prevent_self_trade(
+        self, taker: OrderBookOrder, maker: OrderBookOrder, level: PriceLevel
+    ):
+        """
+        Cancel some or all of an incoming order, or of the resting order at the head of a level, instead of trading
+        them with each other, as the self-trade prevention of the matcher says.
+        """
+
+        cancels = self.self_trade_cancels
+        mode = self.self_trade_prevention
+        if mode is SelfTradePrevention.cancel_newest:
+            cancels.append(SelfTradeCancel(taker.order_id, taker.quantity))
+            taker.quantity = 0
+            return
+
+        quantity = (
+            maker.quantity
+            if mode is SelfTradePrevention.cancel_oldest
+            else min(maker.quantity, taker.quantity)
+        )
+        cancels.append(SelfTradeCancel(maker.order_id, quantity))
+        level.reduce(maker, quantity)
+        if maker.quantity == 0:
+            self.orders.pop(maker.order_id, None)
+        if mode is SelfTradePrevention.decrement_both:
+            cancels.append(SelfTradeCancel(taker.order_id, quantity))
+            taker.quantity -= quantity
+
+    def _rest(self, order: OrderBookOrder, book: BookSide):
+        """
+        Add an order to the back of the queue at its price, creating the level if needed.
+        """
 
-            for bid_price in reversed(self.bids):
-                bids = self.bids[bid_price]
-
-                i = 0
-                while i < len(bids):
-                    bid = bids[i]
-
-                    if ask.quantity > 0:
-                        # Match is found at the top of the book (best bid); we can execute
-                        ask.price = bid_price
-                        execution = Execution(
-                            maker_id=bid.maker_id,
-                            taker_id=ask.maker_id,
-                            price=bid_price,  # market price
-                            quantity=min(ask.quantity, bid.quantity),
-                        )
-                        executions.append(execution)
-
-                        ask.quantity -= execution.quantity
-                        bid.quantity -= execution.quantity
-
-                        # Remove depleted orders
-                        if bid.quantity == 0:
-                            del bids[i]
-                            i -= 1
-
-                    i += 1
-
-            # If the ask is not fully matched, add it to the order book
-            if ask.quantity > 0:
-                if ask.price not in self.asks:
-                    self.asks[ask.price] = []
-                self.asks[ask.price].append(ask)
-
-            return MatchResult(
-                order_book=self.order_book,
-                executions=executions,
+        level = book.get(order.price)
+        if level is None:
+            level = book[order.price] = PriceLevel(order.price)
+        level.append(order)
+        self.updates.append(
+            LevelUpdate(
+                Side.SELL if book is self.asks else Side.BUY,
+                level.price,
+                level.quantity,
             )
+        )
 
-        else:
-            raise ValueError(f'Unsupported order side "{order.side}"')
+        if order.order_id is not None:
+            self.orders[order.order_id] = order
+
+    def _prune(self, level: PriceLevel):
+        """
+        Remove a depleted level from whichever side of the book it is on.
+        """
+
+        book = self.asks if self._side_of(level) == Side.SELL else self.bids
+        del book[level.price]
+
+    def _side_of(self, level: PriceLevel) -> Side:
+        """
+        The side of the book a level is on: SELL for asks, BUY for bids.
+        """
+
+        return Side.SELL if self.asks.get(level.price) is level else Side.BUY
 
 
 class RootMatcher:
     """
-    Root matcher responsible for managing multiple matching engines.
+    Root matcher responsible for managing multiple matching engines, one for each security.
     """
 
-    def __init__(self):
-        # TODO: Read the securities from the securities service and create a matcher for each securities.
-        self.matchers = {
-            1: Matcher(),
-            2: Matcher(),
-            3: Matcher(),
+    def __init__(self, securities_repository: SecuritiesRepository):
+        self.matchers: Dict[int, Matcher] = {
+            security.id: Matcher.for_security(security)
+            for security in securities_repository.list_securities()
         }
 
     def get_matcher(self, security_id: int) -> Matcher:
         """
         Get the matcher for a given securities.
+        :raises KeyError: If the security is unknown.
+        """
+
+        return self.matchers[security_id]
+
+    def add(self, order: Order) -> MatchResult:
         """
+        Match the order against the order book of its security.
+        """
+
+        return self.get_matcher(order.security_id).add(order)
+
+    def add_batch(self, orders: List[Order]) -> BatchResult:
+        """
+        Match a batch of orders, which may be for different securities. The orders of each security are matched in
+        one pass, in the order they appear in the batch.
+        :return: The results, in the same order as the orders.
+        """
+
+        groups: Dict[int, List[int]] = {}
+        for index, order in enumerate(orders):
+            groups.setdefault(order.security_id, []).append(index)
+
+        matchers = {
+            security_id: self.get_matcher(security_id) for security_id in groups
+        }
+
+        result = BatchResult(
+            executions=[None] * len(orders),
+            resting=[None] * len(orders),
+            resting_quantities=[0] * len(orders),
+            self_trade_cancels=[None] * len(orders),
+            pending=[False] * len(orders),
+            triggered=[None] * len(orders),
+        )
+        for security_id, indices in groups.items():
+            group = matchers[security_id].add_batch(
+                [orders[index] for index in indices]
+            )
+            for position, index in enumerate(indices):
+                result.executions[index] = group.executions[position]
+                result.resting[index] = group.resting[position]
+                result.resting_quantities[index] = group.resting_quantities[position]
+                result.self_trade_cancels[index] = group.self_trade_cancels[position]
+                result.pending[index] = group.pending[position]
+                result.triggered[index] = group.triggered[position]
+
+        return result
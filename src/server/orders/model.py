@@ -1,6 +1,13 @@
+from bisect import bisect_left
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Optional
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+if TYPE_CHECKING:
+    from .matcher import Execution, SelfTradeCancel
 
 
 class Side(Enum):
@@ -11,33 +18,347 @@ class Side(Enum):
 class OrderType(Enum):
     limit = "limit"
     market = "market"
+    # Held back until a trade reaches the stop price, then matched as a market order
+    stop = "stop"
+    # Held back until a trade reaches the stop price, then matched as a limit order
+    stop_limit = "stop_limit"
+
+
+# The type each type of stop order is matched as once it is triggered
+TRIGGERED_TYPES = {
+    OrderType.stop: OrderType.market,
+    OrderType.stop_limit: OrderType.limit,
+}
+
+
+class TimeInForce(Enum):
+    # Good till cancelled: the unfilled remainder rests in the book
+    gtc = "gtc"
+    # Immediate or cancel: the unfilled remainder is cancelled
+    ioc = "ioc"
+    # Fill or kill: the order is filled in full on arrival, or cancelled without trading
+    fok = "fok"
+    # The order rests in the book, and is cancelled without trading if it would take liquidity on arrival
+    post_only = "post_only"
+
+
+class OrderStatus(Enum):
+    # Resting in the order book, or yet to be matched, with nothing filled
+    open = "open"
+    partially_filled = "partially_filled"
+    filled = "filled"
+    cancelled = "cancelled"
 
 
 @dataclass
 class Order:
+    """
+    An order to buy or sell a security.
+    :param price: The limit price, as an integer number of ticks of the security. None for market and stop orders.
+    :param filled_quantity: The quantity filled so far, by trades against other orders.
+    :param filled_notional: The sum of the price times the quantity of each fill, in ticks, from which the average
+        fill price is derived.
+    :param time_in_force: How long the order stays in the book. Market orders never rest, and are cancelled once they
+        have taken what liquidity there is.
+    :param stop_price: The price, in ticks, a trade must reach for a stop order to be triggered: at or above it for a
+        buy, at or below it for a sell. None for orders other than stop orders.
+    :param cancelled_quantity: The quantity self-trade prevention cancelled while leaving the rest of the order live.
+    """
+
     id: str
     client_id: int
     security_id: int
     side: Side
     quantity: int
     type: OrderType
-    price: Optional[float] = None
+    price: Optional[int] = None
+    status: OrderStatus = OrderStatus.open
+    filled_quantity: int = 0
+    filled_notional: int = 0
+    time_in_force: TimeInForce = TimeInForce.gtc
+    stop_price: Optional[int] = None
+    cancelled_quantity: int = 0
+
+    @property
+    def remaining_quantity(self) -> int:
+        """
+        The quantity still to be filled; none once the order is cancelled.
+        """
+
+        if self.status is OrderStatus.cancelled:
+            return 0
+        return self.quantity - self.filled_quantity - self.cancelled_quantity
+
+    @property
+    def average_price(self) -> Optional[float]:
+        """
+        The average price of the fills, in ticks, or None if nothing was filled.
+        """
+
+        if not self.filled_quantity:
+            return None
+        return self.filled_notional / self.filled_quantity
+
+
+# Orders returned in a page by default, and at most
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+@dataclass
+class OrderPage:
+    """
+    A page of orders, in the order they were created.
+    :param next_cursor: The cursor of the next page, or None if this is the last one.
+    """
+
+    orders: List[Order]
+    next_cursor: Optional[int]
 
 
 class OrderRepository:
     """
     An in-memory store for orders.
+
+    Orders are numbered in the order they are created, and the numbers of the orders are indexed by client, security,
+    side and status, so that a page of the orders matching a filter is read from the index rather than by scanning
+    every order. The numbers of a client, a security or a side only grow, and are kept in plain lists; those of a
+    status change as orders are filled and cancelled, and are kept in sorted lists.
+
+    The matching engine reports fills as executions, which name the orders on both sides. Each fill updates its order
+    in place, found by ID, so recording an execution costs the same however many orders there are; only a change of
+    status touches the sorted lists, at most three times in the life of an order.
+
+    The open notional of each client in each security is kept as orders are accepted, created, filled and cancelled,
+    for the pre-trade risk checks to read without summing the orders. An order is accepted once it passes the checks,
+    and counts towards the open notional from then on, although it is only created once the sequencer has matched it.
     """
 
     def __init__(self):
-        self.orders = {}
+        self.orders: Dict[str, Order] = {}
+        # Orders by number, and the number of each order by ID
+        self.log: List[Order] = []
+        self.numbers: Dict[str, int] = {}
+        # Secondary indexes, of the numbers of the orders with each value, in ascending order
+        self.by_client: Dict[int, List[int]] = {}
+        self.by_security: Dict[int, List[int]] = {}
+        self.by_side: Dict[Side, List[int]] = {side: [] for side in Side}
+        self.by_status: Dict[OrderStatus, SortedList] = {
+            status: SortedList() for status in OrderStatus
+        }
+        # The sum of the price times the remaining quantity of the open limit orders of each client in each security,
+        # in ticks
+        self.open_notional: Dict[Tuple[int, int], int] = {}
+        # Limit orders accepted and counted in the open notional, but not created yet
+        self.accepted: Dict[str, Order] = {}
+
+    def accept(self, order: Order):
+        """
+        Count an order that passed the pre-trade risk checks towards the open notional of its client, until it is
+        created or released.
+        """
+
+        if order.price is not None:
+            self.accepted[order.id] = order
+            self._add_open_notional(order, order.quantity)
+
+    def release(self, order_id: str):
+        """
+        Stop counting an accepted order that was not created, such as one the matching engine rejected.
+        """
+
+        order = self.accepted.pop(order_id, None)
+        if order is not None:
+            self._add_open_notional(order, -order.quantity)
 
     def create_order(self, order: Order) -> Order:
+        number = len(self.log)
         self.orders[order.id] = order
+        self.log.append(order)
+        self.numbers[order.id] = number
+        self.by_client.setdefault(order.client_id, []).append(number)
+        self.by_security.setdefault(order.security_id, []).append(number)
+        self.by_side[order.side].append(number)
+        self.by_status[order.status].add(number)
+        # An accepted order is already counted
+        if (
+            self.accepted.pop(order.id, None) is None
+            and order.price is not None
+            and order.remaining_quantity
+        ):
+            self._add_open_notional(order, order.remaining_quantity)
         return order
 
-    def get_order(self, order_id: int) -> Order:
+    def get_order(self, order_id: str) -> Order:
         return self.orders.get(order_id)
 
     def list_orders(self) -> List[Order]:
         return list(self.orders.values())
+
+    def fill(self, order_id: Optional[str], quantity: int, price: int):
+        """
+        Record that an order traded some of its quantity, updating it in place.
+        Unknown orders are ignored, as are the orders of the book that were not placed through the store.
+        :param price: The price of the trade, in ticks.
+        """
+
+        order = self.orders.get(order_id)
+        if order is None:
+            return
+
+        if order.price is not None:
+            self._add_open_notional(order, -min(quantity, order.remaining_quantity))
+        order.filled_quantity += quantity
+        order.filled_notional += quantity * price
+        self._set_status(
+            order,
+            OrderStatus.filled
+            if order.filled_quantity + order.cancelled_quantity >= order.quantity
+            else OrderStatus.partially_filled,
+        )
+
+    def record_executions(self, executions: Iterable["Execution"]):
+        """
+        Record the fills of both orders of each execution.
+        """
+
+        fill = self.fill
+        for execution in executions:
+            fill(execution.maker_order_id, execution.quantity, execution.price)
+            fill(execution.taker_order_id, execution.quantity, execution.price)
+
+    def reduce(self, order_id: Optional[str], quantity: int):
+        """
+        Record that some of the remaining quantity of an order was cancelled, cancelling the order once none is left.
+        Unknown orders are ignored.
+        """
+
+        order = self.orders.get(order_id)
+        if order is None:
+            return
+
+        if quantity >= order.remaining_quantity:
+            self.cancel(order_id)
+            return
+        if order.price is not None:
+            self._add_open_notional(order, -quantity)
+        order.cancelled_quantity += quantity
+
+    def record_match(
+        self,
+        order_id: str,
+        executions: Iterable["Execution"],
+        self_trade_cancels: Iterable["SelfTradeCancel"],
+        cancel_remainder: bool,
+    ):
+        """
+        Record the outcome of matching an order: the fills of its executions, then the quantities self-trade prevention
+        cancelled, then the cancellation of whatever it has left if it did not rest in the book.
+        :param cancel_remainder: Whether the order was left out of the book, and is not a stop order waiting for its
+            trigger.
+        """
+
+        self.record_executions(executions)
+        if self_trade_cancels:
+            self.record_self_trade_cancels(self_trade_cancels)
+        if cancel_remainder:
+            order = self.orders.get(order_id)
+            if order is not None and order.remaining_quantity:
+                self.cancel(order_id)
+
+    def record_self_trade_cancels(self, cancels: Iterable["SelfTradeCancel"]):
+        """
+        Record the quantities cancelled by self-trade prevention while matching an order, once its executions are
+        recorded.
+        """
+
+        for cancel in cancels:
+            self.reduce(cancel.order_id, cancel.quantity)
+
+    def cancel(self, order_id: str):
+        """
+        Record that the remainder of an order was removed from the order book.
+        """
+
+        order = self.orders.get(order_id)
+        if order is not None:
+            if order.price is not None:
+                self._add_open_notional(order, -order.remaining_quantity)
+            self._set_status(order, OrderStatus.cancelled)
+
+    def query(
+        self,
+        client_id: Optional[int] = None,
+        security_id: Optional[int] = None,
+        side: Optional[Side] = None,
+        status: Optional[OrderStatus] = None,
+        cursor: int = 0,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> OrderPage:
+        """
+        A page of the orders matching all the filters given, from the order numbered `cursor` on.
+
+        The orders are read from the smallest of the indexes of the filters, and checked against the other filters. A
+        page with a single filter, or with filters that mostly hold together, costs in proportion to its size.
+        :param cursor: Where the page starts: 0 for the first page, then the `next_cursor` of the previous page.
+        """
+
+        if limit < 1:
+            raise ValueError(f"Invalid page size {limit}")
+
+        indexes = [
+            index
+            for index in (
+                None if client_id is None else self.by_client.get(client_id, []),
+                None if security_id is None else self.by_security.get(security_id, []),
+                None if side is None else self.by_side[side],
+                None if status is None else self.by_status[status],
+            )
+            if index is not None
+        ]
+        if indexes:
+            numbers = self._from(min(indexes, key=len), cursor)
+        else:
+            numbers = range(max(cursor, 0), len(self.log))
+
+        log = self.log
+        matches = (
+            log[number]
+            for number in numbers
+            if (client_id is None or log[number].client_id == client_id)
+            and (security_id is None or log[number].security_id == security_id)
+            and (side is None or log[number].side is side)
+            and (status is None or log[number].status is status)
+        )
+        # One more order than the page holds is read, to tell whether there is a next page
+        orders = list(islice(matches, limit + 1))
+        if len(orders) > limit:
+            return OrderPage(orders[:limit], self.numbers[orders[limit].id])
+        return OrderPage(orders, None)
+
+    def _add_open_notional(self, order: Order, quantity: int):
+        key = (order.client_id, order.security_id)
+        self.open_notional[key] = (
+            self.open_notional.get(key, 0) + quantity * order.price
+        )
+
+    def _set_status(self, order: Order, status: OrderStatus):
+        # Cancelling is final: a fill recorded after the cancel does not reopen the order
+        if order.status is status or order.status is OrderStatus.cancelled:
+            return
+
+        number = self.numbers[order.id]
+        self.by_status[order.status].remove(number)
+        self.by_status[status].add(number)
+        order.status = status
+
+    @staticmethod
+    def _from(index, cursor: int) -> Iterable[int]:
+        """
+        The numbers of an index from `cursor` on.
+        """
+
+        if isinstance(index, SortedList):
+            return index.irange(minimum=cursor)
+        # Indexed from the first number on, rather than skipped up to it
+        return map(index.__getitem__, range(bisect_left(index, cursor), len(index)))
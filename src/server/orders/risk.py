@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from ..securities.model import SecuritiesRepository
+from .matcher import Execution
+from .model import OrderRepository
+
+if TYPE_CHECKING:
+    from .manager import CreateOrderInput
+
+
+class OrderRejected(ValueError):
+    """
+    An order failing a pre-trade risk check, or otherwise turned away before it is matched.
+    """
+
+
+@dataclass
+class RiskLimits:
+    """
+    Limits on the orders a client may place. A limit of None is not checked.
+    :param max_order_quantity: The largest quantity of a single order.
+    :param max_open_notional: The largest notional a client may have open in a security, counting the new order, in
+        units of price: the sum of the price times the remaining quantity of each of its open limit orders.
+    :param price_band: How far from the last trade price of its security a limit order may be priced, as a fraction of
+        that price. Orders are not banded until the security has traded.
+    """
+
+    max_order_quantity: Optional[int] = None
+    max_open_notional: Optional[float] = None
+    price_band: Optional[float] = None
+
+
+class RiskChecker:
+    """
+    Pre-trade risk checks, run on each order before it is stored and sent to the matching engine.
+
+    Each check costs a few lookups: the open notional of each client in each security is kept up to date by the
+    `OrderRepository` as orders are accepted, filled and cancelled, and the last trade price of each security is
+    taken from the executions reported back by the matching engine, so no check reads the orders themselves.
+
+    Orders are validated by the order routes before they are checked, so their quantities and prices are positive.
+    """
+
+    def __init__(
+        self,
+        order_repository: OrderRepository,
+        securities: SecuritiesRepository,
+        limits: RiskLimits,
+    ):
+        self.order_repository = order_repository
+        self.securities = securities
+        self.limits = limits
+        # The price of the last trade of each security, in ticks
+        self.last_prices: Dict[int, int] = {}
+
+    def check(self, order: "CreateOrderInput", pending: int = 0):
+        """
+        :param pending: Notional of orders of the same client and security accepted along with this one, in ticks.
+        :raises OrderRejected: If the order breaches a limit.
+        """
+
+        limits = self.limits
+        if (
+            limits.max_order_quantity is not None
+            and order.quantity > limits.max_order_quantity
+        ):
+            raise OrderRejected(
+                f"Quantity {order.quantity} exceeds the maximum of {limits.max_order_quantity}"
+            )
+
+        # Market orders trade at the prices they find, and are only limited in size
+        if order.price is None:
+            return
+
+        if limits.price_band is not None:
+            last_price = self.last_prices.get(order.security_id)
+            if (
+                last_price is not None
+                and abs(order.price - last_price) > limits.price_band * last_price
+            ):
+                raise OrderRejected(
+                    f"Price is more than {limits.price_band:.0%} away from the last trade price"
+                )
+
+        if limits.max_open_notional is not None:
+            security = self.securities.get_security(order.security_id)
+            notional = (
+                self.order_repository.open_notional.get(
+                    (order.client_id, order.security_id), 0
+                )
+                + pending
+                + order.quantity * order.price
+            )
+            if security.from_ticks(notional) > limits.max_open_notional:
+                raise OrderRejected(
+                    f"Open notional of client {order.client_id} in {security.symbol} would exceed the maximum of "
+                    f"{limits.max_open_notional}"
+                )
+
+    def check_batch(self, orders: List["CreateOrderInput"]):
+        """
+        Check a batch of orders, counting the notional of the orders before each one in the batch.
+        :raises OrderRejected: If any of the orders breaches a limit.
+        """
+
+        pending: Dict[Tuple[int, int], int] = {}
+        for order in orders:
+            key = (order.client_id, order.security_id)
+            self.check(order, pending.get(key, 0))
+            if order.price is not None:
+                pending[key] = pending.get(key, 0) + order.quantity * order.price
+
+    def record_executions(self, security_id: int, executions: List[Execution]):
+        """
+        Take the last trade price of a security from the executions of an order.
+        """
+
+        if executions:
+            self.last_prices[security_id] = executions[-1].price
@@ -1,32 +1,224 @@
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from blacksheep.exceptions import BadRequest, Conflict
 from blacksheep.server.bindings import FromJSON
-from blacksheep import get, post, json
+from blacksheep import delete, get, post, not_found
 
+from ..encoding import (
+    encode_create_order_result,
+    encode_create_order_results,
+    encode_order,
+    encode_order_page,
+    json_response,
+)
+from ..metrics.model import SERIALIZATION, Metrics
+from ..securities.model import SecuritiesRepository
 from .manager import CreateOrderInput, OrderManager
+from .model import (
+    DEFAULT_PAGE_SIZE,
+    TRIGGERED_TYPES,
+    MAX_PAGE_SIZE,
+    OrderStatus,
+    OrderType,
+    Side,
+    TimeInForce,
+)
+from .risk import OrderRejected
+
+
+@dataclass
+class CreateOrderRequest:
+    """
+    A new order as submitted over HTTP, with a decimal price.
+    The quantity is bound as any JSON number, so that a fractional quantity is rejected by `to_order_input` rather than
+    truncated to an integer.
+    """
+
+    client_id: int
+    security_id: int
+    side: Side
+    quantity: Union[int, float]
+    type: OrderType
+    price: Optional[float] = None
+    time_in_force: TimeInForce = TimeInForce.gtc
+    stop_price: Optional[float] = None
+
+
+def to_order_input(
+    request: CreateOrderRequest, securities: SecuritiesRepository
+) -> CreateOrderInput:
+    """
+    Validate an order request and convert its prices to ticks of the security.
+    """
+
+    try:
+        security = securities.get_security(request.security_id)
+        order_type = OrderType(request.type)
+        time_in_force = TimeInForce(request.time_in_force)
+        is_market = TRIGGERED_TYPES.get(order_type, order_type) is OrderType.market
+        quantity = request.quantity
+        if type(quantity) is float and quantity.is_integer():
+            quantity = int(quantity)
+        if type(quantity) is not int:
+            raise ValueError("Quantity must be a whole number")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        if is_market != (request.price is None):
+            raise ValueError("Limit orders, and only limit orders, need a price")
+        if is_market and time_in_force is TimeInForce.post_only:
+            raise ValueError("Market orders cannot be post-only")
+        if (order_type in TRIGGERED_TYPES) != (request.stop_price is not None):
+            raise ValueError("Stop orders, and only stop orders, need a stop price")
+        price = None if request.price is None else security.to_ticks(request.price)
+        stop_price = (
+            None
+            if request.stop_price is None
+            else security.to_ticks(request.stop_price)
+        )
+        if (price is not None and price <= 0) or (
+            stop_price is not None and stop_price <= 0
+        ):
+            raise ValueError("Prices must be positive")
+        return CreateOrderInput(
+            client_id=request.client_id,
+            security_id=request.security_id,
+            side=Side(request.side),
+            quantity=quantity,
+            type=order_type,
+            price=price,
+            time_in_force=time_in_force,
+            stop_price=stop_price,
+        )
+    except KeyError:
+        raise BadRequest(f"Unknown security {request.security_id}")
+    except ValueError as error:
+        raise BadRequest(str(error))
 
 
 @post("/orders")
 async def create_order(
-    order_input: FromJSON[CreateOrderInput],
+    order_input: FromJSON[CreateOrderRequest],
     order_manager: OrderManager,
+    securities: SecuritiesRepository,
+    metrics: Metrics,
 ):
     """
     Place a new order to buy or sell an securities.
     :param order_input: The order input data.
+    :return: The order, its sequence number, the executions it produced and the quantity left resting in the order
+        book. 400 if the order is invalid or fails a pre-trade risk check.
+    """
+    try:
+        result = await order_manager.create_order(
+            to_order_input(order_input.value, securities)
+        )
+    except OrderRejected as error:
+        raise BadRequest(str(error))
+    security = securities.get_security(result.order.security_id)
+    return json_response(
+        metrics.timed(
+            SERIALIZATION, security.id, encode_create_order_result, result, security
+        )
+    )
+
+
+@post("/orders/batch")
+async def create_orders(
+    order_inputs: FromJSON[List[CreateOrderRequest]],
+    order_manager: OrderManager,
+    securities: SecuritiesRepository,
+):
     """
-    return json(order_manager.create_order(order_input.value))
+    Place a batch of orders, which may be for different securities.
+    :param order_inputs: The orders, matched in the order they are listed.
+    :return: The result of each order, as returned by `POST /orders`, in the same order. 400 if any of the orders
+        is invalid or fails a pre-trade risk check, in which case none is placed.
+    """
+    try:
+        results = await order_manager.create_orders(
+            [
+                to_order_input(order_input, securities)
+                for order_input in order_inputs.value
+            ]
+        )
+    except OrderRejected as error:
+        raise BadRequest(str(error))
+    return json_response(encode_create_order_results(results, securities))
 
 
 @get("/orders")
-def list_orders(order_manager: OrderManager):
+def list_orders(
+    order_manager: OrderManager,
+    securities: SecuritiesRepository,
+    client_id: Optional[int] = None,
+    security_id: Optional[int] = None,
+    side: Optional[str] = None,
+    status: Optional[str] = None,
+    cursor: int = 0,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
     """
-    List all orders
+    List orders, a page at a time, in the order they were placed.
+    :param client_id: Only list the orders of this client.
+    :param security_id: Only list the orders for this security.
+    :param side: Only list the orders on this side, "buy" or "sell".
+    :param status: Only list the orders with this status.
+    :param cursor: Where the page starts: 0 for the first page, then the `next_cursor` of the previous page.
+    :param limit: The number of orders in a page, from 1 to 1000.
+    :return: The orders of the page, and the cursor of the next page, or null if this is the last one.
     """
-    return json(order_manager.list_orders())
+
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise BadRequest(f"Limit must be between 1 and {MAX_PAGE_SIZE}")
+    try:
+        page = order_manager.query_orders(
+            client_id=client_id,
+            security_id=security_id,
+            side=None if side is None else Side(side),
+            status=None if status is None else OrderStatus(status),
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as error:
+        raise BadRequest(str(error))
+
+    return json_response(encode_order_page(page, securities))
 
 
 @get("/orders/{order_id}")
-def get_order(order_id: int, order_manager: OrderManager):
+def get_order(
+    order_id: str, order_manager: OrderManager, securities: SecuritiesRepository
+):
     """
     Get an order by ID
     """
-    return json(order_manager.get_order(order_id))
+    order = order_manager.get_order(order_id)
+    if order is None:
+        return not_found()
+    return json_response(
+        encode_order(order, securities.get_security(order.security_id))
+    )
+
+
+@delete("/orders/{order_id}")
+async def cancel_order(
+    order_id: str,
+    order_manager: OrderManager,
+    securities: SecuritiesRepository,
+    metrics: Metrics,
+):
+    """
+    Cancel the remainder of an order.
+    :return: The cancelled order, with the quantity filled before it was cancelled. 409 if the order was filled
+        before it could be cancelled.
+    """
+    order = await order_manager.cancel_order(order_id)
+    if order is None:
+        return not_found()
+    if order.status is not OrderStatus.cancelled:
+        raise Conflict(f"Order {order_id} is {order.status.value}")
+    security = securities.get_security(order.security_id)
+    return json_response(
+        metrics.timed(SERIALIZATION, security.id, encode_order, order, security)
+    )
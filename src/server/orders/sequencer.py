@@ -0,0 +1,431 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    ClassVar,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from ..metrics.model import REPOSITORY_WRITE
+from .depth import BookDepth
+from .matcher import (
+    BatchResult,
+    BookSize,
+    Execution,
+    MatchResult,
+    Matcher,
+    OrderBookOrder,
+    RootMatcher,
+    TriggeredOrder,
+)
+from .model import Order, OrderRepository
+
+if TYPE_CHECKING:
+    from ..market_data.feed import MarketDataFeed
+    from ..market_data.trades import TradeStore
+    from ..metrics.model import Metrics
+    from .journal import Journal
+
+
+@dataclass
+class Command:
+    """
+    A change to the order book of a security, applied by the sequencer of that security.
+    Subclasses provide the `security_id` the command applies to.
+    :param sequence: The global sequence number of the command, assigned by the `Sequencer` when it is accepted.
+        Commands carrying several orders take one sequence number per order, starting from this one. Commands that
+        only read the book take no sequence number, and are given that of the last command applied to the book.
+    """
+
+    sequence: Optional[int] = field(default=None, kw_only=True)
+    # Whether the command only reads the book, and is applied with `read` rather than sequenced
+    read_only: ClassVar[bool] = False
+
+    @property
+    def size(self) -> int:
+        """
+        The number of sequence numbers taken by the command.
+        """
+
+        return 1
+
+    def apply(self, matcher: Matcher) -> Any:
+        raise NotImplementedError
+
+    def executions(self, result: Any) -> Iterable[Execution]:
+        """
+        The executions produced by the command, given the result of applying it.
+        """
+
+        return ()
+
+    def fills(self, result: Any) -> Iterable[int]:
+        """
+        The number of executions produced by each order of the command; nothing for commands not adding orders.
+        """
+
+        return ()
+
+    def record(self, result: Any, order_repository: OrderRepository):
+        """
+        Record the outcome of the command in the order repository, given the result of applying it.
+        """
+
+
+def record_triggered(
+    order_repository: OrderRepository, triggered: Iterable[TriggeredOrder]
+):
+    for stop in triggered:
+        order_repository.record_match(
+            stop.order_id,
+            stop.executions,
+            stop.self_trade_cancels,
+            stop.resting is None,
+        )
+
+
+@dataclass
+class AddOrder(Command):
+    order: Order
+
+    @property
+    def security_id(self) -> int:
+        return self.order.security_id
+
+    def apply(self, matcher: Matcher) -> MatchResult:
+        return matcher.add(self.order)
+
+    def executions(self, result: MatchResult) -> Iterable[Execution]:
+        if result.triggered:
+            return chain(
+                result.executions,
+                *(triggered.executions for triggered in result.triggered),
+            )
+        return result.executions
+
+    def fills(self, result: MatchResult) -> Iterable[int]:
+        if result.triggered:
+            return (
+                len(result.executions),
+                *(len(triggered.executions) for triggered in result.triggered),
+            )
+        return (len(result.executions),)
+
+    def record(self, result: MatchResult, order_repository: OrderRepository):
+        # The order, the fills of the order and of the resting orders it traded with, then what self-trade prevention
+        # cancelled, and the remainder of the order if it was kept out of the book; then the same for the stop orders
+        # its trades triggered
+        order_repository.create_order(self.order)
+        order_repository.record_match(
+            self.order.id,
+            result.executions,
+            result.self_trade_cancels,
+            result.resting is None and not result.pending,
+        )
+        if result.triggered:
+            record_triggered(order_repository, result.triggered)
+
+
+@dataclass
+class AddOrders(Command):
+    """
+    A batch of orders for the same security, matched in one pass.
+    """
+
+    security_id: int
+    orders: List[Order]
+
+    @property
+    def size(self) -> int:
+        return len(self.orders)
+
+    def apply(self, matcher: Matcher) -> BatchResult:
+        return matcher.add_batch(self.orders)
+
+    def executions(self, result: BatchResult) -> Iterable[Execution]:
+        for executions, triggered in zip(result.executions, result.triggered):
+            yield from executions
+            for stop in triggered:
+                yield from stop.executions
+
+    def fills(self, result: BatchResult) -> Iterable[int]:
+        return chain(
+            map(len, result.executions),
+            (
+                len(stop.executions)
+                for triggered in result.triggered
+                for stop in triggered
+            ),
+        )
+
+    def record(self, result: BatchResult, order_repository: OrderRepository):
+        for order in self.orders:
+            order_repository.create_order(order)
+        self.record_matches(result, order_repository)
+
+    def record_matches(self, result: BatchResult, order_repository: OrderRepository):
+        """
+        Record the outcome of matching each order of the batch, once the orders are in the repository.
+        """
+
+        for index, order in enumerate(self.orders):
+            order_repository.record_match(
+                order.id,
+                result.executions[index],
+                result.self_trade_cancels[index],
+                result.resting[index] is None and not result.pending[index],
+            )
+            if result.triggered[index]:
+                record_triggered(order_repository, result.triggered[index])
+
+
+@dataclass
+class CancelOrder(Command):
+    security_id: int
+    order_id: str
+
+    def apply(self, matcher: Matcher) -> Union[OrderBookOrder, Order, None]:
+        return matcher.cancel(self.order_id)
+
+    def record(
+        self,
+        result: Union[OrderBookOrder, Order, None],
+        order_repository: OrderRepository,
+    ):
+        if result is not None:
+            order_repository.cancel(self.order_id)
+
+
+@dataclass
+class ReadDepth(Command):
+    """
+    A read of the best price levels of the order book of a security, as returned by `Matcher.depth`, or of every
+    price level without a depth.
+    """
+
+    security_id: int
+    depth: Optional[int] = None
+
+    read_only: ClassVar[bool] = True
+
+    def apply(self, matcher: Matcher) -> BookDepth:
+        if self.depth is not None:
+            asks, bids = matcher.depth(self.depth)
+        else:
+            asks = [(price, level.quantity) for price, level in matcher.asks.items()]
+            bids = [
+                (price, matcher.bids[price].quantity)
+                for price in reversed(matcher.bids)
+            ]
+        return BookDepth(self.sequence, asks, bids)
+
+
+@dataclass
+class ReadBookSize(Command):
+    """
+    A read of the number of price levels and resting orders of the order book of a security.
+    """
+
+    security_id: int
+
+    read_only: ClassVar[bool] = True
+
+    def apply(self, matcher: Matcher) -> BookSize:
+        return matcher.size()
+
+
+class Sequencer:
+    """
+    Single writer for the order books of the `RootMatcher`.
+
+    Each security has its own queue of commands, drained by a dedicated consumer task that applies them to the
+    security's `Matcher` one at a time. Requests for the same security never interleave their changes to the book,
+    while requests for different securities never wait for each other.
+
+    Commands are stamped with a global sequence number when they are accepted, which gives a total order of all the
+    changes made to the exchange.
+
+    With an `OrderRepository`, each command records its orders, fills and cancels in the same step as it is applied, so
+    the repository changes in sequence order and always agrees with the books, including in a snapshot.
+
+    With a `Journal`, each command is encoded before it is applied, and rejected if it cannot be, then journaled once
+    applied, and its caller only gets the result once the command is on disk. With a `MarketDataFeed`, the price levels
+    changed by each command are published once it is applied, and with a `TradeStore`, the executions it produced are
+    recorded as trades. With enabled `Metrics`, the time taken to match each command adding orders is recorded, with
+    its fills and the price levels it changed, as is the time taken to record each command in the repository.
+
+    A command that changed the book but could not then be journaled, published or recorded halts its security: the
+    book no longer agrees with the rest of the exchange, so no further command is applied to it.
+    """
+
+    def __init__(
+        self,
+        root_matcher: RootMatcher,
+        journal: Optional["Journal"] = None,
+        feed: Optional["MarketDataFeed"] = None,
+        trades: Optional["TradeStore"] = None,
+        metrics: Optional["Metrics"] = None,
+        order_repository: Optional[OrderRepository] = None,
+    ):
+        self.root_matcher = root_matcher
+        self.journal = journal
+        self.feed = feed
+        self.trades = trades
+        self.metrics = metrics if metrics is not None and metrics.enabled else None
+        self.order_repository = order_repository
+        self.last_sequence = 0
+        # The sequence number of the last command applied to the book of each security
+        self.sequences: Dict[int, int] = {}
+        self.queues: Dict[int, asyncio.Queue[Tuple[Command, asyncio.Future]]] = {}
+        self.consumers: Dict[int, asyncio.Task] = {}
+
+    async def submit(self, command: Command) -> Any:
+        """
+        Queue a command behind the others for its security and wait for it to be applied.
+        :return: The result of applying the command to the matcher.
+        :raises KeyError: If the security is unknown.
+        :raises RuntimeError: If the security is halted, after failing to journal, publish or record a command.
+        """
+
+        queue = self.queues.get(command.security_id)
+        if queue is None:
+            queue = self._start(command.security_id)
+        elif self.consumers[command.security_id].done():
+            raise RuntimeError(f"Security {command.security_id} is halted")
+
+        command.sequence = self.last_sequence + 1
+        self.last_sequence += command.size
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((command, future))
+
+        result = await future
+        if self.journal is not None:
+            await self.journal.sync()
+        return result
+
+    async def read(self, command: Command) -> Any:
+        """
+        Apply a command that only reads the order book of its security, such as `ReadDepth`. Commands are applied
+        synchronously on the event loop, so the read sees the book as of the last command applied.
+        :raises KeyError: If the security is unknown.
+        """
+
+        matcher = self.root_matcher.get_matcher(command.security_id)
+        command.sequence = self.sequences.get(command.security_id, 0)
+        return command.apply(matcher)
+
+    async def stop(self):
+        """
+        Stop the consumers. Commands still queued are not applied.
+        """
+
+        for consumer in self.consumers.values():
+            consumer.cancel()
+        await asyncio.gather(*self.consumers.values(), return_exceptions=True)
+
+        self.queues.clear()
+        self.consumers.clear()
+
+    def _start(self, security_id: int) -> asyncio.Queue:
+        matcher = self.root_matcher.get_matcher(security_id)
+
+        queue = self.queues[security_id] = asyncio.Queue()
+        self.consumers[security_id] = asyncio.create_task(
+            self._consume(
+                matcher,
+                queue,
+                self.journal,
+                self.feed,
+                self.trades,
+                self.metrics,
+                self.order_repository,
+                self.sequences,
+            ),
+            name=f"sequencer-{security_id}",
+        )
+
+        return queue
+
+    @staticmethod
+    async def _consume(
+        matcher: Matcher,
+        queue: asyncio.Queue,
+        journal: Optional["Journal"],
+        feed: Optional["MarketDataFeed"],
+        trades: Optional["TradeStore"],
+        metrics: Optional["Metrics"],
+        order_repository: Optional[OrderRepository],
+        sequences: Dict[int, int],
+    ):
+        clock = time.perf_counter_ns
+        while True:
+            command, future = await queue.get()
+
+            # Commands are applied even if the caller stopped waiting, as they were accepted into the sequence. A
+            # command that cannot be encoded or applied leaves the book as it was, so its error goes to the caller
+            # and the consumer moves on to the next command
+            try:
+                if journal is not None:
+                    records = journal.prepare(command)
+
+                if metrics is None:
+                    result = command.apply(matcher)
+                else:
+                    start = clock()
+                    result = command.apply(matcher)
+                    duration = clock() - start
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+                continue
+            sequences[command.security_id] = command.sequence
+
+            # Once applied, the command is journaled first, so the journal always replays to the book in memory.
+            # Failing to journal, publish or record it leaves them disagreeing with the book, so the security is
+            # halted: the error goes to the caller, and the commands queued behind it fail, as do later submits
+            try:
+                if journal is not None:
+                    journal.append(command, result, records)
+                if feed is not None:
+                    feed.publish(command.security_id, command.sequence, matcher.updates)
+                if trades is not None:
+                    trades.record(
+                        command.security_id, time.time_ns(), command.executions(result)
+                    )
+                if order_repository is not None:
+                    if metrics is None:
+                        command.record(result, order_repository)
+                    else:
+                        metrics.timed(
+                            REPOSITORY_WRITE,
+                            command.security_id,
+                            command.record,
+                            result,
+                            order_repository,
+                        )
+                if metrics is not None:
+                    fills = command.fills(result)
+                    if fills:
+                        metrics.record_match(
+                            command.security_id, duration, fills, len(matcher.updates)
+                        )
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+                halted = RuntimeError(f"Security {command.security_id} is halted")
+                while not queue.empty():
+                    _, queued = queue.get_nowait()
+                    if not queued.done():
+                        queued.set_exception(halted)
+                raise
+
+            if not future.done():
+                future.set_result(result)
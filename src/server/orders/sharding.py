@@ -0,0 +1,363 @@
+import asyncio
+import multiprocessing
+import queue
+import threading
+from itertools import count
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from ..metrics.model import REPOSITORY_WRITE, Metrics
+from ..securities.model import Security
+from .matcher import (
+    BatchResult,
+    LevelUpdate,
+    MatchResult,
+    Matcher,
+    OrderBookOrder,
+    TriggeredOrder,
+)
+from .model import OrderRepository
+from .sequencer import Command
+
+if TYPE_CHECKING:
+    from ..market_data.feed import MarketDataFeed
+
+
+def shard_of(security_id: int, shards: int) -> int:
+    """
+    The index of the shard owning a security.
+    """
+
+    return hash(security_id) % shards
+
+
+def detach(result: Any) -> Any:
+    """
+    Strip a command's result down to what can be sent back from a worker cheaply: the order book is left out of match
+    results, and book entries are copied without their links to the rest of the book.
+    """
+
+    if isinstance(result, MatchResult):
+        return MatchResult(
+            order_book=None,
+            executions=result.executions,
+            resting=detach(result.resting),
+            updates=result.updates,
+            self_trade_cancels=result.self_trade_cancels,
+            pending=result.pending,
+            triggered=[detach(triggered) for triggered in result.triggered],
+        )
+    if isinstance(result, BatchResult):
+        return BatchResult(
+            executions=result.executions,
+            resting=[detach(resting) for resting in result.resting],
+            resting_quantities=result.resting_quantities,
+            updates=result.updates,
+            self_trade_cancels=result.self_trade_cancels,
+            pending=result.pending,
+            triggered=[
+                [detach(stop) for stop in triggered] for triggered in result.triggered
+            ],
+        )
+    if isinstance(result, TriggeredOrder):
+        return TriggeredOrder(
+            order_id=result.order_id,
+            executions=result.executions,
+            resting=detach(result.resting),
+            self_trade_cancels=result.self_trade_cancels,
+        )
+    if isinstance(result, OrderBookOrder):
+        return OrderBookOrder(
+            maker_id=result.maker_id,
+            quantity=result.quantity,
+            price=result.price,
+            order_id=result.order_id,
+        )
+    return result
+
+
+def run_worker(requests: Connection, replies: Connection, securities: List[Security]):
+    """
+    Entry point of a matcher worker process.
+
+    Receives batches of `(request_id, command)` pairs and applies them in order to the matchers of the securities it
+    owns, replying with a batch of `(request_id, error, result, updates)` tuples, where `updates` are the price levels
+    changed by a command that is not a read. Stops when it receives None.
+    """
+
+    matchers: Dict[int, Matcher] = {
+        security.id: Matcher.for_security(security) for security in securities
+    }
+    # The sequence number of the last command applied to each book, given to the reads of the book
+    sequences: Dict[int, int] = {}
+
+    while True:
+        try:
+            batch = requests.recv()
+        except EOFError:
+            break
+        if batch is None:
+            break
+
+        results = []
+        for request_id, command in batch:
+            try:
+                matcher = matchers[command.security_id]
+                if command.read_only:
+                    command.sequence = sequences.get(command.security_id, 0)
+                result = command.apply(matcher)
+            except Exception as error:
+                results.append((request_id, error, None, None))
+            else:
+                if command.read_only:
+                    results.append((request_id, None, result, None))
+                else:
+                    sequences[command.security_id] = command.sequence
+                    results.append((request_id, None, detach(result), matcher.updates))
+
+        replies.send(results)
+
+    replies.close()
+
+
+class Shard:
+    """
+    The front end's side of a matcher worker process.
+
+    Commands are queued to a writer thread, which sends everything queued since its last send as one batch, and
+    replies are read by a reader thread which hands them back to the event loop. Neither the event loop nor the worker
+    ever blocks on the other.
+
+    The worker applies the commands of each security in the order they were submitted, and replies in that order, so
+    recording each command in the order repository, and publishing the price levels it changed to the
+    `MarketDataFeed`, as its reply comes back does both in sequence order.
+
+    If the worker exits, the requests still waiting for a reply fail, as do the commands submitted after.
+    """
+
+    def __init__(
+        self,
+        context: multiprocessing.context.BaseContext,
+        securities: List[Security],
+        loop: asyncio.AbstractEventLoop,
+        order_repository: Optional[OrderRepository] = None,
+        metrics: Optional[Metrics] = None,
+        feed: Optional["MarketDataFeed"] = None,
+    ):
+        self.loop = loop
+        self.order_repository = order_repository
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self.feed = feed
+        # The command and the future of each request
+        self.pending: Dict[int, Tuple[Command, asyncio.Future]] = {}
+        # Whether the worker exited, after which no more replies come
+        self.exited = False
+        self.outbox: queue.SimpleQueue = queue.SimpleQueue()
+
+        worker_requests, self.requests = context.Pipe(duplex=False)
+        self.replies, worker_replies = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=run_worker,
+            args=(worker_requests, worker_replies, securities),
+            daemon=True,
+        )
+        self.process.start()
+        worker_requests.close()
+        worker_replies.close()
+
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.writer.start()
+        self.reader.start()
+
+    def submit(self, request_id: int, command: Command) -> asyncio.Future:
+        """
+        :raises RuntimeError: If the worker exited.
+        """
+
+        if self.exited:
+            raise RuntimeError(f"Matcher worker {self.process.pid} exited")
+        future = self.loop.create_future()
+        self.pending[request_id] = (command, future)
+        self.outbox.put((request_id, command))
+        return future
+
+    def stop(self):
+        """
+        Ask the worker to stop once it has applied the commands already submitted, and wait for it to exit.
+        """
+
+        self.outbox.put(None)
+        self.writer.join()
+        self.reader.join()
+        self.process.join()
+
+    def _write(self):
+        while True:
+            batch = [self.outbox.get()]
+            while True:
+                try:
+                    batch.append(self.outbox.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            try:
+                if batch:
+                    self.requests.send(batch)
+                if stop:
+                    self.requests.send(None)
+            except OSError:
+                # The worker exited, which the reader finds out about too, and fails the requests sent
+                stop = True
+            if stop:
+                self.requests.close()
+                return
+
+    def _read(self):
+        while True:
+            try:
+                results = self.replies.recv()
+            except (EOFError, OSError):
+                break
+            self.loop.call_soon_threadsafe(self._resolve, results)
+
+        # The replies already read are resolved first. After a clean stop, nothing is left waiting
+        try:
+            self.loop.call_soon_threadsafe(self._fail)
+        except RuntimeError:
+            # The event loop is closed
+            pass
+
+    def _fail(self):
+        self.exited = True
+        pending, self.pending = self.pending, {}
+        for _, future in pending.values():
+            if not future.done():
+                future.set_exception(
+                    RuntimeError(f"Matcher worker {self.process.pid} exited")
+                )
+
+    def _resolve(
+        self,
+        results: List[Tuple[int, Exception, Any, Optional[List[LevelUpdate]]]],
+    ):
+        for request_id, error, result, updates in results:
+            command, future = self.pending.pop(request_id)
+            # Commands are published and recorded even if the caller stopped waiting, as they were applied
+            if error is None and not command.read_only and self.feed is not None:
+                self.feed.publish(command.security_id, command.sequence, updates)
+            if (
+                error is None
+                and not command.read_only
+                and self.order_repository is not None
+            ):
+                try:
+                    self.metrics.timed(
+                        REPOSITORY_WRITE,
+                        command.security_id,
+                        command.record,
+                        result,
+                        self.order_repository,
+                    )
+                except Exception as record_error:
+                    error = record_error
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+class ShardedSequencer:
+    """
+    Sequencer that partitions the securities across matcher worker processes, so that matching is not limited to the
+    single core of the web server's interpreter.
+
+    Securities are hash-partitioned across the workers, and each worker applies the commands for its securities in the
+    order they were submitted. Commands are stamped with a global sequence number, as with `Sequencer`.
+
+    Results come back without the order book (see `detach`), which stays in the worker that owns it. With an
+    `OrderRepository`, each command is recorded in it as its result comes back, timed by `Metrics`, and with a
+    `MarketDataFeed`, the price levels it changed are published.
+    """
+
+    def __init__(
+        self,
+        securities: Iterable[Security],
+        workers: int,
+        order_repository: Optional[OrderRepository] = None,
+        metrics: Optional[Metrics] = None,
+        feed: Optional["MarketDataFeed"] = None,
+    ):
+        self.securities = {security.id: security for security in securities}
+        self.workers = workers
+        self.order_repository = order_repository
+        self.metrics = metrics
+        self.feed = feed
+        self.last_sequence = 0
+        self.requests = count()
+        self.shards: List[Shard] = []
+
+    async def start(self):
+        """
+        Start the worker processes.
+        """
+
+        if self.shards:
+            return
+
+        partitions: List[List[Security]] = [[] for _ in range(self.workers)]
+        for security in self.securities.values():
+            partitions[shard_of(security.id, self.workers)].append(security)
+
+        # Workers are spawned rather than forked, as the front end runs threads and an event loop
+        context = multiprocessing.get_context("spawn")
+        loop = asyncio.get_running_loop()
+        self.shards = [
+            Shard(
+                context, partition, loop, self.order_repository, self.metrics, self.feed
+            )
+            for partition in partitions
+        ]
+
+    async def submit(self, command: Command) -> Any:
+        """
+        Send a command to the worker owning its security and wait for it to be applied.
+        :return: The result of applying the command, see `detach`.
+        :raises KeyError: If the security is unknown.
+        """
+
+        shard = await self._shard(command.security_id)
+        command.sequence = self.last_sequence + 1
+        self.last_sequence += command.size
+
+        return await shard.submit(next(self.requests), command)
+
+    async def read(self, command: Command) -> Any:
+        """
+        Apply a command that only reads the order book of its security, such as `ReadDepth`, in the worker owning the
+        book. The read is queued behind the commands already submitted for the worker, so it sees their changes.
+        :raises KeyError: If the security is unknown.
+        """
+
+        shard = await self._shard(command.security_id)
+        return await shard.submit(next(self.requests), command)
+
+    async def stop(self):
+        """
+        Stop the workers once they have applied the commands already submitted.
+        """
+
+        shards, self.shards = self.shards, []
+        await asyncio.gather(*(asyncio.to_thread(shard.stop) for shard in shards))
+
+    async def _shard(self, security_id: int) -> Shard:
+        if security_id not in self.securities:
+            raise KeyError(security_id)
+        if not self.shards:
+            await self.start()
+        return self.shards[shard_of(security_id, len(self.shards))]
@@ -0,0 +1,355 @@
+import asyncio
+import mmap
+import os
+import struct
+import warnings
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+from .journal import Journal, replay
+from .matcher import Matcher, OrderBookOrder, PriceLevel, RootMatcher
+from .model import Order, OrderRepository, OrderStatus, OrderType, Side, TimeInForce
+from .sequencer import Sequencer
+
+# A snapshot is a header, followed by a section per order book and a section for the order store. Each section is a
+# count header, an array of fixed-size entries, and a blob of the entries' order IDs, which each entry locates by the
+# offset of the end of its ID. Fixed-size entries decode with a single `iter_unpack` over the memory-mapped file.
+# Each order book section is followed by the stop orders waiting for their trigger, encoded as the order store is.
+MAGIC = b"PYOBSNP6"
+# magic, sequence, journal offset, number of order books
+HEADER = struct.Struct("<8sQQI")
+# security, number of entries, size of the ID blob, has a last trade price, last trade price
+BOOK = struct.Struct("<iII?q")
+# side, price, maker, quantity, end of the order ID; in price order on each side, and in time priority at each price
+BOOK_ENTRY = struct.Struct("<Bqqqi")
+# number of orders, size of the ID blob
+ORDERS = struct.Struct("<II")
+# client, security, side, type, quantity, has price, price, status, filled quantity, filled notional, time in force,
+# has stop price, stop price, cancelled quantity, end of the order ID
+ORDER_ENTRY = struct.Struct("<qiBBq?qBqqB?qqI")
+
+SIDES = list(Side)
+ORDER_TYPES = list(OrderType)
+STATUSES = list(OrderStatus)
+TIMES_IN_FORCE = list(TimeInForce)
+ASK = SIDES.index(Side.SELL)
+BID = SIDES.index(Side.BUY)
+
+
+@dataclass
+class SnapshotPosition:
+    """
+    Where a snapshot stands in the history of the exchange.
+    :param sequence: The last sequence number assigned when the snapshot was taken.
+    :param journal_offset: The size of the journal when the snapshot was taken; the commands after it are not in the
+        snapshot, and are replayed on top of it.
+    """
+
+    sequence: int
+    journal_offset: int
+
+
+def encode_book(matcher: Matcher) -> bytes:
+    entries = bytearray()
+    ids = bytearray()
+    count = 0
+
+    for side, book in ((ASK, matcher.asks), (BID, matcher.bids)):
+        for price, level in book.items():
+            for entry in level:
+                if entry.order_id is not None:
+                    ids += entry.order_id.encode()
+                # Entries without an order ID are marked with a negative end
+                entries += BOOK_ENTRY.pack(
+                    side,
+                    price,
+                    entry.maker_id,
+                    entry.quantity,
+                    len(ids) if entry.order_id is not None else -1,
+                )
+                count += 1
+
+    return (
+        BOOK.pack(
+            matcher.order_book.security_id,
+            count,
+            len(ids),
+            matcher.last_price is not None,
+            matcher.last_price or 0,
+        )
+        + entries
+        + ids
+        + encode_orders(matcher.triggers)
+    )
+
+
+def encode_orders(orders: Iterable[Order]) -> bytes:
+    entries = bytearray()
+    ids = bytearray()
+    count = 0
+
+    for order in orders:
+        ids += order.id.encode()
+        entries += ORDER_ENTRY.pack(
+            order.client_id,
+            order.security_id,
+            SIDES.index(order.side),
+            ORDER_TYPES.index(order.type),
+            order.quantity,
+            order.price is not None,
+            order.price or 0,
+            STATUSES.index(order.status),
+            order.filled_quantity,
+            order.filled_notional,
+            TIMES_IN_FORCE.index(order.time_in_force),
+            order.stop_price is not None,
+            order.stop_price or 0,
+            order.cancelled_quantity,
+            len(ids),
+        )
+        count += 1
+
+    return ORDERS.pack(count, len(ids)) + entries + ids
+
+
+def write_snapshot(
+    path: str,
+    root_matcher: RootMatcher,
+    order_repository: OrderRepository,
+    position: SnapshotPosition,
+):
+    """
+    Write a snapshot of the order books and the order store. The snapshot replaces any previous one at `path` only once
+    it is complete and on disk.
+    """
+
+    matchers = list(root_matcher.matchers.values())
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(
+            HEADER.pack(
+                MAGIC, position.sequence, position.journal_offset, len(matchers)
+            )
+        )
+        for matcher in matchers:
+            file.write(encode_book(matcher))
+        file.write(encode_orders(order_repository.orders.values()))
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary, path)
+
+
+def load_snapshot(
+    path: str, root_matcher: RootMatcher, order_repository: OrderRepository
+) -> Optional[SnapshotPosition]:
+    """
+    Restore the order books and the order store from a snapshot, which is memory-mapped rather than read.
+    The matchers of the `RootMatcher` are replaced by matchers holding the restored books.
+    :return: The position of the snapshot, or None if there is no snapshot.
+    :raises ValueError: If the file is not a snapshot.
+    """
+
+    if not os.path.exists(path):
+        return None
+
+    with (
+        open(path, "rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping,
+        memoryview(mapping) as data,
+    ):
+        magic, sequence, journal_offset, books = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an order book snapshot")
+
+        offset = HEADER.size
+        for _ in range(books):
+            offset = load_book(data, offset, root_matcher)
+        load_orders(data, offset, order_repository.create_order)
+
+    return SnapshotPosition(sequence=sequence, journal_offset=journal_offset)
+
+
+def load_book(data: memoryview, offset: int, root_matcher: RootMatcher) -> int:
+    security_id, count, ids_size, has_last_price, last_price = BOOK.unpack_from(
+        data, offset
+    )
+    entries_start = offset + BOOK.size
+    ids_start = entries_start + count * BOOK_ENTRY.size
+
+    # The restored book uses the engine and self-trade prevention configured for the security, as the matcher's empty
+    # book does
+    empty = root_matcher.get_matcher(security_id)
+    order_book = empty.order_book
+    books = {ASK: order_book.asks, BID: order_book.bids}
+    ids = bytes(data[ids_start : ids_start + ids_size])
+
+    # Entries come in price order, so the level of an entry is either the level of the previous entry or a new one.
+    # Objects are built with positional arguments, which is measurably faster for hundreds of thousands of them
+    level = PriceLevel(0)
+    level_side = None
+    id_start = 0
+    for side, price, maker_id, quantity, id_end in BOOK_ENTRY.iter_unpack(
+        data[entries_start:ids_start]
+    ):
+        order_id = None
+        if id_end >= 0:
+            order_id = ids[id_start:id_end].decode()
+            id_start = id_end
+
+        if price != level.price or side != level_side:
+            level = books[side][price] = PriceLevel(price)
+            level_side = side
+        level.append(OrderBookOrder(maker_id, quantity, price, order_id))
+
+    # A new matcher indexes the restored entries by order ID
+    matcher = root_matcher.matchers[security_id] = Matcher(
+        order_book, empty.self_trade_prevention
+    )
+    matcher.last_price = last_price if has_last_price else None
+
+    return load_orders(data, ids_start + ids_size, matcher.triggers.add)
+
+
+def load_orders(data: memoryview, offset: int, add: Callable[[Order], Any]) -> int:
+    """
+    Decode a section of orders, passing each to `add`.
+    :return: The offset of the end of the section.
+    """
+
+    count, ids_size = ORDERS.unpack_from(data, offset)
+    entries_start = offset + ORDERS.size
+    ids_start = entries_start + count * ORDER_ENTRY.size
+    ids = bytes(data[ids_start : ids_start + ids_size])
+
+    id_start = 0
+    for (
+        client_id,
+        security_id,
+        side,
+        order_type,
+        quantity,
+        has_price,
+        price,
+        status,
+        filled_quantity,
+        filled_notional,
+        time_in_force,
+        has_stop_price,
+        stop_price,
+        cancelled_quantity,
+        id_end,
+    ) in ORDER_ENTRY.iter_unpack(data[entries_start:ids_start]):
+        order_id = ids[id_start:id_end].decode()
+        id_start = id_end
+        add(
+            Order(
+                order_id,
+                client_id,
+                security_id,
+                SIDES[side],
+                quantity,
+                ORDER_TYPES[order_type],
+                price if has_price else None,
+                STATUSES[status],
+                filled_quantity,
+                filled_notional,
+                TIMES_IN_FORCE[time_in_force],
+                stop_price if has_stop_price else None,
+                cancelled_quantity,
+            )
+        )
+
+    return ids_start + ids_size
+
+
+async def take_snapshot(
+    path: str,
+    root_matcher: RootMatcher,
+    order_repository: OrderRepository,
+    sequencer: Sequencer,
+    journal: Optional[Journal] = None,
+) -> SnapshotPosition:
+    """
+    Snapshot the order books and the order store without stalling matching.
+
+    The process forks, and the child writes the snapshot from its copy-on-write view of memory while the parent goes on
+    matching. The sequencer applies each command, records it in the order store and journals it in one synchronous
+    step on the event loop, so the fork sees every book and the order store exactly as of the last command applied,
+    which is also the last command journaled. Where fork is not available, the snapshot is written on the event loop
+    instead, which does stall matching while it encodes and writes the books.
+    """
+
+    position = SnapshotPosition(
+        sequence=sequencer.last_sequence,
+        journal_offset=0 if journal is None else journal.size,
+    )
+    arguments = (path, root_matcher, order_repository, position)
+
+    if not hasattr(os, "fork"):
+        write_snapshot(*arguments)
+        return position
+
+    with warnings.catch_warnings():
+        # The child only encodes and writes the snapshot, and takes none of the locks held by the parent's threads
+        warnings.simplefilter("ignore", DeprecationWarning)
+        pid = os.fork()
+
+    if pid == 0:
+        status = 1
+        try:
+            write_snapshot(*arguments)
+            status = 0
+        finally:
+            os._exit(status)
+
+    _, status = await asyncio.to_thread(os.waitpid, pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"Snapshot to {path} failed")
+
+    return position
+
+
+async def snapshot_periodically(interval: float, *arguments):
+    """
+    Take a snapshot every `interval` seconds, until cancelled.
+    :param arguments: The arguments of `take_snapshot`.
+    """
+
+    while True:
+        await asyncio.sleep(interval)
+        await take_snapshot(*arguments)
+
+
+def restore(
+    snapshot_path: Optional[str],
+    journal_path: Optional[str],
+    root_matcher: RootMatcher,
+    order_repository: OrderRepository,
+) -> int:
+    """
+    Restore the order books and the order store from the last snapshot, if any, then replay the commands journaled
+    after it.
+    :return: The last sequence number assigned before the restart.
+    """
+
+    position = None
+    if snapshot_path is not None:
+        position = load_snapshot(snapshot_path, root_matcher, order_repository)
+    if position is None:
+        position = SnapshotPosition(sequence=0, journal_offset=0)
+
+    last_sequence = position.sequence
+    if journal_path is not None:
+        last_sequence = max(
+            last_sequence,
+            replay(
+                journal_path,
+                root_matcher,
+                order_repository,
+                offset=position.journal_offset,
+            ),
+        )
+
+    return last_sequence
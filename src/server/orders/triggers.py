@@ -0,0 +1,81 @@
+from typing import Dict, Iterator, List, Optional
+
+from sortedcontainers import SortedDict
+
+from .model import Order, Side
+
+
+class TriggerBook:
+    """
+    The stop orders of a security waiting for their trigger, indexed by stop price on each side.
+
+    Buy stops are triggered by trades at or above their stop price, and sell stops by trades at or below it, so the
+    stops triggered by a run of trades are a range of stop prices at the low end of the buy stops and at the high end of
+    the sell stops. They are read off the sorted stop prices without looking at the stops beyond the range. Stops at
+    the same price are kept in the order they were placed.
+    """
+
+    def __init__(self):
+        self.buys: SortedDict[int, Dict[str, Order]] = SortedDict()
+        self.sells: SortedDict[int, Dict[str, Order]] = SortedDict()
+        # Index of the stops by order ID, for constant-time cancels
+        self.orders: Dict[str, Order] = {}
+
+    def add(self, order: Order):
+        stops = self.buys if order.side is Side.BUY else self.sells
+        level = stops.get(order.stop_price)
+        if level is None:
+            level = stops[order.stop_price] = {}
+        level[order.id] = order
+        self.orders[order.id] = order
+
+    def remove(self, order_id: str) -> Optional[Order]:
+        """
+        :return: The stop order, or None if it is not waiting for its trigger.
+        """
+
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+
+        stops = self.buys if order.side is Side.BUY else self.sells
+        level = stops[order.stop_price]
+        del level[order_id]
+        if not level:
+            del stops[order.stop_price]
+        return order
+
+    def pop_triggered(self, low: int, high: int) -> List[Order]:
+        """
+        Remove and return the stop orders triggered by trades at prices from `low` to `high`: the buy stops at or below
+        `high`, lowest stop price first, then the sell stops at or above `low`, highest stop price first.
+        """
+
+        triggered = []
+        for stops, prices in (
+            (self.buys, list(self.buys.irange(maximum=high))),
+            (self.sells, list(self.sells.irange(minimum=low, reverse=True))),
+        ):
+            for price in prices:
+                level = stops.pop(price)
+                triggered.extend(level.values())
+                for order_id in level:
+                    del self.orders[order_id]
+        return triggered
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self.orders
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def __iter__(self) -> Iterator[Order]:
+        """
+        The stop orders in the order they would be triggered, each side in turn, which is also an order they can be
+        added back in to rebuild the book.
+        """
+
+        for level in self.buys.values():
+            yield from level.values()
+        for level in reversed(self.sells.values()):
+            yield from level.values()
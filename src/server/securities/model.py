@@ -1,10 +1,90 @@
 from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from enum import Enum
+from functools import cached_property
+from typing import Optional
+
+
+class BookEngine(Enum):
+    """
+    How the price levels of an order book are stored.
+    """
+
+    # Price levels in a sorted dictionary; suits any distribution of prices.
+    sorted = "sorted"
+    # Price levels in an array indexed by tick; suits liquid securities whose prices cluster around the touch.
+    ladder = "ladder"
+
+
+class SelfTradePrevention(Enum):
+    """
+    What happens when an incoming order would trade with a resting order of the same client.
+    """
+
+    # The orders trade
+    none = "none"
+    # The rest of the incoming order is cancelled
+    cancel_newest = "cancel_newest"
+    # The resting order is cancelled, and the incoming order goes on matching
+    cancel_oldest = "cancel_oldest"
+    # Both orders are reduced by the smaller of their quantities, cancelling at least one of them
+    decrement_both = "decrement_both"
 
 
 @dataclass
 class Security:
+    """
+    :param tick_size: The minimum price increment of the security. Prices are represented internally as an integer
+        number of ticks, and only converted to and from decimal prices at the HTTP boundary.
+    :param book_engine: The storage used for the order book of the security.
+    :param self_trade_prevention: How orders of the same client are kept from trading with each other.
+    """
+
     id: int
     symbol: str
+    tick_size: Decimal = Decimal("0.01")
+    book_engine: BookEngine = BookEngine.sorted
+    self_trade_prevention: SelfTradePrevention = SelfTradePrevention.none
+
+    def to_ticks(self, price: float) -> int:
+        """
+        Convert a price to an integer number of ticks.
+        :raises ValueError: If the price is not a finite number, is too large to convert, or is not a multiple of the
+            tick size.
+        """
+
+        try:
+            value = Decimal(str(price))
+            if not value.is_finite():
+                raise InvalidOperation
+            ticks, remainder = divmod(value, self.tick_size)
+        except InvalidOperation:
+            raise ValueError(f"Invalid price {price}")
+        if remainder:
+            raise ValueError(
+                f"Price {price} is not a multiple of the tick size {self.tick_size} of {self.symbol}"
+            )
+        return int(ticks)
+
+    def from_ticks(self, ticks: int) -> float:
+        """
+        Convert an integer number of ticks to a price.
+        """
+
+        if self._ticks_per_unit is not None:
+            return ticks / self._ticks_per_unit
+        return float(ticks * self.tick_size)
+
+    @cached_property
+    def _ticks_per_unit(self) -> Optional[int]:
+        """
+        The number of ticks in a unit of price, if the tick size divides it exactly, as 0.01 does. Dividing by it gives
+        the same float as converting the exact decimal price, since both are correctly rounded, without the cost of
+        decimal arithmetic.
+        """
+
+        ticks, remainder = divmod(Decimal(1), self.tick_size)
+        return None if remainder else int(ticks)
 
 
 class SecuritiesRepository:
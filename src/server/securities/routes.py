@@ -1,4 +1,4 @@
-from blacksheep import get, json
+from blacksheep import get, json, not_found
 
 from .model import SecuritiesRepository
 
@@ -8,7 +8,7 @@ def list_securities(repo: SecuritiesRepository):
     """
     List all available securities for trading.
     """
-    return json(repo.list_securities())
+    return json(list(repo.list_securities()))
 
 
 @get("/securities/:security_id")
@@ -16,4 +16,7 @@ def get_security(security_id: int, repo: SecuritiesRepository):
     """
     Get the details of a security.
     """
-    return json(repo.get_security(security_id))
+    try:
+        return json(repo.get_security(security_id))
+    except KeyError:
+        return not_found()
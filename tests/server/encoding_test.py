@@ -0,0 +1,142 @@
+import json
+from dataclasses import asdict, fields
+from decimal import Decimal
+
+from essentials.json import dumps
+
+from src.server.encoding import (
+    encode_book,
+    encode_book_delta,
+    encode_create_order_results,
+    encode_orders,
+)
+from src.server.market_data.feed import BookDelta
+from src.server.orders.manager import CreateOrderResult
+from src.server.orders.matcher import Execution, LevelUpdate
+from src.server.orders.model import Order, OrderStatus, OrderType, Side
+from src.server.securities.model import SecuritiesRepository, Security
+
+
+def securities() -> SecuritiesRepository:
+    repository = SecuritiesRepository()
+    repository.securities = {
+        1: Security(1, "CENT"),
+        2: Security(2, "EIGHTH", tick_size=Decimal("0.125")),
+        3: Security(3, "THIRD", tick_size=Decimal("0.3")),
+    }
+    return repository
+
+
+def orders():
+    return [
+        Order("a", 1, 1, Side.BUY, 100, OrderType.limit, 10_001),
+        Order('quote " \\ ünïcode', 2, 2, Side.SELL, 5, OrderType.limit, 17),
+        Order("c", 3, 3, Side.SELL, 7, OrderType.limit, 7),
+        Order("d", 4, 1, Side.BUY, 1, OrderType.market),
+        Order("e", 5, 2, Side.BUY, 3, OrderType.limit, 9, OrderStatus.filled, 3, 26),
+        Order("f", 6, 1, Side.SELL, 3, OrderType.limit, 1, OrderStatus.cancelled, 1, 1),
+        Order("g", 7, 2, Side.SELL, 4, OrderType.stop_limit, 8, stop_price=9),
+        Order("h", 8, 1, Side.BUY, 10, OrderType.limit, 5, cancelled_quantity=4),
+    ]
+
+
+def order_view(order: Order, security: Security) -> dict:
+    view = {
+        **asdict(order),
+        "price": None if order.price is None else security.from_ticks(order.price),
+        "stop_price": None
+        if order.stop_price is None
+        else security.from_ticks(order.stop_price),
+        "remaining_quantity": order.remaining_quantity,
+        "average_price": None
+        if order.average_price is None
+        else float(Decimal(order.average_price) * security.tick_size),
+    }
+    del view["filled_notional"]
+    return view
+
+
+def test_encode_orders():
+    repository = securities()
+    encoded = encode_orders(orders(), repository)
+
+    expected = [
+        order_view(order, repository.get_security(order.security_id))
+        for order in orders()
+    ]
+    # The same text as the generic encoder would write for the equivalent dicts
+    assert encoded == dumps(expected, separators=(",", ":"), ensure_ascii=False)
+    assert list(json.loads(encoded)[0]) == [
+        *(field.name for field in fields(Order) if field.name != "filled_notional"),
+        "remaining_quantity",
+        "average_price",
+    ]
+
+
+def test_encode_create_order_results():
+    repository = securities()
+    results = [
+        CreateOrderResult(
+            order=order,
+            sequence=i + 1,
+            executions=[
+                Execution(maker_id=9, taker_id=order.client_id, price=3, quantity=2)
+            ],
+            resting_quantity=max(order.quantity - 2, 0),
+        )
+        for i, order in enumerate(orders())
+    ]
+
+    expected = []
+    for result in results:
+        security = repository.get_security(result.order.security_id)
+        expected.append(
+            {
+                "order": order_view(result.order, security),
+                "sequence": result.sequence,
+                "executions": [
+                    {**asdict(execution), "price": security.from_ticks(execution.price)}
+                    for execution in result.executions
+                ],
+                "resting_quantity": result.resting_quantity,
+            }
+        )
+
+    assert encode_create_order_results(results, repository) == dumps(
+        expected, separators=(",", ":"), ensure_ascii=False
+    )
+
+
+def test_encode_book():
+    security = securities().get_security(2)
+
+    assert json.loads(encode_book(security, 12, [(8, 100), (9, 5)], [(7, 1)])) == {
+        "security_id": 2,
+        "sequence": 12,
+        "asks": [[1.0, 100], [1.125, 5]],
+        "bids": [[0.875, 1]],
+    }
+    assert json.loads(encode_book(security, 0, [], [])) == {
+        "security_id": 2,
+        "sequence": 0,
+        "asks": [],
+        "bids": [],
+    }
+
+
+def test_encode_book_delta():
+    security = securities().get_security(1)
+    delta = BookDelta(
+        security_id=1,
+        sequence=3,
+        updates=[LevelUpdate(Side.SELL, 10_050, 0), LevelUpdate(Side.BUY, 9_999, 25)],
+    )
+
+    assert json.loads(encode_book_delta(delta, security)) == {
+        "security_id": 1,
+        "sequence": 3,
+        "updates": [
+            {"side": "sell", "price": 100.5, "quantity": 0},
+            {"side": "buy", "price": 99.99, "quantity": 25},
+        ],
+    }
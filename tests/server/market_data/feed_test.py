@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import pytest
+
+from src.server.market_data.feed import BookDelta, MarketDataFeed
+from src.server.market_data.routes import book_events
+from src.server.orders.matcher import LevelUpdate, RootMatcher
+from src.server.orders.model import Order, OrderType, Side
+from src.server.orders.sequencer import AddOrder, Sequencer
+from src.server.securities.model import SecuritiesRepository
+
+
+@pytest.fixture
+async def sequencer():
+    sequencer = Sequencer(
+        RootMatcher(SecuritiesRepository()), feed=MarketDataFeed(max_pending=2)
+    )
+    yield sequencer
+    await sequencer.stop()
+
+
+def order(order_id: str, side: Side, quantity: int, price: int) -> Order:
+    return Order(
+        id=order_id,
+        client_id=int(order_id),
+        security_id=1,
+        side=side,
+        quantity=quantity,
+        type=OrderType.limit,
+        price=price,
+    )
+
+
+def parse(event: bytes):
+    name, data = event.decode().strip().split("\n")
+    return name.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+async def test_deltas_are_published(sequencer: Sequencer):
+    queue = sequencer.feed.subscribe(1)
+
+    await sequencer.submit(AddOrder(order("1", Side.SELL, 50, 1000)))
+    await sequencer.submit(AddOrder(order("2", Side.BUY, 80, 1000)))
+
+    assert queue.get_nowait() == BookDelta(
+        security_id=1, sequence=1, updates=[LevelUpdate(Side.SELL, 1000, 50)]
+    )
+    assert queue.get_nowait() == BookDelta(
+        security_id=1,
+        sequence=2,
+        updates=[LevelUpdate(Side.SELL, 1000, 0), LevelUpdate(Side.BUY, 1000, 30)],
+    )
+
+
+async def test_slow_subscribers_resynchronise(sequencer: Sequencer):
+    queue = sequencer.feed.subscribe(1)
+
+    for i in range(3):
+        await sequencer.submit(AddOrder(order(str(i), Side.SELL, 10, 1000 + i)))
+
+    assert queue.get_nowait() is None
+    assert queue.empty()
+
+
+async def test_book_events(sequencer: Sequencer):
+    security = SecuritiesRepository().get_security(1)
+    await sequencer.submit(AddOrder(order("1", Side.SELL, 50, 1010)))
+
+    events = book_events(security, sequencer, sequencer.feed, interval=0.05)
+
+    assert parse(await anext(events)) == (
+        "snapshot",
+        {"security_id": 1, "sequence": 1, "asks": [[10.1, 50]], "bids": []},
+    )
+
+    await sequencer.submit(AddOrder(order("2", Side.BUY, 20, 1000)))
+    assert parse(await anext(events)) == (
+        "delta",
+        {
+            "security_id": 1,
+            "sequence": 2,
+            "updates": [{"side": "buy", "price": 10.0, "quantity": 20}],
+        },
+    )
+
+    # A snapshot is sent again once the interval has elapsed
+    assert parse(await asyncio.wait_for(anext(events), 1)) == (
+        "snapshot",
+        {"security_id": 1, "sequence": 2, "asks": [[10.1, 50]], "bids": [[10.0, 20]]},
+    )
+
+    await events.aclose()
+    assert not sequencer.feed.subscribers[1]
@@ -0,0 +1,94 @@
+import pytest
+import pytest_asyncio
+from blacksheep.contents import JSONContent
+from blacksheep.testing import TestClient
+
+from src.server.main import app
+
+# The app is started once for all tests, and its sequencer consumers are bound to the event loop it was started in
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def client() -> TestClient:
+    await app.start()
+    return TestClient(app)
+
+
+async def test_get_book(client: TestClient):
+    # DEW (security 0) is not used by other tests, so its order book starts empty
+    for side, price in (("sell", 10.5), ("sell", 10.25), ("buy", 10.0), ("buy", 9.5)):
+        response = await client.post(
+            "/orders",
+            content=JSONContent(
+                {
+                    "client_id": 1,
+                    "security_id": 0,
+                    "side": side,
+                    "quantity": 100,
+                    "type": "limit",
+                    "price": price,
+                }
+            ),
+        )
+        assert response.status == 200
+
+    response = await client.get("/securities/0/book", query={"depth": 1})
+
+    assert response.status == 200
+    book = await response.json()
+    assert book["sequence"] >= 4
+    assert book["asks"] == [[10.25, 100]]
+    assert book["bids"] == [[10.0, 100]]
+
+
+async def test_stream_book(client: TestClient):
+    response = await client.get("/securities/1/book/stream")
+
+    assert response.status == 200
+    assert response.content_type() == b"text/event-stream"
+    chunk = await anext(response.content.get_parts())
+    assert chunk.startswith(b'event: snapshot\ndata: {"security_id":1,')
+
+
+async def test_get_book_invalid_depth(client: TestClient):
+    response = await client.get("/securities/0/book", query={"depth": 0})
+
+    assert response.status == 400
+
+
+async def test_get_unknown_book(client: TestClient):
+    response = await client.get("/securities/42/book")
+
+    assert response.status == 404
+
+
+async def test_get_trades_and_candles(client: TestClient):
+    response = await client.post(
+        "/orders",
+        content=JSONContent(
+            {
+                "client_id": 2,
+                "security_id": 0,
+                "side": "buy",
+                "quantity": 40,
+                "type": "limit",
+                "price": 10.25,
+            }
+        ),
+    )
+    assert response.status == 200
+
+    response = await client.get("/securities/0/trades")
+    assert response.status == 200
+    (trade,) = (await response.json())["trades"]
+    assert (trade["price"], trade["quantity"]) == (10.25, 40)
+
+    response = await client.get("/securities/0/candles", query={"interval": "1h"})
+    assert response.status == 200
+    (candle,) = (await response.json())["candles"]
+    assert candle["start"] <= trade["time"] < candle["start"] + 3_600_000
+    assert (candle["open"], candle["close"], candle["volume"]) == (10.25, 10.25, 40)
+
+    response = await client.get("/securities/0/candles", query={"interval": "2m"})
+    assert response.status == 400
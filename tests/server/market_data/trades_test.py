@@ -0,0 +1,64 @@
+from src.server.market_data.trades import SECOND, Bar, Trade, TradeStore
+from src.server.orders.matcher import Execution, RootMatcher
+from src.server.orders.model import Order, OrderType, Side
+from src.server.orders.sequencer import AddOrders, Sequencer
+from src.server.securities.model import SecuritiesRepository
+
+MINUTE = 60 * SECOND
+
+
+def executions(*trades):
+    return [
+        Execution(maker_id=1, taker_id=2, price=price, quantity=quantity)
+        for price, quantity in trades
+    ]
+
+
+def test_bars():
+    store = TradeStore()
+    store.record(1, 10 * MINUTE + 5 * SECOND, executions((100, 5), (103, 1)))
+    store.record(1, 10 * MINUTE + 50 * SECOND, executions((98, 2)))
+    store.record(1, 11 * MINUTE, executions((101, 3)))
+    # A trade stamped before the last bar, by a clock set back, is counted in the last bar
+    store.record(1, 10 * MINUTE, executions((99, 1)))
+    store.record(1, 12 * MINUTE, [])
+
+    assert store.bars(1, "1m") == [
+        Bar(start=10 * MINUTE, open=100, high=103, low=98, close=98, volume=8),
+        Bar(start=11 * MINUTE, open=101, high=101, low=99, close=99, volume=4),
+    ]
+    assert store.bars(1, "5m") == [
+        Bar(start=10 * MINUTE, open=100, high=103, low=98, close=99, volume=12)
+    ]
+    assert len(store.bars(1, "1s")) == 3
+
+    assert store.bars(1, "1m", start=11 * MINUTE) == store.bars(1, "1m")[1:]
+    assert store.bars(1, "1m", end=10 * MINUTE) == store.bars(1, "1m")[:1]
+    assert store.bars(1, "1m", limit=1) == store.bars(1, "1m")[1:]
+    assert store.bars(2, "1m") == []
+
+
+def test_trades():
+    store = TradeStore()
+    store.record(1, 1, executions((100, 5), (101, 1), (102, 2)))
+
+    assert store.trades(1, limit=2) == [Trade(1, 101, 1, 1), Trade(2, 102, 2, 1)]
+    assert store.trades(1, after=0, limit=1) == [Trade(1, 101, 1, 1)]
+    assert store.trades(1, after=2) == []
+    assert store.trades(2) == []
+
+
+async def test_sequencer_records_trades():
+    store = TradeStore()
+    sequencer = Sequencer(RootMatcher(SecuritiesRepository()), trades=store)
+    orders = [
+        Order(str(i), i, 1, side, 10, OrderType.limit, 100)
+        for i, side in enumerate((Side.SELL, Side.SELL, Side.BUY))
+    ]
+
+    await sequencer.submit(AddOrders(security_id=1, orders=orders))
+    await sequencer.stop()
+
+    (trade,) = store.trades(1)
+    assert (trade.price, trade.quantity) == (100, 10)
+    assert store.bars(1, "1d")[0].volume == 10
@@ -0,0 +1,68 @@
+from src.server.metrics.model import FILLS, MATCH, Histogram, Metrics
+from src.server.orders.matcher import RootMatcher
+from src.server.orders.model import Order, OrderType, Side
+from src.server.orders.sequencer import AddOrder, CancelOrder, Sequencer
+from src.server.securities.model import SecuritiesRepository
+
+
+def test_histogram():
+    histogram = Histogram()
+    for value in (0, 3, 15, 16, 17, 1000, 1_000_000, 2**62):
+        histogram.record(value)
+
+    assert histogram.count == 8
+    # Small values are counted exactly, larger ones to within an eighth
+    assert histogram.quantile(0.25) == 3
+    assert histogram.quantile(0.5) == 16 + 1
+    assert 1000 <= histogram.quantile(0.75) < 1000 * 1.125
+    assert 2**62 <= histogram.quantile(1) < 2**62 * 1.125
+    assert histogram.cumulative([0, 16, 1100, 2**63]) == [1, 3, 6, 8]
+    assert Histogram().quantile(0.5) == 0
+
+
+def order(id: str, side: Side, quantity: int, price: int) -> Order:
+    return Order(
+        id=id,
+        client_id=1,
+        security_id=1,
+        side=side,
+        quantity=quantity,
+        type=OrderType.limit,
+        price=price,
+    )
+
+
+async def test_sequencer_records_matches():
+    metrics = Metrics()
+    root_matcher = RootMatcher(SecuritiesRepository())
+    sequencer = Sequencer(root_matcher, metrics=metrics)
+
+    await sequencer.submit(AddOrder(order("1", Side.SELL, 10, 100)))
+    await sequencer.submit(AddOrder(order("2", Side.SELL, 10, 101)))
+    await sequencer.submit(AddOrder(order("3", Side.BUY, 15, 101)))
+    await sequencer.submit(CancelOrder(security_id=1, order_id="2"))
+    await sequencer.stop()
+
+    # Cancels are not matches
+    assert metrics.histogram(MATCH, 1).count == 3
+    assert metrics.histogram(FILLS, 1).cumulative([0, 1, 2]) == [2, 2, 3]
+    assert metrics.security(1).orders_matched == 3
+    assert metrics.security(1).levels_touched == 4
+
+    text = metrics.render({1: root_matcher.get_matcher(1).size()})
+    assert 'orderbook_fills_per_order_bucket{security_id="1",le="2"} 3' in text
+    assert 'orderbook_match_duration_seconds_count{security_id="1"} 3' in text
+    assert 'orderbook_price_levels{security_id="1",side="ask"} 0' in text
+    assert 'orderbook_resting_orders{security_id="1"} 0' in text
+
+
+async def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    sequencer = Sequencer(RootMatcher(SecuritiesRepository()), metrics=metrics)
+
+    await sequencer.submit(AddOrder(order("1", Side.SELL, 10, 100)))
+    await sequencer.stop()
+
+    assert sequencer.metrics is None
+    assert metrics.timed(MATCH, 1, sum, [1, 2]) == 3
+    assert metrics.securities == {}
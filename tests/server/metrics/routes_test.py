@@ -0,0 +1,52 @@
+import pytest
+import pytest_asyncio
+from blacksheep.contents import JSONContent
+from blacksheep.testing import TestClient
+
+from src.server.main import app
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def client() -> TestClient:
+    await app.start()
+    return TestClient(app)
+
+
+async def test_get_metrics(client: TestClient):
+    # A bid far below the market of MSFT (security 2), whose orders are only listed by client elsewhere
+    response = await client.post(
+        "/orders",
+        content=JSONContent(
+            {
+                "client_id": 9,
+                "security_id": 2,
+                "side": "buy",
+                "quantity": 1,
+                "type": "limit",
+                "price": 1.0,
+            }
+        ),
+    )
+    assert response.status == 200
+
+    response = await client.get("/metrics")
+
+    assert response.status == 200
+    assert response.content_type().startswith(b"text/plain")
+    text = (await response.text()).splitlines()
+    for family in (
+        "orderbook_match_duration_seconds",
+        "order_repository_write_duration_seconds",
+        "order_serialization_duration_seconds",
+        "orderbook_fills_per_order",
+    ):
+        assert f"# TYPE {family} histogram" in text
+        assert any(
+            line.startswith(f'{family}_count{{security_id="2"}} ') for line in text
+        )
+    assert any(
+        line.startswith('orderbook_price_levels{security_id="2",side="bid"}')
+        for line in text
+    )
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from src.server.orders import depth as depth_module
+from src.server.orders.matcher import Matcher, OrderBook
+from src.server.orders.model import Order, OrderType, Side
+from src.server.securities.model import BookEngine
+
+
+def order(order_id: int, side: Side, quantity: int, price: int) -> Order:
+    return Order(
+        id=str(order_id),
+        client_id=order_id,
+        security_id=1,
+        side=side,
+        quantity=quantity,
+        type=OrderType.limit,
+        price=price,
+    )
+
+
+def expected_depth(matcher: Matcher, depth: int):
+    asks = [(price, matcher.asks[price].quantity) for price in matcher.asks][:depth]
+    bids = [(price, matcher.bids[price].quantity) for price in reversed(matcher.bids)]
+    return asks, bids[:depth]
+
+
+@pytest.mark.parametrize("engine", list(BookEngine), ids=lambda engine: engine.value)
+def test_depth_follows_the_book(engine: BookEngine):
+    random.seed(7)
+    matcher = Matcher(OrderBook.create(security_id=1, engine=engine))
+
+    for i in range(2000):
+        action = random.random()
+        if action < 0.6 or not matcher.orders:
+            side = random.choice((Side.BUY, Side.SELL))
+            price = 1000 + random.randint(-20, 20) + (-5 if side == Side.BUY else 5)
+            matcher.add(order(i, side, random.randint(1, 50), price))
+        elif action < 0.8:
+            matcher.cancel(random.choice(list(matcher.orders)))
+        else:
+            matcher.amend(random.choice(list(matcher.orders)), random.randint(0, 60))
+
+        # Reads are interleaved irregularly, so that several commands are pending at times
+        if random.random() < 0.3:
+            depth = random.choice((1, 5, 10))
+            assert matcher.depth(depth) == expected_depth(matcher, depth)
+
+
+def test_quantity_changes_are_patched(monkeypatch):
+    matcher = Matcher(OrderBook.create(security_id=1))
+    for i, price in enumerate((1010, 1020, 1030)):
+        matcher.add(order(i, Side.SELL, 100, price))
+
+    assert matcher.depth(2) == ([(1010, 100), (1020, 100)], [])
+
+    builds = []
+    build = depth_module.DepthCache._build
+    monkeypatch.setattr(
+        depth_module.DepthCache,
+        "_build",
+        lambda cache, side, depth: builds.append(side) or build(cache, side, depth),
+    )
+
+    # A fill at a cached level and an order beyond the cached levels leave the asks cached
+    matcher.add(order(3, Side.BUY, 30, 1010))
+    matcher.add(order(4, Side.SELL, 10, 1040))
+    assert matcher.depth(2) == ([(1010, 70), (1020, 100)], [])
+    assert builds == []
+
+    # Removing a cached level rebuilds the asks
+    matcher.cancel("0")
+    assert matcher.depth(2) == ([(1020, 100), (1030, 100)], [])
+    assert builds == [Side.SELL]
@@ -0,0 +1,53 @@
+from typing import Optional
+
+from src.server.orders.manager import CreateOrderInput
+from src.server.orders.model import Order, OrderType, Side
+
+
+def order(
+    order_id: str,
+    security_id: int,
+    side: Side,
+    quantity: int,
+    price: Optional[int] = 1000,
+    *,
+    client_id: Optional[int] = None,
+    type: OrderType = OrderType.limit,
+    stop_price: Optional[int] = None,
+) -> Order:
+    """
+    An order as the sequencer gets it, a limit order by default. Unless given, the client ID is the order ID, which
+    must then be a number.
+    """
+
+    return Order(
+        id=order_id,
+        client_id=int(order_id) if client_id is None else client_id,
+        security_id=security_id,
+        side=side,
+        quantity=quantity,
+        type=type,
+        price=price,
+        stop_price=stop_price,
+    )
+
+
+def order_input(
+    side: Side,
+    quantity: int,
+    price: Optional[int] = None,
+    client_id: int = 1,
+    security_id: int = 1,
+) -> CreateOrderInput:
+    """
+    An order as the order manager gets it: a limit order if it has a price, otherwise a market order.
+    """
+
+    return CreateOrderInput(
+        client_id=client_id,
+        security_id=security_id,
+        side=side,
+        quantity=quantity,
+        type=OrderType.limit if price is not None else OrderType.market,
+        price=price,
+    )
@@ -0,0 +1,191 @@
+import asyncio
+import os
+
+import pytest
+
+from src.server.orders import journal as journal_module
+from src.server.orders.journal import EXECUTION, Journal, JournalReader, replay
+from src.server.orders.matcher import Execution, RootMatcher
+from src.server.orders.model import (
+    OrderRepository,
+    OrderStatus,
+    Side,
+    TimeInForce,
+)
+from src.server.orders.risk import OrderRejected
+from src.server.orders.sequencer import AddOrder, AddOrders, CancelOrder, Sequencer
+from src.server.securities.model import SecuritiesRepository
+from tests.server.orders.factories import order
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    return str(tmp_path / "journal")
+
+
+async def journaled(path: str, commands) -> Sequencer:
+    journal = Journal(path)
+    journal.open()
+    sequencer = Sequencer(
+        RootMatcher(SecuritiesRepository()),
+        journal,
+        order_repository=OrderRepository(),
+    )
+
+    for command in commands:
+        await sequencer.submit(command)
+
+    await sequencer.stop()
+    await journal.close()
+    return sequencer
+
+
+async def test_replay(path: str):
+    ioc = order("6", 2, Side.BUY, 30)
+    ioc.time_in_force = TimeInForce.ioc
+    sequencer = await journaled(
+        path,
+        [
+            AddOrder(order("1", 1, Side.SELL, 50)),
+            AddOrders(
+                security_id=1,
+                orders=[order("2", 1, Side.SELL, 50), order("3", 1, Side.BUY, 70)],
+            ),
+            AddOrder(order("4", 2, Side.BUY, 20)),
+            CancelOrder(security_id=2, order_id="4"),
+            AddOrder(order("5", 2, Side.SELL, 10)),
+            AddOrder(ioc),
+        ],
+    )
+
+    root_matcher = RootMatcher(SecuritiesRepository())
+    order_repository = OrderRepository()
+
+    assert replay(path, root_matcher, order_repository) == sequencer.last_sequence == 7
+    for security_id in (1, 2):
+        assert (
+            root_matcher.get_matcher(security_id).order_book
+            == sequencer.root_matcher.get_matcher(security_id).order_book
+        )
+    assert list(order_repository.orders) == ["1", "2", "3", "4", "5", "6"]
+    assert order_repository.list_orders() == sequencer.order_repository.list_orders()
+    # The remainder of the immediate-or-cancel order was cancelled, not rested
+    replayed = order_repository.get_order("6")
+    assert (replayed.time_in_force, replayed.status, replayed.filled_quantity) == (
+        TimeInForce.ioc,
+        OrderStatus.cancelled,
+        10,
+    )
+
+
+async def test_executions_are_journaled(path: str):
+    await journaled(
+        path,
+        [
+            AddOrder(order("1", 1, Side.SELL, 50)),
+            AddOrder(order("2", 1, Side.BUY, 30)),
+        ],
+    )
+
+    with open(path, "rb") as file:
+        records = list(JournalReader(file.read()))
+
+    assert [
+        (sequence, value) for kind, sequence, value in records if kind == EXECUTION
+    ] == [(2, (1, Execution(maker_id=1, taker_id=2, price=1000, quantity=30)))]
+
+
+async def test_orders_that_cannot_be_journaled_are_rejected(path: str):
+    journal = Journal(path)
+    journal.open()
+    sequencer = Sequencer(
+        RootMatcher(SecuritiesRepository()),
+        journal,
+        order_repository=OrderRepository(),
+    )
+
+    invalid = order("1", 1, Side.SELL, 50)
+    invalid.price = 10**20
+    with pytest.raises(OrderRejected):
+        await sequencer.submit(AddOrder(invalid))
+
+    # The order is neither in the book nor in the order store, and later orders are journaled as usual
+    assert not sequencer.root_matcher.get_matcher(1).asks
+    assert sequencer.order_repository.list_orders() == []
+    await sequencer.submit(AddOrder(order("2", 1, Side.SELL, 50)))
+
+    await sequencer.stop()
+    await journal.close()
+
+    root_matcher = RootMatcher(SecuritiesRepository())
+    replay(path, root_matcher)
+    assert list(root_matcher.get_matcher(1).orders) == ["2"]
+
+
+async def test_group_commit(path: str, monkeypatch):
+    syncs = []
+    monkeypatch.setattr(journal_module.os, "fsync", syncs.append)
+
+    journal = Journal(path)
+    journal.open()
+    sequencer = Sequencer(RootMatcher(SecuritiesRepository()), journal)
+
+    await asyncio.gather(
+        *(
+            sequencer.submit(AddOrder(order(str(i), i % 4, Side.BUY, 10)))
+            for i in range(100)
+        )
+    )
+
+    # Commands applied while a group is being written are committed together
+    assert 0 < len(syncs) < 100
+    assert journal.synced == journal.written == 100
+
+    await sequencer.stop()
+    await journal.close()
+
+
+async def test_failed_writes_are_truncated(path: str, monkeypatch):
+    journal = Journal(path)
+    journal.open()
+    sequencer = Sequencer(RootMatcher(SecuritiesRepository()), journal)
+    await sequencer.submit(AddOrder(order("1", 1, Side.SELL, 50)))
+    size = os.path.getsize(path)
+
+    # The disk fills up part of the way through the next group
+    def write(data: bytes):
+        journal.file.write(data[:-3])
+        journal.file.flush()
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(journal, "_write", write)
+    with pytest.raises(OSError):
+        await sequencer.submit(AddOrder(order("2", 1, Side.SELL, 50)))
+
+    # The part written is dropped, and no further command is accepted
+    assert os.path.getsize(path) == size
+    with pytest.raises(RuntimeError):
+        await sequencer.submit(AddOrder(order("3", 1, Side.SELL, 50)))
+    assert list(sequencer.root_matcher.get_matcher(1).orders) == ["1", "2"]
+
+    await sequencer.stop()
+    await journal.close()
+
+    root_matcher = RootMatcher(SecuritiesRepository())
+    assert replay(path, root_matcher) == 1
+    assert list(root_matcher.get_matcher(1).orders) == ["1"]
+
+
+async def test_incomplete_record_is_truncated(path: str):
+    await journaled(path, [AddOrder(order("1", 1, Side.SELL, 50))])
+    size = os.path.getsize(path)
+
+    # A crash in the middle of a write leaves part of a record behind
+    with open(path, "ab") as file:
+        file.write(journal_module.encode_order(2, order("2", 1, Side.SELL, 50))[:-3])
+
+    root_matcher = RootMatcher(SecuritiesRepository())
+
+    assert replay(path, root_matcher) == 1
+    assert list(root_matcher.get_matcher(1).orders) == ["1"]
+    assert os.path.getsize(path) == size
@@ -0,0 +1,124 @@
+from sortedcontainers import SortedDict
+
+from src.server.orders.ladder import MAX_LADDER_WIDTH, PriceLadder
+from src.server.orders.matcher import Execution, Matcher, OrderBook
+from src.server.orders.model import Order, OrderType, Side
+from src.server.securities.model import BookEngine, Security
+
+
+def test_best_prices():
+    ladder = PriceLadder(width=16)
+
+    for price in (1005, 1001, 1009, 1003):
+        ladder[price] = str(price)
+
+    assert ladder.peekitem(0) == (1001, "1001")
+    assert ladder.peekitem(-1) == (1009, "1009")
+
+    # Removing the best prices moves the pointers to the next occupied slots
+    del ladder[1001]
+    del ladder[1009]
+
+    assert ladder.peekitem(0) == (1003, "1003")
+    assert ladder.peekitem(-1) == (1005, "1005")
+    assert list(ladder) == [1003, 1005]
+    assert len(ladder) == 2
+
+
+def test_irange():
+    ladder = PriceLadder({price: str(price) for price in (1001, 1003, 1005, 1007)})
+
+    assert list(ladder.irange(maximum=1005)) == [1001, 1003, 1005]
+    assert list(ladder.irange(minimum=1004, reverse=True)) == [1007, 1005]
+    assert list(ladder.irange(minimum=2000)) == []
+    assert list(reversed(ladder)) == [1007, 1005, 1003, 1001]
+
+
+def test_recenter():
+    ladder = PriceLadder(width=16)
+
+    ladder[1000] = "a"
+    # Drift up, beyond the end of the array
+    ladder[1012] = "b"
+
+    assert len(ladder.slots) == 32
+    assert list(ladder.items()) == [(1000, "a"), (1012, "b")]
+
+    del ladder[1000]
+    ladder[1040] = "c"
+
+    assert ladder.get(1000) is None
+    assert list(ladder.items()) == [(1012, "b"), (1040, "c")]
+    assert ladder.base <= 1012 and 1040 < ladder.base + len(ladder.slots)
+
+
+def test_outliers():
+    ladder = PriceLadder(width=16)
+    ladder[1000] = "a"
+    ladder[1002] = "b"
+
+    # Prices too far from the rest to fit in the largest array are kept out of it
+    far = 1000 + 50_000_000
+    ladder[far] = "far"
+    ladder[-far] = "low"
+
+    assert len(ladder.slots) == 16
+    assert len(ladder) == 4
+    assert list(ladder) == [-far, 1000, 1002, far]
+    assert list(reversed(ladder)) == [far, 1002, 1000, -far]
+    assert list(ladder.irange(minimum=1001)) == [1002, far]
+    assert list(ladder.irange(maximum=1001, reverse=True)) == [1000, -far]
+    assert ladder.peekitem(0) == (-far, "low")
+    assert ladder.peekitem(-1) == (far, "far")
+    assert ladder[far] == "far" and ladder.get(far + 1) is None
+
+    # Once the rest of the book is gone, the array moves to the outliers, and takes them back in
+    del ladder[-far]
+    del ladder[1000]
+    del ladder[1002]
+    assert ladder.peekitem(0) == (far, "far")
+    ladder[far + 1] = "next"
+
+    assert not ladder.overflow
+    assert list(ladder.items()) == [(far, "far"), (far + 1, "next")]
+
+
+def test_width_is_capped():
+    ladder = PriceLadder(width=16)
+    for price in range(0, 4 * MAX_LADDER_WIDTH, MAX_LADDER_WIDTH // 4):
+        ladder[price] = str(price)
+
+    assert len(ladder.slots) == MAX_LADDER_WIDTH
+    assert list(ladder) == list(range(0, 4 * MAX_LADDER_WIDTH, MAX_LADDER_WIDTH // 4))
+
+
+def test_matching_outliers():
+    matcher = Matcher.for_security(Security(1, "AAPL", book_engine=BookEngine.ladder))
+    far = 1000 + 50_000_000
+    for order_id, price in (("1", far), ("2", 1000)):
+        matcher.add(Order(order_id, 1, 1, Side.SELL, 10, OrderType.limit, price))
+
+    result = matcher.add(Order("3", 2, 1, Side.BUY, 20, OrderType.market))
+
+    assert result.executions == [
+        Execution(maker_id=1, taker_id=2, price=1000, quantity=10),
+        Execution(maker_id=1, taker_id=2, price=far, quantity=10),
+    ]
+    assert not matcher.asks
+
+
+def test_equals_sorted_dict():
+    levels = {1003: "a", 1001: "b"}
+
+    assert PriceLadder(levels) == SortedDict(levels)
+    assert SortedDict(levels) == PriceLadder(levels)
+    assert PriceLadder(levels) != SortedDict({1001: "b"})
+
+
+def test_engine_per_security():
+    ladder = Matcher.for_security(Security(1, "AAPL", book_engine=BookEngine.ladder))
+    sorted_ = Matcher.for_security(Security(2, "MSFT"))
+
+    assert isinstance(ladder.asks, PriceLadder)
+    assert isinstance(sorted_.asks, SortedDict)
+    assert ladder.order_book == OrderBook.create(1)
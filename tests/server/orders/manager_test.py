@@ -0,0 +1,271 @@
+from src.server.orders.manager import CreateOrderInput, OrderManager
+from src.server.orders.matcher import Execution, RootMatcher
+from src.server.orders.model import (
+    OrderRepository,
+    OrderStatus,
+    OrderType,
+    Side,
+    TimeInForce,
+)
+from src.server.orders.risk import RiskChecker, RiskLimits
+from src.server.orders.sequencer import Sequencer
+from src.server.securities.model import SecuritiesRepository, SelfTradePrevention
+
+
+def order_manager(
+    self_trade_prevention: SelfTradePrevention = SelfTradePrevention.none,
+) -> OrderManager:
+    securities = SecuritiesRepository()
+    for security in securities.list_securities():
+        security.self_trade_prevention = self_trade_prevention
+    order_repository = OrderRepository()
+    return OrderManager(
+        order_repository,
+        Sequencer(RootMatcher(securities), order_repository=order_repository),
+        RiskChecker(order_repository, securities, RiskLimits()),
+    )
+
+
+async def test_create_order():
+    manager = order_manager()
+
+    sell = await manager.create_order(
+        CreateOrderInput(
+            client_id=1,
+            security_id=1,
+            side=Side.SELL,
+            quantity=100,
+            type=OrderType.limit,
+            price=1050,
+        )
+    )
+
+    assert sell.executions == []
+    assert sell.resting_quantity == 100
+
+    buy = await manager.create_order(
+        CreateOrderInput(
+            client_id=2,
+            security_id=1,
+            side=Side.BUY,
+            quantity=60,
+            type=OrderType.limit,
+            price=1050,
+        )
+    )
+
+    assert buy.executions == [
+        Execution(maker_id=1, taker_id=2, price=1050, quantity=60),
+    ]
+    assert buy.resting_quantity == 0
+    assert buy.sequence > sell.sequence
+    assert manager.get_order(buy.order.id) == buy.order
+    assert manager.list_orders() == [sell.order, buy.order]
+
+
+async def test_order_lifecycle():
+    manager = order_manager()
+
+    def order(side: Side, quantity: int, price: int) -> CreateOrderInput:
+        return CreateOrderInput(
+            client_id=1,
+            security_id=1,
+            side=side,
+            quantity=quantity,
+            type=OrderType.limit,
+            price=price,
+        )
+
+    sell = (await manager.create_order(order(Side.SELL, 100, 1050))).order
+    await manager.create_order(order(Side.SELL, 100, 1060))
+    buy = (await manager.create_order(order(Side.BUY, 150, 1060))).order
+
+    assert buy.status == OrderStatus.filled
+    assert buy.remaining_quantity == 0
+    # Limit orders trade at the taker's price
+    assert buy.average_price == 1060
+    assert sell.status == OrderStatus.filled
+
+    maker = manager.get_order(manager.list_orders()[1].id)
+    assert maker.status == OrderStatus.partially_filled
+    assert (maker.filled_quantity, maker.remaining_quantity) == (50, 50)
+
+    assert await manager.cancel_order(maker.id) is maker
+    assert maker.status == OrderStatus.cancelled
+    assert maker.remaining_quantity == 0
+    assert manager.sequencer.root_matcher.get_matcher(1).asks == {}
+
+    # A filled order stays filled
+    assert (await manager.cancel_order(sell.id)).status == OrderStatus.filled
+    assert await manager.cancel_order("unknown") is None
+
+
+async def test_self_trade_prevention():
+    manager = order_manager(SelfTradePrevention.decrement_both)
+
+    def order(client_id: int, side: Side, quantity: int) -> CreateOrderInput:
+        return CreateOrderInput(
+            client_id=client_id,
+            security_id=1,
+            side=side,
+            quantity=quantity,
+            type=OrderType.limit,
+            price=1050,
+        )
+
+    own = (await manager.create_order(order(1, Side.SELL, 30))).order
+    other = (await manager.create_order(order(2, Side.SELL, 40))).order
+    large = (await manager.create_order(order(1, Side.SELL, 100))).order
+    buy = await manager.create_order(order(1, Side.BUY, 100))
+
+    # The buy is decremented against the client's own sells instead of trading with them
+    assert buy.executions == [
+        Execution(maker_id=2, taker_id=1, price=1050, quantity=40)
+    ]
+    assert buy.order.status == OrderStatus.cancelled
+    assert buy.order.filled_quantity == 40
+    assert own.status == OrderStatus.cancelled
+    assert other.status == OrderStatus.filled
+    assert (
+        large.status,
+        large.quantity,
+        large.cancelled_quantity,
+        large.remaining_quantity,
+    ) == (OrderStatus.open, 100, 30, 70)
+    assert manager.order_repository.open_notional[(1, 1)] == 70 * 1050
+
+
+async def test_time_in_force():
+    manager = order_manager()
+
+    def order(
+        client_id: int,
+        side: Side,
+        quantity: int,
+        time_in_force: TimeInForce = TimeInForce.gtc,
+    ) -> CreateOrderInput:
+        return CreateOrderInput(
+            client_id=client_id,
+            security_id=1,
+            side=side,
+            quantity=quantity,
+            type=OrderType.limit,
+            price=1050,
+            time_in_force=time_in_force,
+        )
+
+    await manager.create_order(order(2, Side.SELL, 40))
+    ioc = await manager.create_order(order(1, Side.BUY, 100, TimeInForce.ioc))
+
+    # The unfilled remainder is cancelled rather than left resting
+    assert ioc.resting_quantity == 0
+    assert (ioc.order.status, ioc.order.filled_quantity) == (OrderStatus.cancelled, 40)
+    assert manager.order_repository.open_notional[(1, 1)] == 0
+
+    await manager.create_order(order(2, Side.SELL, 40))
+    fok, post_only = await manager.create_orders(
+        [
+            order(1, Side.BUY, 100, TimeInForce.fok),
+            order(1, Side.BUY, 100, TimeInForce.post_only),
+        ]
+    )
+
+    assert fok.executions == post_only.executions == []
+    assert fok.order.status == post_only.order.status == OrderStatus.cancelled
+    assert manager.order_repository.open_notional[(1, 1)] == 0
+
+
+async def test_stop_orders():
+    manager = order_manager()
+
+    def order(client_id: int, side: Side, quantity: int, **fields) -> CreateOrderInput:
+        return CreateOrderInput(
+            client_id=client_id,
+            security_id=1,
+            side=side,
+            quantity=quantity,
+            **{"type": OrderType.limit, "price": 1050, **fields},
+        )
+
+    stop = await manager.create_order(
+        order(1, Side.BUY, 100, type=OrderType.stop, price=None, stop_price=1050)
+    )
+
+    # The stop waits for its trigger rather than being cancelled
+    assert stop.executions == []
+    assert stop.order.status == OrderStatus.open
+
+    await manager.create_order(order(2, Side.SELL, 60))
+    await manager.create_order(order(3, Side.BUY, 20))
+
+    # Triggered by the trade at 1050, it takes what is left of the sell, and its remainder is cancelled
+    assert (stop.order.status, stop.order.filled_quantity) == (
+        OrderStatus.cancelled,
+        40,
+    )
+    assert manager.risk.last_prices[1] == 1050
+
+
+async def test_orders_are_matched_per_security():
+    manager = order_manager()
+
+    await manager.create_order(
+        CreateOrderInput(
+            client_id=1,
+            security_id=1,
+            side=Side.SELL,
+            quantity=100,
+            type=OrderType.limit,
+            price=1050,
+        )
+    )
+    result = await manager.create_order(
+        CreateOrderInput(
+            client_id=2,
+            security_id=2,
+            side=Side.BUY,
+            quantity=100,
+            type=OrderType.limit,
+            price=1050,
+        )
+    )
+
+    assert result.executions == []
+    assert result.resting_quantity == 100
+    assert list(manager.sequencer.root_matcher.get_matcher(1).asks) == [1050]
+    assert list(manager.sequencer.root_matcher.get_matcher(2).bids) == [1050]
+
+
+async def test_create_orders():
+    manager = order_manager()
+
+    results = await manager.create_orders(
+        [
+            CreateOrderInput(
+                client_id=client_id,
+                security_id=security_id,
+                side=side,
+                quantity=quantity,
+                type=OrderType.limit,
+                price=1050,
+            )
+            for client_id, security_id, side, quantity in [
+                (1, 1, Side.SELL, 100),
+                (2, 2, Side.SELL, 100),
+                (3, 1, Side.BUY, 60),
+            ]
+        ]
+    )
+
+    assert [result.order.client_id for result in results] == [1, 2, 3]
+    assert [result.resting_quantity for result in results] == [100, 100, 0]
+    assert results[2].executions == [
+        Execution(maker_id=1, taker_id=3, price=1050, quantity=60),
+    ]
+    # Each order has its own sequence number, in order within its security
+    assert len({result.sequence for result in results}) == 3
+    assert results[0].sequence < results[2].sequence
+    # Orders are stored in sequence order, as the sequencer records them
+    assert manager.list_orders() == [
+        result.order for result in sorted(results, key=lambda result: result.sequence)
+    ]
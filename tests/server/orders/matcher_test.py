@@ -1,20 +1,42 @@
 import re
 
-from sortedcontainers import SortedDict
+import pytest
 
-from src.server.orders.matcher import Matcher, OrderBookOrder, OrderBook, Execution
-from src.server.orders.model import Order, Side, OrderType
+from src.server.orders.matcher import (
+    Matcher,
+    OrderBookOrder,
+    OrderBook,
+    Execution,
+    LevelUpdate,
+    PriceLevel,
+    SelfTradeCancel,
+)
+from src.server.orders.model import Order, Side, OrderType, TimeInForce
+from src.server.securities.model import BookEngine, SelfTradePrevention
+
+# Engine backing the order books built by `orderbook()`
+BOOK_ENGINE = BookEngine.sorted
+
+
+@pytest.fixture(autouse=True, params=list(BookEngine), ids=lambda engine: engine.value)
+def book_engine(request, monkeypatch):
+    """
+    Run every scenario against each order book engine.
+    """
+
+    monkeypatch.setitem(globals(), "BOOK_ENGINE", request.param)
+    return request.param
 
 
 def test_limit_buy():
     matcher = Matcher(
         orderbook("""
-          ASK 11.5 : 1[200]
-          ASK 11.0 : 2[100]
-          ASK 10.5 : 3[50]
-          BID 10.0 : 3[50] 
-          BID 9.80 : 2[100]
-          BID 9.70 : 1[200]
+          ASK 1150 : 1[200]
+          ASK 1100 : 2[100]
+          ASK 1050 : 3[50]
+          BID 1000 : 3[50] 
+          BID  980 : 2[100]
+          BID  970 : 1[200]
         """)
     )
 
@@ -26,21 +48,21 @@ def test_limit_buy():
             type=OrderType.limit,
             side=Side.BUY,
             quantity=120,
-            price=11.0,
+            price=1100,
         )
     )
 
     assert result.executions == [
-        Execution(maker_id=3, taker_id=4, price=11.0, quantity=50),
-        Execution(maker_id=2, taker_id=4, price=11.0, quantity=70),
+        Execution(maker_id=3, taker_id=4, price=1100, quantity=50),
+        Execution(maker_id=2, taker_id=4, price=1100, quantity=70),
     ]
     assert result.order_book == orderbook("""
-        ASK 11.5 : 1[200]
-        ASK 11.0 :  2[30]
-        ASK 10.5 :
-        BID 10.0 :  3[50] 
-        BID 9.80 : 2[100]
-        BID 9.70 : 1[200]
+        ASK 1150 : 1[200]
+        ASK 1100 :  2[30]
+        ASK 1050 :
+        BID 1000 :  3[50] 
+        BID  980 : 2[100]
+        BID  970 : 1[200]
     """)
 
     result = matcher.add(
@@ -51,32 +73,32 @@ def test_limit_buy():
             type=OrderType.limit,
             side=Side.BUY,
             quantity=120,
-            price=11.0,
+            price=1100,
         )
     )
 
     assert result.executions == [
-        Execution(maker_id=2, taker_id=5, price=11.0, quantity=30),
+        Execution(maker_id=2, taker_id=5, price=1100, quantity=30),
     ]
     assert result.order_book == orderbook("""
-        ASK 11.5 : 1[200]
-        ASK 11.0 : 
-        BID 11.0 :  5[90]
-        ASK 10.5 :
-        BID 10.0 :  3[50]
-        BID 9.80 : 2[100]
-        BID 9.70 : 1[200]
+        ASK 1150 : 1[200]
+        ASK 1100 : 
+        BID 1100 :  5[90]
+        ASK 1050 :
+        BID 1000 :  3[50]
+        BID  980 : 2[100]
+        BID  970 : 1[200]
     """)
 
 
 def test_limit_sell():
     matcher = Matcher(
         orderbook("""
-            ASK 11.5 : 1[200]
-            BID 11.0 :  5[90] 
-            BID 10.0 :  3[50] 
-            BID 9.80 : 2[100]
-            BID 9.70 : 1[200]
+            ASK 1150 : 1[200]
+            BID 1100 :  5[90] 
+            BID 1000 :  3[50] 
+            BID  980 : 2[100]
+            BID  970 : 1[200]
         """)
     )
 
@@ -88,32 +110,32 @@ def test_limit_sell():
             type=OrderType.limit,
             side=Side.SELL,
             quantity=120,
-            price=10.5,  # better than the top of the book
+            price=1050,  # better than the top of the book
         )
     )
 
     assert result.executions == [
-        Execution(maker_id=5, taker_id=4, price=10.5, quantity=90),
+        Execution(maker_id=5, taker_id=4, price=1050, quantity=90),
     ]
     assert result.order_book == orderbook("""
-        ASK 11.5 : 1[200]
-        BID 11.0 : 
-        ASK 10.5 :  4[30]
-        BID 10.0 :  3[50] 
-        BID 9.80 : 2[100]
-        BID 9.70 : 1[200]
+        ASK 1150 : 1[200]
+        BID 1100 : 
+        ASK 1050 :  4[30]
+        BID 1000 :  3[50] 
+        BID  980 : 2[100]
+        BID  970 : 1[200]
     """)
 
 
 def test_large_orders():
     matcher = Matcher(
         orderbook("""
-            ASK 11.5 : 1[200]
-            ASK 11.0 : 2[100]
-            ASK 10.5 : 3[50]
-            BID 10.0 : 3[50] 
-            BID 9.80 : 2[100]
-            BID 9.70 : 1[200]
+            ASK 1150 : 1[200]
+            ASK 1100 : 2[100]
+            ASK 1050 : 3[50]
+            BID 1000 : 3[50] 
+            BID  980 : 2[100]
+            BID  970 : 1[200]
         """)
     )
 
@@ -126,23 +148,23 @@ def test_large_orders():
             side=Side.BUY,
             # a ridiculous buy that exhausts the book
             quantity=1000,
-            price=100,
+            price=10000,
         )
     )
 
     assert result.executions == [
-        Execution(maker_id=3, taker_id=1337, price=100, quantity=50),
-        Execution(maker_id=2, taker_id=1337, price=100, quantity=100),
-        Execution(maker_id=1, taker_id=1337, price=100, quantity=200),
+        Execution(maker_id=3, taker_id=1337, price=10000, quantity=50),
+        Execution(maker_id=2, taker_id=1337, price=10000, quantity=100),
+        Execution(maker_id=1, taker_id=1337, price=10000, quantity=200),
     ]
     assert result.order_book == orderbook("""
-        BID 100  : 1337[650]
-        ASK 11.5 :
-        ASK 11.0 :
-        ASK 10.5 :
-        BID 10.0 : 3[50]  
-        BID 9.80 : 2[100]
-        BID 9.70 : 1[200]
+        BID 10000 : 1337[650]
+        ASK 1150 :
+        ASK 1100 :
+        ASK 1050 :
+        BID 1000 : 3[50]  
+        BID  980 : 2[100]
+        BID  970 : 1[200]
     """)
 
 
@@ -153,7 +175,7 @@ def test_price_time_priority():
 
     matcher = Matcher(
         orderbook("""
-            ASK 10.5 : 3[50] 2[100] 3[20]
+            ASK 1050 : 3[50] 2[100] 3[20]
         """)
     )
 
@@ -165,16 +187,16 @@ def test_price_time_priority():
             type=OrderType.limit,
             side=Side.BUY,
             quantity=70,
-            price=10.6,
+            price=1060,
         )
     )
 
     assert result.executions == [
-        Execution(maker_id=3, taker_id=4, price=10.6, quantity=50),
-        Execution(maker_id=2, taker_id=4, price=10.6, quantity=20),
+        Execution(maker_id=3, taker_id=4, price=1060, quantity=50),
+        Execution(maker_id=2, taker_id=4, price=1060, quantity=20),
     ]
     assert result.order_book == orderbook("""
-       ASK 10.5 : 2[80] 3[20]
+       ASK 1050 : 2[80] 3[20]
     """)
 
     result = matcher.add(
@@ -185,12 +207,12 @@ def test_price_time_priority():
             type=OrderType.limit,
             side=Side.SELL,
             quantity=50,
-            price=10.5,
+            price=1050,
         )
     )
     assert result.executions == []
     assert result.order_book == orderbook("""
-       ASK 10.5 : 2[80] 3[20] 5[50]
+       ASK 1050 : 2[80] 3[20] 5[50]
     """)
 
     result = matcher.add(
@@ -201,17 +223,17 @@ def test_price_time_priority():
             type=OrderType.limit,
             side=Side.BUY,
             quantity=250,
-            price=10.5,
+            price=1050,
         )
     )
     assert result.executions == [
-        Execution(maker_id=2, taker_id=6, price=10.5, quantity=80),
-        Execution(maker_id=3, taker_id=6, price=10.5, quantity=20),
-        Execution(maker_id=5, taker_id=6, price=10.5, quantity=50),
+        Execution(maker_id=2, taker_id=6, price=1050, quantity=80),
+        Execution(maker_id=3, taker_id=6, price=1050, quantity=20),
+        Execution(maker_id=5, taker_id=6, price=1050, quantity=50),
     ]
     assert result.order_book == orderbook("""
-        ASK 10.5 :
-        BID 10.5 : 6[100]
+        ASK 1050 :
+        BID 1050 : 6[100]
     """)
 
 
@@ -222,12 +244,12 @@ def test_market_buy():
 
     matcher = Matcher(
         orderbook("""
-            ASK 11.5 : 1[200]
-            ASK 11.0 : 2[100]
-            ASK 10.5 : 3[50] 2[30]
-            BID 10.0 : 3[50] 
-            BID 9.80 : 2[100]
-            BID 9.70 : 1[200]
+            ASK 1150 : 1[200]
+            ASK 1100 : 2[100]
+            ASK 1050 : 3[50] 2[30]
+            BID 1000 : 3[50] 
+            BID  980 : 2[100]
+            BID  970 : 1[200]
         """)
     )
 
@@ -243,17 +265,17 @@ def test_market_buy():
     )
 
     assert result.executions == [
-        Execution(maker_id=3, taker_id=4, price=10.5, quantity=50),
-        Execution(maker_id=2, taker_id=4, price=10.5, quantity=30),
-        Execution(maker_id=2, taker_id=4, price=11.0, quantity=40),
+        Execution(maker_id=3, taker_id=4, price=1050, quantity=50),
+        Execution(maker_id=2, taker_id=4, price=1050, quantity=30),
+        Execution(maker_id=2, taker_id=4, price=1100, quantity=40),
     ]
     assert result.order_book == orderbook("""
-        ASK 11.5 : 1[200]
-        ASK 11.0 :  2[60]
-        ASK 10.5 :
-        BID 10.0 :  3[50] 
-        BID 9.80 : 2[100]
-        BID 9.70 : 1[200]
+        ASK 1150 : 1[200]
+        ASK 1100 :  2[60]
+        ASK 1050 :
+        BID 1000 :  3[50] 
+        BID  980 : 2[100]
+        BID  970 : 1[200]
     """)
 
     result = matcher.add(
@@ -272,18 +294,18 @@ def test_market_buy():
 def test_market_buy_low_liquidity():
     """
     Test that a market buy order for a quantity that exceeds the available liquidity.
-    The market order is expected to be partially executed, and the remaining quantity is added to the order book at
-    the last matched price, waiting to be filled.
+    The market order is expected to be partially executed, and the remaining quantity to be cancelled rather than
+    added to the order book.
     """
 
     matcher = Matcher(
         orderbook("""
-            ASK 11.5 : 1[200]
-            ASK 11.0 : 2[100]
-            ASK 10.5 : 3[50] 2[30]
-            BID 10.0 : 3[50] 
-            BID 9.80 : 2[100]
-            BID 9.70 : 1[200]
+            ASK 1150 : 1[200]
+            ASK 1100 : 2[100]
+            ASK 1050 : 3[50] 2[30]
+            BID 1000 : 3[50] 
+            BID  980 : 2[100]
+            BID  970 : 1[200]
         """)
     )
 
@@ -299,19 +321,19 @@ def test_market_buy_low_liquidity():
     )
 
     assert result.executions == [
-        Execution(maker_id=3, taker_id=4, price=10.5, quantity=50),
-        Execution(maker_id=2, taker_id=4, price=10.5, quantity=30),
-        Execution(maker_id=2, taker_id=4, price=11.0, quantity=100),
-        Execution(maker_id=1, taker_id=4, price=11.5, quantity=200),
+        Execution(maker_id=3, taker_id=4, price=1050, quantity=50),
+        Execution(maker_id=2, taker_id=4, price=1050, quantity=30),
+        Execution(maker_id=2, taker_id=4, price=1100, quantity=100),
+        Execution(maker_id=1, taker_id=4, price=1150, quantity=200),
     ]
+    assert result.resting is None
     assert result.order_book == orderbook("""
-        BID 11.5 : 4[120]
-        ASK 11.5 :
-        ASK 11.0 :
-        ASK 10.5 :
-        BID 10.0 : 3[50] 
-        BID 9.80 : 2[100]
-        BID 9.70 : 1[200]
+        ASK 1150 :
+        ASK 1100 :
+        ASK 1050 :
+        BID 1000 : 3[50] 
+        BID  980 : 2[100]
+        BID  970 : 1[200]
     """)
 
 
@@ -322,11 +344,11 @@ def test_market_sell():
 
     matcher = Matcher(
         orderbook("""
-            ASK 11.5 : 1[200]
-            BID 11.0 :  5[90] 
-            BID 10.0 :  3[50] 
-            BID 9.80 : 2[100]
-            BID 9.70 : 1[200]
+            ASK 1150 : 1[200]
+            BID 1100 :  5[90] 
+            BID 1000 :  3[50] 
+            BID  980 : 2[100]
+            BID  970 : 1[200]
         """)
     )
 
@@ -342,14 +364,14 @@ def test_market_sell():
     )
 
     assert result.executions == [
-        Execution(maker_id=5, taker_id=4, price=11.0, quantity=50),
+        Execution(maker_id=5, taker_id=4, price=1100, quantity=50),
     ]
     assert result.order_book == orderbook("""
-        ASK 11.5 : 1[200]
-        BID 11.0 :  5[40] 
-        BID 10.0 :  3[50] 
-        BID 9.80 : 2[100]
-        BID 9.70 : 1[200]
+        ASK 1150 : 1[200]
+        BID 1100 :  5[40] 
+        BID 1000 :  3[50] 
+        BID  980 : 2[100]
+        BID  970 : 1[200]
     """)
 
     result = matcher.add(
@@ -364,32 +386,32 @@ def test_market_sell():
     )
 
     assert result.executions == [
-        Execution(maker_id=5, taker_id=4, price=11.0, quantity=40),
-        Execution(maker_id=3, taker_id=4, price=10.0, quantity=10),
+        Execution(maker_id=5, taker_id=4, price=1100, quantity=40),
+        Execution(maker_id=3, taker_id=4, price=1000, quantity=10),
     ]
     assert result.order_book == orderbook("""
-        ASK 11.5 : 1[200]
-        BID 11.0 :
-        BID 10.0 :  3[40] 
-        BID 9.80 : 2[100]
-        BID 9.70 : 1[200]
+        ASK 1150 : 1[200]
+        BID 1100 :
+        BID 1000 :  3[40] 
+        BID  980 : 2[100]
+        BID  970 : 1[200]
     """)
 
 
 def test_market_sell_low_liquidity():
     """
     Test that a market sell order for a quantity that exceeds the available liquidity.
-    The market order is expected to be partially executed, and the remaining quantity is added to the order book at
-    the last matched price, waiting to be filled.
+    The market order is expected to be partially executed, and the remaining quantity to be cancelled rather than
+    added to the order book.
     """
 
     matcher = Matcher(
         orderbook("""
-            ASK 11.5 : 1[200]
-            BID 11.0 :  5[90] 
-            BID 10.0 :  3[50] 
-            BID 9.80 : 2[100]
-            BID 9.70 : 1[200]
+            ASK 1150 : 1[200]
+            BID 1100 :  5[90] 
+            BID 1000 :  3[50] 
+            BID  980 : 2[100]
+            BID  970 : 1[200]
         """)
     )
 
@@ -405,24 +427,590 @@ def test_market_sell_low_liquidity():
     )
 
     assert result.executions == [
-        Execution(maker_id=5, taker_id=4, price=11.0, quantity=90),
-        Execution(maker_id=3, taker_id=4, price=10.0, quantity=50),
-        Execution(maker_id=2, taker_id=4, price=9.80, quantity=100),
-        Execution(maker_id=1, taker_id=4, price=9.70, quantity=200),
+        Execution(maker_id=5, taker_id=4, price=1100, quantity=90),
+        Execution(maker_id=3, taker_id=4, price=1000, quantity=50),
+        Execution(maker_id=2, taker_id=4, price=980, quantity=100),
+        Execution(maker_id=1, taker_id=4, price=970, quantity=200),
     ]
     assert result.order_book == orderbook("""
-        ASK 11.5 : 1[200]
-        BID 11.0 : 
-        BID 10.0 :
-        BID 9.80 :
-        BID 9.70 :
-        ASK 9.70 : 4[60]
+        ASK 1150 : 1[200]
+        BID 1100 : 
+        BID 1000 :
+        BID  980 :
+        BID  970 :
     """)
+    assert result.resting is None
+
+
+def test_price_level_aggregates():
+    """
+    Test that price levels keep their aggregate quantity and order count up to date, and that depleted levels are
+    removed from the book.
+    """
+
+    matcher = Matcher(
+        orderbook("""
+            ASK 1100 : 2[100]
+            ASK 1050 : 3[50] 2[30] 1[20]
+        """)
+    )
+
+    level = matcher.asks[1050]
+    assert (level.quantity, level.count) == (100, 3)
+
+    matcher.add(
+        Order(
+            id="1",
+            client_id=4,
+            security_id=1,
+            type=OrderType.limit,
+            side=Side.BUY,
+            quantity=60,
+            price=1050,
+        )
+    )
+
+    assert matcher.asks[1050] is level
+    assert (level.quantity, level.count) == (40, 2)
+    assert [order.maker_id for order in level] == [2, 1]
+
+    matcher.add(
+        Order(
+            id="2",
+            client_id=4,
+            security_id=1,
+            type=OrderType.limit,
+            side=Side.BUY,
+            quantity=60,
+            price=1100,
+        )
+    )
+
+    assert list(matcher.asks) == [1100]
+    assert (matcher.asks[1100].quantity, matcher.asks[1100].count) == (80, 1)
 
 
 def test_cancel_order():
-    # TODO
-    pass
+    matcher = Matcher(
+        orderbook("""
+            ASK 1100 : 2[100]
+        """)
+    )
+
+    for order_id, client_id, quantity in (("1", 3, 50), ("2", 4, 30), ("3", 5, 20)):
+        matcher.add(
+            Order(
+                id=order_id,
+                client_id=client_id,
+                security_id=1,
+                type=OrderType.limit,
+                side=Side.SELL,
+                quantity=quantity,
+                price=1050,
+            )
+        )
+
+    cancelled = matcher.cancel("2")
+
+    assert cancelled == OrderBookOrder(maker_id=4, quantity=30, price=1050)
+    assert matcher.order_book == orderbook("""
+        ASK 1100 : 2[100]
+        ASK 1050 : 3[50] 5[20]
+    """)
+    assert (matcher.asks[1050].quantity, matcher.asks[1050].count) == (70, 2)
+
+    # Cancelling an order twice, or an unknown order, is a no-op
+    assert matcher.cancel("2") is None
+    assert matcher.cancel("unknown") is None
+
+    matcher.cancel("1")
+    matcher.cancel("3")
+
+    assert matcher.order_book == orderbook("""
+        ASK 1100 : 2[100]
+        ASK 1050 :
+    """)
+
+
+def test_cancel_filled_order():
+    matcher = Matcher(orderbook(""))
+
+    matcher.add(
+        Order(
+            id="1",
+            client_id=3,
+            security_id=1,
+            type=OrderType.limit,
+            side=Side.BUY,
+            quantity=50,
+            price=1000,
+        )
+    )
+    matcher.add(
+        Order(
+            id="2",
+            client_id=4,
+            security_id=1,
+            type=OrderType.market,
+            side=Side.SELL,
+            quantity=50,
+        )
+    )
+
+    assert matcher.cancel("1") is None
+    assert matcher.orders == {}
+
+
+def test_amend_order():
+    matcher = Matcher(orderbook(""))
+
+    for order_id, client_id in (("1", 3), ("2", 4)):
+        matcher.add(
+            Order(
+                id=order_id,
+                client_id=client_id,
+                security_id=1,
+                type=OrderType.limit,
+                side=Side.BUY,
+                quantity=50,
+                price=1000,
+            )
+        )
+
+    # A reduction keeps time priority
+    matcher.amend("1", 20)
+
+    assert matcher.order_book == orderbook("""
+        BID 1000 : 3[20] 4[50]
+    """)
+    assert matcher.bids[1000].quantity == 70
+
+    # An increase loses time priority
+    matcher.amend("1", 60)
+
+    assert matcher.order_book == orderbook("""
+        BID 1000 : 4[50] 3[60]
+    """)
+    assert matcher.bids[1000].quantity == 110
+
+    # Amending to zero cancels the order
+    matcher.amend("2", 0)
+
+    assert matcher.order_book == orderbook("""
+        BID 1000 : 3[60]
+    """)
+    assert matcher.amend("2", 10) is None
+
+
+def test_level_updates():
+    matcher = Matcher(
+        orderbook("""
+          ASK 1100 : 2[100]
+          ASK 1050 : 3[50]
+          BID 1000 : 3[50]
+        """)
+    )
+
+    result = matcher.add(
+        Order(
+            id="1",
+            client_id=4,
+            security_id=1,
+            type=OrderType.limit,
+            side=Side.BUY,
+            quantity=200,
+            price=1100,
+        )
+    )
+
+    # Each level changed is reported with its new aggregate quantity
+    assert result.updates == [
+        LevelUpdate(Side.SELL, 1050, 0),
+        LevelUpdate(Side.SELL, 1100, 0),
+        LevelUpdate(Side.BUY, 1100, 50),
+    ]
+
+    matcher.amend("1", 30)
+    assert matcher.updates == [LevelUpdate(Side.BUY, 1100, 30)]
+
+    matcher.cancel("1")
+    assert matcher.updates == [LevelUpdate(Side.BUY, 1100, 0)]
+
+
+def test_add_batch():
+    def orders():
+        return [
+            Order(
+                id=str(i),
+                client_id=client_id,
+                security_id=1,
+                type=order_type,
+                side=side,
+                quantity=quantity,
+                price=price,
+            )
+            for i, (client_id, order_type, side, quantity, price) in enumerate(
+                [
+                    (1, OrderType.limit, Side.SELL, 100, 1050),
+                    (2, OrderType.limit, Side.SELL, 50, 1100),
+                    (3, OrderType.limit, Side.BUY, 120, 1100),
+                    (4, OrderType.limit, Side.BUY, 40, 1000),
+                    (5, OrderType.market, Side.SELL, 10, None),
+                ]
+            )
+        ]
+
+    sequential = Matcher(orderbook(""))
+    results = [sequential.add(order) for order in orders()]
+
+    batched = Matcher(orderbook(""))
+    result = batched.add_batch(orders())
+
+    assert result.executions == [result.executions for result in results]
+    assert result.resting == [result.resting for result in results]
+    assert result.resting_quantities == [100, 50, 0, 40, 0]
+    assert batched.order_book == sequential.order_book
+
+
+def test_add_batch_unsupported_order():
+    matcher = Matcher(orderbook(""))
+    orders = [
+        Order(
+            id=str(i),
+            client_id=i,
+            security_id=1,
+            type=OrderType.limit,
+            side=Side.BUY,
+            quantity=50,
+            price=1000,
+        )
+        for i in range(2)
+    ]
+    orders[1].type = "stop"
+
+    with pytest.raises(ValueError):
+        matcher.add_batch(orders)
+
+    # No order of the batch is matched
+    assert matcher.order_book == orderbook("")
+    assert matcher.orders == {}
+
+
+@pytest.mark.parametrize(
+    "mode, executions, cancels, resting, asks",
+    [
+        (
+            SelfTradePrevention.none,
+            [("a1", 50), ("a2", 50), ("a3", 20)],
+            [],
+            0,
+            {1100: 80},
+        ),
+        (
+            SelfTradePrevention.cancel_newest,
+            [],
+            [("b", 120)],
+            0,
+            {1050: 100, 1100: 100},
+        ),
+        (
+            SelfTradePrevention.cancel_oldest,
+            [("a2", 50)],
+            [("a1", 50), ("a3", 100)],
+            70,
+            {},
+        ),
+        (
+            SelfTradePrevention.decrement_both,
+            [("a2", 50)],
+            [("a1", 50), ("b", 50), ("a3", 20), ("b", 20)],
+            0,
+            {1100: 80},
+        ),
+    ],
+    ids=lambda value: value.value if isinstance(value, SelfTradePrevention) else "",
+)
+def test_self_trade_prevention(mode, executions, cancels, resting, asks):
+    matcher = Matcher(OrderBook.create(1, BOOK_ENGINE), mode)
+
+    def order(id, client_id, side, quantity, price):
+        return Order(
+            id=id,
+            client_id=client_id,
+            security_id=1,
+            type=OrderType.limit,
+            side=side,
+            quantity=quantity,
+            price=price,
+        )
+
+    result = matcher.add_batch(
+        [
+            order("a1", 1, Side.SELL, 50, 1050),
+            order("a2", 2, Side.SELL, 50, 1050),
+            order("a3", 1, Side.SELL, 100, 1100),
+        ]
+    )
+    assert result.self_trade_cancels == [[], [], []]
+
+    result = matcher.add(order("b", 1, Side.BUY, 120, 1100))
+
+    assert [
+        (execution.maker_order_id, execution.quantity)
+        for execution in result.executions
+    ] == executions
+    assert result.self_trade_cancels == [
+        SelfTradeCancel(order_id, quantity) for order_id, quantity in cancels
+    ]
+    assert (result.resting.quantity if result.resting else 0) == resting
+    assert {price: level.quantity for price, level in matcher.asks.items()} == asks
+    # Cancelled makers leave the index of resting orders
+    assert set(matcher.orders) == {
+        entry.order_id
+        for book in (matcher.asks, matcher.bids)
+        for level in book.values()
+        for entry in level
+    }
+
+
+@pytest.mark.parametrize(
+    "time_in_force, quantity, price, executions, resting, asks",
+    [
+        (TimeInForce.gtc, 200, 1100, [50, 100], 50, {}),
+        (TimeInForce.ioc, 200, 1100, [50, 100], 0, {}),
+        (TimeInForce.fok, 120, 1100, [50, 70], 0, {1100: 30}),
+        # Not enough quantity in the book, or within the limit price
+        (TimeInForce.fok, 200, 1100, [], 0, {1050: 50, 1100: 100}),
+        (TimeInForce.fok, 120, 1050, [], 0, {1050: 50, 1100: 100}),
+        (TimeInForce.post_only, 200, 1000, [], 200, {1050: 50, 1100: 100}),
+        # Would take liquidity
+        (TimeInForce.post_only, 200, 1050, [], 0, {1050: 50, 1100: 100}),
+    ],
+    ids=lambda value: value.value if isinstance(value, TimeInForce) else "",
+)
+def test_time_in_force(time_in_force, quantity, price, executions, resting, asks):
+    matcher = Matcher(
+        orderbook("""
+            ASK 1100 : 2[100]
+            ASK 1050 : 1[50]
+        """)
+    )
+
+    result = matcher.add(
+        Order(
+            id="1",
+            client_id=3,
+            security_id=1,
+            type=OrderType.limit,
+            side=Side.BUY,
+            quantity=quantity,
+            price=price,
+            time_in_force=time_in_force,
+        )
+    )
+
+    assert [execution.quantity for execution in result.executions] == executions
+    assert (result.resting.quantity if result.resting else 0) == resting
+    assert {price: level.quantity for price, level in matcher.asks.items()} == asks
+    assert set(matcher.bids) == ({price} if resting else set())
+    if not executions and not resting:
+        # Rejected without touching the book
+        assert matcher.updates == []
+
+
+def test_market_fill_or_kill():
+    matcher = Matcher(
+        orderbook("""
+            BID 1000 : 1[50]
+            BID  990 : 2[100]
+        """)
+    )
+
+    def order(id, quantity):
+        return Order(
+            id=id,
+            client_id=3,
+            security_id=1,
+            type=OrderType.market,
+            side=Side.SELL,
+            quantity=quantity,
+            time_in_force=TimeInForce.fok,
+        )
+
+    assert matcher.add(order("1", 200)).executions == []
+    assert matcher.add(order("2", 150)).executions == [
+        Execution(maker_id=1, taker_id=3, price=1000, quantity=50),
+        Execution(maker_id=2, taker_id=3, price=990, quantity=100),
+    ]
+    assert matcher.order_book == orderbook("")
+
+
+@pytest.mark.parametrize(
+    "mode, filled",
+    [
+        (SelfTradePrevention.none, True),
+        (SelfTradePrevention.cancel_newest, False),
+        (SelfTradePrevention.cancel_oldest, True),
+        (SelfTradePrevention.decrement_both, False),
+    ],
+    ids=lambda value: value.value if isinstance(value, SelfTradePrevention) else "",
+)
+def test_fill_or_kill_self_trade_prevention(mode, filled):
+    """
+    A fill-or-kill order is only filled if it can be without trading with orders of its own client.
+    """
+
+    matcher = Matcher(OrderBook.create(1, BOOK_ENGINE), mode)
+
+    def order(id, client_id, side, quantity, time_in_force=TimeInForce.gtc):
+        return Order(
+            id=id,
+            client_id=client_id,
+            security_id=1,
+            type=OrderType.limit,
+            side=side,
+            quantity=quantity,
+            price=1050,
+            time_in_force=time_in_force,
+        )
+
+    matcher.add(order("a1", 1, Side.SELL, 50))
+    matcher.add(order("a2", 2, Side.SELL, 100))
+
+    result = matcher.add(order("b", 1, Side.BUY, 100, TimeInForce.fok))
+
+    assert sum(execution.quantity for execution in result.executions) == (
+        100 if filled else 0
+    )
+    assert result.resting is None
+
+
+def stop_order(id, client_id, side, quantity, stop_price, price=None):
+    return Order(
+        id=id,
+        client_id=client_id,
+        security_id=1,
+        type=OrderType.stop if price is None else OrderType.stop_limit,
+        side=side,
+        quantity=quantity,
+        price=price,
+        stop_price=stop_price,
+    )
+
+
+def test_stop_orders():
+    matcher = Matcher(
+        orderbook("""
+            ASK 1100 : 2[100]
+            ASK 1050 : 1[50]
+            BID 1000 : 3[50]
+        """)
+    )
+
+    # Nothing has traded yet, so the stops wait for their trigger
+    for order in (
+        stop_order("s1", 5, Side.BUY, 60, 1050),
+        stop_order("s2", 6, Side.BUY, 20, 1040, price=1100),
+        stop_order("s3", 7, Side.BUY, 10, 1200),
+        stop_order("s4", 8, Side.SELL, 10, 1000),
+    ):
+        result = matcher.add(order)
+        assert result.pending
+        assert result.executions == result.triggered == []
+    assert len(matcher.triggers) == 4
+
+    # A trade at 1050 triggers the buy stops at or below it, lowest stop price first; the stop-limit buy takes the
+    # rest of 1050 and some of 1100, and the stop buy sweeps what is left of 1100
+    result = matcher.add(
+        Order(
+            id="1",
+            client_id=4,
+            security_id=1,
+            type=OrderType.limit,
+            side=Side.BUY,
+            quantity=40,
+            price=1050,
+        )
+    )
+
+    assert result.executions == [
+        Execution(maker_id=1, taker_id=4, price=1050, quantity=40)
+    ]
+    assert [
+        (triggered.order_id, [execution.quantity for execution in triggered.executions])
+        for triggered in result.triggered
+    ] == [("s2", [10, 10]), ("s1", [60])]
+    assert result.triggered[0].resting is None
+    assert matcher.last_price == 1100
+    assert matcher.order_book == orderbook("""
+        ASK 1100 : 2[30]
+        BID 1000 : 3[50]
+    """)
+    assert [order.id for order in matcher.triggers] == ["s3", "s4"]
+
+    # A pending stop is cancelled out of the trigger book
+    assert matcher.cancel("s3").id == "s3"
+    assert [order.id for order in matcher.triggers] == ["s4"]
+
+
+def test_stop_order_triggered_on_arrival():
+    matcher = Matcher(
+        orderbook("""
+            ASK 1100 : 2[100]
+            ASK 1050 : 1[50]
+        """)
+    )
+    matcher.last_price = 1050
+
+    result = matcher.add(stop_order("1", 3, Side.BUY, 60, 1040))
+
+    assert not result.pending
+    assert [execution.price for execution in result.executions] == [1050, 1100]
+    assert not matcher.triggers
+
+
+def test_stop_orders_cascade():
+    """
+    Stop orders triggered by the trades of other triggered stop orders are matched in the same command, in the order
+    they were triggered, whether the orders are added one at a time or in a batch.
+    """
+
+    def orders():
+        return [
+            stop_order("s1", 5, Side.SELL, 50, 1000),
+            stop_order("s2", 6, Side.SELL, 50, 990),
+            stop_order("s3", 7, Side.SELL, 10, 970),
+            Order(
+                id="1",
+                client_id=4,
+                security_id=1,
+                type=OrderType.market,
+                side=Side.SELL,
+                quantity=10,
+            ),
+        ]
+
+    def book():
+        return orderbook("""
+            BID 1000 : 1[40]
+            BID  990 : 2[50]
+            BID  980 : 3[50]
+        """)
+
+    sequential = Matcher(book())
+    result = [sequential.add(order) for order in orders()][-1]
+    assert [triggered.order_id for triggered in result.triggered] == ["s1", "s2"]
+    assert sequential.order_book == orderbook("""
+        BID 980 : 3[30]
+    """)
+    assert [order.id for order in sequential.triggers] == ["s3"]
+
+    batched = Matcher(book())
+    batch = batched.add_batch(orders())
+    assert batch.pending == [True, True, True, False]
+    assert batch.triggered[:3] == [[], [], []]
+    assert batch.triggered[3] == result.triggered
+    assert batched.order_book == sequential.order_book
 
 
 def orderbook(book: str) -> OrderBook:
@@ -431,24 +1019,20 @@ def orderbook(book: str) -> OrderBook:
     Parses a string representation of an order book into an OrderBook object.
     """
 
-    order_book = OrderBook(security_id=1, asks=SortedDict(), bids=SortedDict())
+    order_book = OrderBook.create(security_id=1, engine=BOOK_ENGINE)
 
     for line in book.split("\n"):
         line = line.strip()
         if not line:
             continue
 
-        # Example: `ASK 10.5 : 3[50] 2[100] 3[20]  -- executions must respect this order`
-        pattern = r"^(ASK|BID)\s+(\d+\.?\d*)\s+:\s*(\d+\[\d+\](?:\s+\d+\[\d+\])*)*"
+        # Example: `ASK 1050 : 3[50] 2[100] 3[20]  -- executions must respect this order`
+        pattern = r"^(ASK|BID)\s+(\d+)\s+:\s*(\d+\[\d+\](?:\s+\d+\[\d+\])*)*"
 
         side, price, makers = re.match(pattern, line).groups()
-        price = float(price)
+        price = int(price)
 
-        if makers is None:  # depleted price level
-            if side == "ASK":
-                order_book.asks[price] = []
-            elif side == "BID":
-                order_book.bids[price] = []
+        if makers is None:  # depleted price level, which is pruned from the book
             continue
 
         for maker in makers.split():
@@ -463,7 +1047,7 @@ def orderbook(book: str) -> OrderBook:
 
             if side == "ASK":
                 if price not in order_book.asks:
-                    order_book.asks[price] = []
+                    order_book.asks[price] = PriceLevel(price)
 
                 order_book.asks[price].append(
                     OrderBookOrder(maker_id=maker, quantity=quantity, price=price)
@@ -471,7 +1055,7 @@ def orderbook(book: str) -> OrderBook:
 
             elif side == "BID":
                 if price not in order_book.bids:
-                    order_book.bids[price] = []
+                    order_book.bids[price] = PriceLevel(price)
 
                 order_book.bids[price].append(
                     OrderBookOrder(maker_id=maker, quantity=quantity, price=price)
@@ -0,0 +1,102 @@
+import pytest
+
+from src.server.orders.model import (
+    Order,
+    OrderRepository,
+    OrderStatus,
+    OrderType,
+    Side,
+)
+
+
+@pytest.fixture
+def order_repository() -> OrderRepository:
+    order_repository = OrderRepository()
+    for i in range(10):
+        order_repository.create_order(
+            Order(
+                id=str(i),
+                client_id=i % 2,
+                security_id=i % 3,
+                side=Side.BUY if i < 5 else Side.SELL,
+                quantity=10,
+                type=OrderType.limit,
+                price=100,
+            )
+        )
+    return order_repository
+
+
+def ids(orders):
+    return [order.id for order in orders]
+
+
+def test_query_pages(order_repository: OrderRepository):
+    page = order_repository.query(limit=4)
+    assert ids(page.orders) == ["0", "1", "2", "3"]
+    assert page.next_cursor == 4
+
+    page = order_repository.query(cursor=page.next_cursor, limit=4)
+    assert ids(page.orders) == ["4", "5", "6", "7"]
+
+    page = order_repository.query(cursor=page.next_cursor, limit=4)
+    assert ids(page.orders) == ["8", "9"]
+    assert page.next_cursor is None
+
+
+def test_query_filters(order_repository: OrderRepository):
+    assert ids(order_repository.query(client_id=1).orders) == ["1", "3", "5", "7", "9"]
+    assert ids(order_repository.query(security_id=2).orders) == ["2", "5", "8"]
+    assert ids(order_repository.query(client_id=0, side=Side.SELL).orders) == [
+        "6",
+        "8",
+    ]
+    assert order_repository.query(client_id=5).orders == []
+
+    # The cursor of a filtered page is the number of the next matching order
+    page = order_repository.query(client_id=1, limit=2)
+    assert ids(page.orders) == ["1", "3"]
+    assert page.next_cursor == 5
+    assert ids(order_repository.query(client_id=1, cursor=5).orders) == ["5", "7", "9"]
+
+
+def test_query_status(order_repository: OrderRepository):
+    order_repository.fill("3", 4, 100)
+    order_repository.fill("7", 10, 100)
+    order_repository.cancel("2")
+    order_repository.fill("unknown", 10, 100)
+
+    assert order_repository.get_order("3").status == OrderStatus.partially_filled
+    assert order_repository.get_order("3").filled_quantity == 4
+    assert ids(order_repository.query(status=OrderStatus.partially_filled).orders) == [
+        "3"
+    ]
+    assert ids(order_repository.query(status=OrderStatus.filled).orders) == ["7"]
+    assert ids(order_repository.query(status=OrderStatus.cancelled).orders) == ["2"]
+    assert ids(
+        order_repository.query(status=OrderStatus.open, side=Side.BUY).orders
+    ) == ["0", "1", "4"]
+
+    order_repository.fill("3", 6, 100)
+    assert ids(order_repository.query(status=OrderStatus.filled).orders) == ["3", "7"]
+
+
+def test_cancelled_orders_stay_cancelled(order_repository: OrderRepository):
+    order_repository.fill("3", 4, 100)
+    order_repository.cancel("3")
+    order_repository.fill("3", 2, 100)
+
+    order = order_repository.get_order("3")
+    assert (order.status, order.filled_quantity, order.remaining_quantity) == (
+        OrderStatus.cancelled,
+        6,
+        0,
+    )
+    assert ids(order_repository.query(status=OrderStatus.cancelled).orders) == ["3"]
+    # Only order 9 is left open for the client in the security
+    assert order_repository.open_notional[(1, 0)] == 10 * 100
+
+
+def test_query_invalid_limit(order_repository: OrderRepository):
+    with pytest.raises(ValueError):
+        order_repository.query(limit=0)
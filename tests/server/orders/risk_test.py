@@ -0,0 +1,78 @@
+import pytest
+
+from src.server.orders.manager import OrderManager
+from src.server.orders.matcher import RootMatcher
+from src.server.orders.model import OrderRepository, Side
+from src.server.orders.risk import OrderRejected, RiskChecker, RiskLimits
+from src.server.orders.sequencer import Sequencer
+from src.server.securities.model import SecuritiesRepository
+from tests.server.orders.factories import order_input
+
+
+def order_manager(limits: RiskLimits) -> OrderManager:
+    securities = SecuritiesRepository()
+    order_repository = OrderRepository()
+    return OrderManager(
+        order_repository,
+        Sequencer(RootMatcher(securities), order_repository=order_repository),
+        RiskChecker(order_repository, securities, limits),
+    )
+
+
+async def test_max_order_quantity():
+    manager = order_manager(RiskLimits(max_order_quantity=100))
+
+    await manager.create_order(order_input(Side.BUY, 100, 1000))
+    with pytest.raises(OrderRejected):
+        await manager.create_order(order_input(Side.BUY, 101, 1000))
+    with pytest.raises(OrderRejected):
+        await manager.create_order(order_input(Side.SELL, 101))
+
+    # Rejected orders are not stored
+    assert len(manager.list_orders()) == 1
+
+
+async def test_max_open_notional():
+    # 10.00 of AAPL, whose tick size is 0.01
+    manager = order_manager(RiskLimits(max_open_notional=10.0))
+    open_notional = manager.order_repository.open_notional
+
+    sell = await manager.create_order(order_input(Side.SELL, 5, 100))
+    assert open_notional == {(1, 1): 500}
+    with pytest.raises(OrderRejected):
+        await manager.create_order(order_input(Side.SELL, 6, 100))
+    # Other clients have their own limit
+    await manager.create_order(order_input(Side.BUY, 2, 100, client_id=2))
+
+    # Fills and cancels free up notional
+    assert open_notional == {(1, 1): 300, (2, 1): 0}
+    await manager.create_order(order_input(Side.SELL, 7, 100))
+    await manager.cancel_order(sell.order.id)
+    assert open_notional == {(1, 1): 700, (2, 1): 0}
+
+    # The orders of a batch count towards the limit of the ones after them
+    with pytest.raises(OrderRejected):
+        await manager.create_orders(
+            [order_input(Side.SELL, 2, 100), order_input(Side.SELL, 2, 100)]
+        )
+    assert open_notional == {(1, 1): 700, (2, 1): 0}
+
+
+async def test_price_band():
+    manager = order_manager(RiskLimits(price_band=0.1))
+
+    # Orders are not banded before the first trade
+    await manager.create_order(order_input(Side.SELL, 5, 1000))
+    await manager.create_order(order_input(Side.BUY, 5, 1000))
+    await manager.create_order(order_input(Side.BUY, 5, 900))
+    await manager.create_order(order_input(Side.SELL, 5, 1100))
+    with pytest.raises(OrderRejected):
+        await manager.create_order(order_input(Side.BUY, 5, 899))
+    with pytest.raises(OrderRejected):
+        await manager.create_orders(
+            [order_input(Side.SELL, 5, 1000), order_input(Side.SELL, 5, 1101)]
+        )
+
+    # Market orders are not banded, and move the band with their trades
+    await manager.create_order(order_input(Side.BUY, 5))
+    await manager.create_order(order_input(Side.BUY, 5, 1210))
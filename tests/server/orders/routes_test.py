@@ -0,0 +1,331 @@
+import pytest
+import pytest_asyncio
+from blacksheep.contents import JSONContent
+from blacksheep.testing import TestClient
+
+from src.server.main import app
+
+# The app is started once for all tests, and its sequencer consumers are bound to the event loop it was started in
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def client() -> TestClient:
+    await app.start()
+    return TestClient(app)
+
+
+async def test_create_order(client: TestClient):
+    # GOOGL (security 3) is not used by other tests, so its order book starts empty
+    response = await client.post(
+        "/orders",
+        content=JSONContent(
+            {
+                "client_id": 1,
+                "security_id": 3,
+                "side": "sell",
+                "quantity": 100,
+                "type": "limit",
+                "price": 170.25,
+            }
+        ),
+    )
+
+    assert response.status == 200
+    sell = await response.json()
+    assert sell["order"]["price"] == 170.25
+    assert sell["executions"] == []
+    assert sell["resting_quantity"] == 100
+
+    response = await client.post(
+        "/orders",
+        content=JSONContent(
+            {
+                "client_id": 2,
+                "security_id": 3,
+                "side": "buy",
+                "quantity": 40,
+                "type": "limit",
+                "price": 170.25,
+            }
+        ),
+    )
+
+    assert response.status == 200
+    buy = await response.json()
+    assert buy["executions"] == [
+        {
+            "maker_id": 1,
+            "taker_id": 2,
+            "price": 170.25,
+            "quantity": 40,
+            "maker_order_id": sell["order"]["id"],
+            "taker_order_id": buy["order"]["id"],
+        }
+    ]
+    assert buy["resting_quantity"] == 0
+    assert buy["order"]["status"] == "filled"
+
+    response = await client.get(f"/orders/{buy['order']['id']}")
+    assert response.status == 200
+    assert await response.json() == buy["order"]
+
+    # The resting sell order was partially filled by the buy order
+    response = await client.get(f"/orders/{sell['order']['id']}")
+    order = await response.json()
+    assert order["status"] == "partially_filled"
+    assert order["filled_quantity"] == 40
+    assert order["remaining_quantity"] == 60
+    assert order["average_price"] == 170.25
+
+
+async def test_cancel_order(client: TestClient):
+    response = await client.post(
+        "/orders",
+        content=JSONContent(
+            {
+                "client_id": 1,
+                "security_id": 3,
+                "side": "sell",
+                "quantity": 100,
+                "type": "limit",
+                "price": 180,
+            }
+        ),
+    )
+    sell = await response.json()
+
+    response = await client.delete(f"/orders/{sell['order']['id']}")
+    assert response.status == 200
+    order = await response.json()
+    assert order["status"] == "cancelled"
+    assert order["remaining_quantity"] == 0
+
+    # Cancelling again leaves the order cancelled
+    response = await client.delete(f"/orders/{sell['order']['id']}")
+    assert response.status == 200
+
+    response = await client.get(
+        "/orders", query={"security_id": 3, "status": "cancelled"}
+    )
+    page = await response.json()
+    assert [order["id"] for order in page["orders"]] == [sell["order"]["id"]]
+
+
+async def test_cancel_filled_order(client: TestClient):
+    # AAPL (security 1) is not used by other tests
+    orders = []
+    for side in ("sell", "buy"):
+        response = await client.post(
+            "/orders",
+            content=JSONContent(
+                {
+                    "client_id": 1,
+                    "security_id": 1,
+                    "side": side,
+                    "quantity": 5,
+                    "type": "limit",
+                    "price": 120,
+                }
+            ),
+        )
+        orders.append(await response.json())
+
+    response = await client.delete(f"/orders/{orders[0]['order']['id']}")
+    assert response.status == 409
+
+    response = await client.delete("/orders/unknown")
+    assert response.status == 404
+
+
+async def test_create_order_invalid_price(client: TestClient):
+    response = await client.post(
+        "/orders",
+        content=JSONContent(
+            {
+                "client_id": 1,
+                "security_id": 3,
+                "side": "buy",
+                "quantity": 100,
+                "type": "limit",
+                "price": 170.255,
+            }
+        ),
+    )
+
+    assert response.status == 400
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"type": "limit", "quantity": 10},
+        {"type": "limit", "quantity": 0, "price": 150},
+        {"type": "limit", "quantity": -10, "price": 150},
+        {"type": "limit", "quantity": 10, "price": -150},
+        {"type": "limit", "quantity": 10, "price": 0},
+        {"type": "market", "quantity": 10, "price": 150},
+        {"type": "stop_limit", "quantity": 10, "stop_price": 140},
+        {"type": "stop_limit", "quantity": 10, "price": 150, "stop_price": -140},
+        {"type": "limit", "quantity": 10.5, "price": 150},
+        {"type": "limit", "quantity": "10", "price": 150},
+        {"type": "limit", "quantity": 10, "price": 1e30},
+        {"type": "limit", "quantity": 10, "price": "NaN"},
+        {"type": "stop", "quantity": 10, "stop_price": "Infinity"},
+    ],
+)
+async def test_create_order_invalid(client: TestClient, fields: dict):
+    response = await client.post(
+        "/orders",
+        content=JSONContent(
+            {"client_id": 1, "security_id": 3, "side": "buy", **fields}
+        ),
+    )
+
+    assert response.status == 400
+
+
+async def test_create_order_rejected(client: TestClient):
+    response = await client.post(
+        "/orders",
+        content=JSONContent(
+            {
+                "client_id": 1,
+                "security_id": 3,
+                "side": "buy",
+                "quantity": 10**9,
+                "type": "limit",
+                "price": 1,
+            }
+        ),
+    )
+
+    assert response.status == 400
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"type": "stop"},
+        {"type": "limit", "price": 150, "stop_price": 140},
+        {"type": "stop", "stop_price": 140, "time_in_force": "post_only"},
+    ],
+)
+async def test_create_stop_order_invalid(client: TestClient, fields: dict):
+    response = await client.post(
+        "/orders",
+        content=JSONContent(
+            {"client_id": 1, "security_id": 3, "side": "buy", "quantity": 1, **fields}
+        ),
+    )
+
+    assert response.status == 400
+
+
+async def test_create_orders(client: TestClient):
+    response = await client.post(
+        "/orders/batch",
+        content=JSONContent(
+            [
+                {
+                    "client_id": 1,
+                    "security_id": 3,
+                    "side": "buy",
+                    "quantity": 100,
+                    "type": "limit",
+                    "price": 150,
+                },
+                {
+                    "client_id": 2,
+                    "security_id": 3,
+                    "side": "sell",
+                    "quantity": 40,
+                    "type": "limit",
+                    "price": 150,
+                },
+            ]
+        ),
+    )
+
+    assert response.status == 200
+    buy, sell = await response.json()
+    assert buy["resting_quantity"] == 100
+    assert sell["executions"] == [
+        {
+            "maker_id": 1,
+            "taker_id": 2,
+            "price": 150,
+            "quantity": 40,
+            "maker_order_id": buy["order"]["id"],
+            "taker_order_id": sell["order"]["id"],
+        }
+    ]
+    assert sell["sequence"] == buy["sequence"] + 1
+
+
+async def test_create_orders_invalid(client: TestClient):
+    # A negative order would make room under the open notional limit for the order after it
+    response = await client.post(
+        "/orders/batch",
+        content=JSONContent(
+            [
+                {
+                    "client_id": 3,
+                    "security_id": 3,
+                    "side": "buy",
+                    "quantity": quantity,
+                    "type": "limit",
+                    "price": 1000,
+                }
+                for quantity in (-1_000_000, 1_000_000)
+            ]
+        ),
+    )
+
+    assert response.status == 400
+    response = await client.get("/orders", query={"client_id": 3})
+    assert (await response.json())["orders"] == []
+
+
+async def test_get_unknown_order(client: TestClient):
+    response = await client.get("/orders/unknown")
+
+    assert response.status == 404
+
+
+async def test_list_orders(client: TestClient):
+    # MSFT (security 2) is not used by other tests, apart from a bid far below these prices
+    for client_id, side in ((7, "buy"), (8, "buy"), (7, "sell"), (7, "buy")):
+        await client.post(
+            "/orders",
+            content=JSONContent(
+                {
+                    "client_id": client_id,
+                    "security_id": 2,
+                    "side": side,
+                    "quantity": 10,
+                    "type": "limit",
+                    "price": 300 if side == "buy" else 310,
+                }
+            ),
+        )
+
+    response = await client.get(
+        "/orders", query={"client_id": 7, "security_id": 2, "limit": 2}
+    )
+    assert response.status == 200
+    page = await response.json()
+    assert [order["side"] for order in page["orders"]] == ["buy", "sell"]
+    assert page["next_cursor"] is not None
+
+    response = await client.get(
+        "/orders",
+        query={"client_id": 7, "security_id": 2, "cursor": page["next_cursor"]},
+    )
+    page = await response.json()
+    assert [order["side"] for order in page["orders"]] == ["buy"]
+    assert page["orders"][0]["status"] == "open"
+    assert page["next_cursor"] is None
+
+    response = await client.get("/orders", query={"status": "unknown"})
+    assert response.status == 400
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from src.server.market_data.trades import TradeStore
+from src.server.orders.matcher import Execution, RootMatcher
+from src.server.orders.model import Side
+from src.server.orders.sequencer import AddOrder, AddOrders, Sequencer
+from src.server.securities.model import SecuritiesRepository
+from tests.server.orders.factories import order
+
+
+@pytest.fixture
+async def sequencer():
+    sequencer = Sequencer(RootMatcher(SecuritiesRepository()))
+    yield sequencer
+    await sequencer.stop()
+
+
+async def test_commands_are_applied_in_sequence(sequencer: Sequencer):
+    commands = [
+        AddOrder(order("1", 1, Side.SELL, 50)),
+        AddOrder(order("2", 1, Side.SELL, 50)),
+        AddOrder(order("3", 1, Side.BUY, 80)),
+    ]
+
+    results = await asyncio.gather(*map(sequencer.submit, commands))
+
+    assert [command.sequence for command in commands] == [1, 2, 3]
+    assert results[2].executions == [
+        Execution(maker_id=1, taker_id=3, price=1000, quantity=50),
+        Execution(maker_id=2, taker_id=3, price=1000, quantity=30),
+    ]
+
+
+async def test_batches_take_a_sequence_number_per_order(sequencer: Sequencer):
+    batch = AddOrders(
+        security_id=1,
+        orders=[order("1", 1, Side.SELL, 50), order("2", 1, Side.BUY, 80)],
+    )
+    single = AddOrder(order("3", 1, Side.SELL, 30))
+
+    first, second = await asyncio.gather(
+        sequencer.submit(batch), sequencer.submit(single)
+    )
+
+    assert (batch.sequence, single.sequence) == (1, 3)
+    assert first.executions == [
+        [],
+        [Execution(maker_id=1, taker_id=2, price=1000, quantity=50)],
+    ]
+    assert first.resting_quantities == [50, 30]
+    assert second.executions == [
+        Execution(maker_id=2, taker_id=3, price=1000, quantity=30)
+    ]
+
+
+async def test_securities_have_separate_writers(sequencer: Sequencer):
+    await asyncio.gather(
+        sequencer.submit(AddOrder(order("1", 1, Side.SELL, 50))),
+        sequencer.submit(AddOrder(order("2", 2, Side.BUY, 50))),
+    )
+
+    assert set(sequencer.consumers) == {1, 2}
+    assert list(sequencer.root_matcher.get_matcher(1).asks) == [1000]
+    assert list(sequencer.root_matcher.get_matcher(2).bids) == [1000]
+
+
+async def test_errors_are_returned_to_the_caller(sequencer: Sequencer):
+    invalid = order("1", 1, Side.SELL, 50)
+    invalid.type = "stop"
+
+    with pytest.raises(ValueError):
+        await sequencer.submit(AddOrder(invalid))
+
+    # The consumer keeps going after a failed command
+    result = await sequencer.submit(AddOrder(order("2", 1, Side.SELL, 50)))
+    assert result.resting.quantity == 50
+
+
+async def test_errors_after_applying_a_command_halt_the_security():
+    sequencer = Sequencer(RootMatcher(SecuritiesRepository()), trades=TradeStore())
+    await sequencer.submit(AddOrder(order("1", 1, Side.SELL, 50)))
+
+    # The order trades at no price, which the trade store cannot record once the book has changed
+    invalid = order("2", 1, Side.BUY, 10)
+    invalid.price = None
+    failed, queued = await asyncio.wait_for(
+        asyncio.gather(
+            sequencer.submit(AddOrder(invalid)),
+            sequencer.submit(AddOrder(order("3", 1, Side.BUY, 10))),
+            return_exceptions=True,
+        ),
+        1,
+    )
+    assert isinstance(failed, TypeError)
+    assert isinstance(queued, RuntimeError)
+
+    # No further command is applied to the book, while other securities carry on
+    with pytest.raises(RuntimeError):
+        await sequencer.submit(AddOrder(order("4", 1, Side.BUY, 10)))
+    assert list(sequencer.root_matcher.get_matcher(1).asks.values())[0].quantity == 40
+    result = await sequencer.submit(AddOrder(order("5", 2, Side.BUY, 10)))
+    assert result.resting.quantity == 10
+    await sequencer.stop()
+
+
+async def test_unknown_security(sequencer: Sequencer):
+    with pytest.raises(KeyError):
+        await sequencer.submit(AddOrder(order("1", 42, Side.SELL, 50)))
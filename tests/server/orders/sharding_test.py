@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from src.server.market_data.feed import BookDelta, MarketDataFeed
+from src.server.orders.depth import BookDepth
+from src.server.orders.matcher import BookSize, Execution, LevelUpdate, OrderBookOrder
+from src.server.orders.model import (
+    OrderRepository,
+    OrderStatus,
+    Side,
+)
+from src.server.orders.sequencer import AddOrder, ReadBookSize, ReadDepth
+from src.server.orders.sharding import ShardedSequencer, shard_of
+from src.server.securities.model import SecuritiesRepository
+from tests.server.orders.factories import order
+
+
+@pytest.fixture
+async def sequencer():
+    sequencer = ShardedSequencer(
+        SecuritiesRepository().list_securities(),
+        workers=2,
+        order_repository=OrderRepository(),
+        feed=MarketDataFeed(),
+    )
+    await sequencer.start()
+    yield sequencer
+    await sequencer.stop()
+
+
+async def test_orders_are_matched_in_workers(sequencer: ShardedSequencer):
+    # Securities 1 and 2 are owned by different workers
+    assert shard_of(1, 2) != shard_of(2, 2)
+
+    commands = [
+        AddOrder(order("1", 1, Side.SELL, 50)),
+        AddOrder(order("2", 2, Side.SELL, 50)),
+        AddOrder(order("3", 1, Side.BUY, 80)),
+        AddOrder(order("4", 2, Side.BUY, 20)),
+    ]
+
+    results = await asyncio.gather(*map(sequencer.submit, commands))
+
+    assert [command.sequence for command in commands] == [1, 2, 3, 4]
+    assert results[2].executions == [
+        Execution(maker_id=1, taker_id=3, price=1000, quantity=50),
+    ]
+    assert results[2].resting == OrderBookOrder(maker_id=3, quantity=30, price=1000)
+    assert results[3].executions == [
+        Execution(maker_id=2, taker_id=4, price=1000, quantity=20),
+    ]
+    assert results[3].order_book is None
+
+    # The orders and their fills are recorded as the results come back
+    assert {
+        order.id: order.status for order in sequencer.order_repository.list_orders()
+    } == {
+        "1": OrderStatus.filled,
+        "2": OrderStatus.partially_filled,
+        "3": OrderStatus.partially_filled,
+        "4": OrderStatus.filled,
+    }
+
+
+async def test_books_are_read_from_workers(sequencer: ShardedSequencer):
+    await sequencer.submit(AddOrder(order("1", 1, Side.SELL, 50)))
+    await sequencer.submit(AddOrder(order("2", 2, Side.BUY, 20)))
+
+    # Reads take no sequence number, and are given that of the last command applied to the book
+    assert await sequencer.read(ReadDepth(security_id=1, depth=10)) == BookDepth(
+        1, [(1000, 50)], []
+    )
+    assert await sequencer.read(ReadDepth(security_id=2)) == BookDepth(
+        2, [], [(1000, 20)]
+    )
+    assert await sequencer.read(ReadBookSize(security_id=2)) == BookSize(1, 0, 1)
+    assert sequencer.last_sequence == 2
+
+
+async def test_level_updates_are_published_from_workers(sequencer: ShardedSequencer):
+    queue = sequencer.feed.subscribe(1)
+
+    await sequencer.submit(AddOrder(order("1", 1, Side.SELL, 50)))
+    await sequencer.submit(AddOrder(order("2", 2, Side.SELL, 50)))
+    await sequencer.submit(AddOrder(order("3", 1, Side.BUY, 20)))
+
+    assert queue.get_nowait() == BookDelta(1, 1, [LevelUpdate(Side.SELL, 1000, 50)])
+    assert queue.get_nowait() == BookDelta(1, 3, [LevelUpdate(Side.SELL, 1000, 30)])
+    assert queue.empty()
+
+
+async def test_errors_are_returned_to_the_caller(sequencer: ShardedSequencer):
+    invalid = order("1", 1, Side.SELL, 50)
+    invalid.type = "stop"
+
+    with pytest.raises(ValueError):
+        await sequencer.submit(AddOrder(invalid))
+
+    with pytest.raises(KeyError):
+        await sequencer.submit(AddOrder(order("2", 42, Side.SELL, 50)))
+
+
+async def test_requests_fail_once_a_worker_exits(sequencer: ShardedSequencer):
+    shard = sequencer.shards[shard_of(1, 2)]
+    shard.process.kill()
+
+    # A request sent as the worker exits gets no reply
+    waiting = shard.submit(-1, AddOrder(order("1", 1, Side.SELL, 50)))
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(waiting, 5)
+
+    # Later requests fail fast, while the other worker carries on
+    with pytest.raises(RuntimeError):
+        await sequencer.submit(AddOrder(order("2", 1, Side.SELL, 50)))
+    result = await sequencer.submit(AddOrder(order("3", 2, Side.SELL, 50)))
+    assert result.resting.quantity == 50
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from src.server.orders.journal import Journal
+from src.server.orders.matcher import RootMatcher
+from src.server.orders.model import Order, OrderRepository, OrderType, Side
+from src.server.orders.sequencer import AddOrder, CancelOrder, Sequencer
+from src.server.orders.snapshot import (
+    SnapshotPosition,
+    load_snapshot,
+    restore,
+    take_snapshot,
+    write_snapshot,
+)
+from src.server.securities.model import (
+    BookEngine,
+    SecuritiesRepository,
+    SelfTradePrevention,
+)
+from tests.server.orders.factories import order
+
+
+@pytest.fixture
+def securities() -> SecuritiesRepository:
+    securities = SecuritiesRepository()
+    securities.get_security(2).book_engine = BookEngine.ladder
+    securities.get_security(2).self_trade_prevention = SelfTradePrevention.cancel_oldest
+    return securities
+
+
+ORDERS = [
+    order("1", 1, Side.SELL, 50, 1010),
+    order("2", 1, Side.SELL, 30, 1010),
+    order("3", 1, Side.SELL, 20, 1020),
+    order("4", 1, Side.BUY, 60, 1000),
+    order("5", 1, Side.BUY, 60, 1010),
+    order("6", 2, Side.BUY, 40, 990),
+    order("7", 2, Side.SELL, 10, 995),
+]
+
+
+def assert_restored(restored: RootMatcher, original: RootMatcher):
+    for security_id, matcher in original.matchers.items():
+        restored_matcher = restored.get_matcher(security_id)
+        assert restored_matcher.order_book == matcher.order_book
+        assert type(restored_matcher.asks) is type(matcher.asks)
+        assert restored_matcher.orders.keys() == matcher.orders.keys()
+        assert list(restored_matcher.triggers) == list(matcher.triggers)
+        assert restored_matcher.last_price == matcher.last_price
+        assert restored_matcher.self_trade_prevention == matcher.self_trade_prevention
+
+
+def test_snapshot_round_trip(tmp_path, securities: SecuritiesRepository):
+    root_matcher = RootMatcher(securities)
+    order_repository = OrderRepository()
+    stop = Order("9", 9, 1, Side.SELL, 10, OrderType.stop, stop_price=990)
+    for new_order in [*ORDERS, stop]:
+        root_matcher.add(order_repository.create_order(new_order))
+    # Stop orders waiting for their trigger, and the last trade price, are kept
+    assert root_matcher.get_matcher(1).last_price == 1010
+    assert len(root_matcher.get_matcher(1).triggers) == 1
+    # As is the quantity self-trade prevention cancelled from an order
+    order_repository.reduce("4", 20)
+
+    path = str(tmp_path / "snapshot")
+    write_snapshot(path, root_matcher, order_repository, SnapshotPosition(7, 1234))
+
+    restored = RootMatcher(securities)
+    restored_orders = OrderRepository()
+
+    assert load_snapshot(path, restored, restored_orders) == SnapshotPosition(7, 1234)
+    assert_restored(restored, root_matcher)
+    assert restored_orders.list_orders() == order_repository.list_orders()
+
+    # Time priority is kept: the earliest order at the best price is filled first
+    result = restored.add(order("8", 1, Side.BUY, 10, 1010))
+    assert result.executions[0].maker_id == 2
+
+
+async def test_restore_replays_the_journal_after_the_snapshot(
+    tmp_path, securities: SecuritiesRepository
+):
+    snapshot_path = str(tmp_path / "snapshot")
+    journal_path = str(tmp_path / "journal")
+
+    journal = Journal(journal_path)
+    journal.open()
+    order_repository = OrderRepository()
+    sequencer = Sequencer(
+        RootMatcher(securities), journal, order_repository=order_repository
+    )
+
+    for new_order in ORDERS[:4]:
+        await sequencer.submit(AddOrder(new_order))
+
+    # The snapshot is taken while the caller of a matched order waits for its journal record to be written. The fills
+    # are in the order store as well as in the book
+    written = journal.written
+    matched = asyncio.create_task(sequencer.submit(AddOrder(ORDERS[4])))
+    while journal.written == written:
+        await asyncio.sleep(0)
+    position = await take_snapshot(
+        snapshot_path, sequencer.root_matcher, order_repository, sequencer, journal
+    )
+    assert position == SnapshotPosition(sequence=5, journal_offset=journal.size)
+    await matched
+
+    for new_order in ORDERS[5:]:
+        await sequencer.submit(AddOrder(new_order))
+    await sequencer.submit(CancelOrder(security_id=1, order_id="3"))
+
+    await sequencer.stop()
+    await journal.close()
+
+    restored = RootMatcher(securities)
+    restored_orders = OrderRepository()
+
+    assert restore(snapshot_path, journal_path, restored, restored_orders) == 8
+    assert_restored(restored, sequencer.root_matcher)
+    assert restored_orders.list_orders() == order_repository.list_orders()
+
+
+def test_no_snapshot(tmp_path, securities: SecuritiesRepository):
+    assert (
+        load_snapshot(
+            str(tmp_path / "snapshot"), RootMatcher(securities), OrderRepository()
+        )
+        is None
+    )
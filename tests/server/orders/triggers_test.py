@@ -0,0 +1,57 @@
+from src.server.orders.model import Order, OrderType, Side
+from src.server.orders.triggers import TriggerBook
+from tests.server.orders import factories
+
+
+def stop(order_id: str, side: Side, stop_price: int) -> Order:
+    return factories.order(
+        order_id,
+        1,
+        side,
+        10,
+        None,
+        client_id=1,
+        type=OrderType.stop,
+        stop_price=stop_price,
+    )
+
+
+def test_pop_triggered():
+    triggers = TriggerBook()
+    for order in (
+        stop("b1", Side.BUY, 1020),
+        stop("b2", Side.BUY, 1010),
+        stop("b3", Side.BUY, 1010),
+        stop("b4", Side.BUY, 1030),
+        stop("s1", Side.SELL, 990),
+        stop("s2", Side.SELL, 980),
+    ):
+        triggers.add(order)
+
+    # Trades from 995 to 1020 trigger the buy stops at or below 1020, lowest first and in time priority at each price,
+    # and no sell stop
+    assert [order.id for order in triggers.pop_triggered(995, 1020)] == [
+        "b2",
+        "b3",
+        "b1",
+    ]
+    assert [order.id for order in triggers.pop_triggered(985, 985)] == ["s1"]
+    assert triggers.pop_triggered(985, 1000) == []
+    assert [order.id for order in triggers] == ["b4", "s2"]
+    assert len(triggers) == 2
+
+
+def test_remove():
+    triggers = TriggerBook()
+    triggers.add(stop("b1", Side.BUY, 1010))
+    triggers.add(stop("b2", Side.BUY, 1010))
+
+    assert triggers.remove("b1").id == "b1"
+    assert triggers.remove("b1") is None
+    assert "b2" in triggers
+    assert list(triggers.buys) == [1010]
+
+    triggers.remove("b2")
+    # The emptied stop price is dropped
+    assert not triggers.buys
+    assert not triggers
@@ -0,0 +1,41 @@
+import pytest
+import pytest_asyncio
+from blacksheep.testing import TestClient
+
+from src.server.main import app
+
+# The app is started once for all tests, and its sequencer consumers are bound to the event loop it was started in
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def client() -> TestClient:
+    await app.start()
+    return TestClient(app)
+
+
+async def test_list_securities(client: TestClient):
+    response = await client.get("/securities")
+
+    assert response.status == 200
+    securities = await response.json()
+    assert [security["symbol"] for security in securities] == [
+        "DEW",
+        "AAPL",
+        "MSFT",
+        "GOOGL",
+    ]
+
+
+async def test_get_security(client: TestClient):
+    response = await client.get("/securities/3")
+
+    assert response.status == 200
+    security = await response.json()
+    assert (security["id"], security["symbol"]) == (3, "GOOGL")
+
+
+async def test_get_unknown_security(client: TestClient):
+    response = await client.get("/securities/42")
+
+    assert response.status == 404